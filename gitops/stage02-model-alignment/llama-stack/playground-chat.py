@@ -2,126 +2,40 @@
 
 from __future__ import annotations
 
-from typing import Iterable, List, Optional
+import time
 
 import streamlit as st
 
 from llama_stack.distribution.ui.modules.api import llama_stack_api
+from playground_common import (
+    StreamingGuardrail,
+    TurnTrace,
+    catalog,
+    close_stream,
+    render_waterfall,
+    run_guardrail,
+    shield_versions,
+    tracer,
+    verdict_cache,
+)
 
 
-def _list_shield_ids() -> List[str]:
-    try:
-        shields = llama_stack_api.client.shields.list()
-    except Exception:
-        return []
-    ids = []
-    for shield in shields:
-        identifier = getattr(shield, "identifier", None)
-        if identifier:
-            ids.append(identifier)
-    return ids
-
-
-def _filter_guardrail_messages(messages: list[dict]) -> list[dict]:
-    """Remove system messages and ensure assistant messages have required fields."""
-    filtered = []
-    for msg in messages:
-        if (msg or {}).get("role") == "system":
-            continue
-        
-        # Add required stop_reason field for assistant messages
-        if msg.get("role") == "assistant" and "stop_reason" not in msg:
-            msg = {**msg, "stop_reason": "end_of_turn"}
-        
-        filtered.append(msg)
-    
-    return filtered if filtered else messages
-
-
-def _extract_attr(candidate: object, attr: str, default=None):
-    if candidate is None:
-        return default
-    if isinstance(candidate, dict):
-        return candidate.get(attr, default)
-    value = getattr(candidate, attr, default)
-    if callable(value):
-        try:
-            return value()
-        except Exception:  # noqa: BLE001
-            return default
-    return value
-
-
-def _normalize_violation(payload: object) -> Optional[object]:
-    if payload is None:
-        return None
-
-    # Check violation_level first - "info" level indicates informational messages, not actual violations
-    violation_level = _extract_attr(payload, "violation_level")
-    if violation_level and str(violation_level).lower() in {"info", "informational"}:
-        # For info-level messages, still check if there are actual violations
-        pass  # Continue to status/summary checks below
-
-    # Extract metadata (TrustyAI provider returns status/summary nested in metadata)
-    metadata = _extract_attr(payload, "metadata")
-    
-    # Try to get status from metadata first, then fallback to top-level
-    status_raw = _extract_attr(metadata, "status") if metadata else None
-    if status_raw is None:
-        status_raw = _extract_attr(payload, "status")
-    
-    status_value = None
-    if isinstance(status_raw, str):
-        status_value = status_raw.lower()
-    elif hasattr(status_raw, "value"):
-        status_value = str(status_raw.value).lower()
-    elif status_raw is not None:
-        status_value = str(status_raw).lower()
-    if status_value in {"pass", "passed", "verified", "ok"}:
-        return None
-
-    # Try to get summary from metadata first, then fallback to top-level
-    summary = _extract_attr(metadata, "summary") if metadata else None
-    if summary is None:
-        summary = _extract_attr(payload, "summary")
-    
-    if summary is not None:
-        messages_with_violations = _extract_attr(summary, "messages_with_violations", 0)
-        total_violations = _extract_attr(summary, "total_violations_found", 0)
-
-        def _to_int(value):
-            try:
-                return int(value)
-            except (TypeError, ValueError):
-                return value
-
-        if _to_int(messages_with_violations) in (0, "0") and _to_int(total_violations) in (0, "0"):
-            return None
-
-    return payload
-
-
-def _run_guardrail(
-    shield_id: str,
-    messages: Iterable[dict],
-) -> tuple[Optional[object], Optional[Exception]]:
-    try:
-        result = llama_stack_api.client.safety.run_shield(
-            shield_id=shield_id,
-            messages=_filter_guardrail_messages(list(messages)),
-            params={},
-        )
-    except Exception as exc:  # noqa: BLE001
-        return None, exc
+# One instance per process (cache_resource), reused by every rerun and session
+_CATALOG = catalog()
+
 
-    violation = getattr(result, "violation", None)
-    return _normalize_violation(violation), None
+# Shared with the other pages (playground_common.verdict_cache)
+_VERDICTS = verdict_cache()
 
 
 # Sidebar configurations
 with st.sidebar:
     st.header("Configuration")
-    available_models = llama_stack_api.client.models.list()
+    if st.button("🔄 Refresh catalog", help="Re-read models and shields from Llama Stack."):
+        _CATALOG.refresh()
+    _CATALOG.warm("models", "shields")
+    st.caption(f"Catalog fetched {_CATALOG.age_s() or 0:.0f}s ago, refreshed every {_CATALOG.ttl_s:.0f}s.")
+    (available_models,) = _CATALOG.get("models")
     available_models = [model.identifier for model in available_models if model.model_type == "llm"]
     selected_model = st.selectbox(
         "Choose a model",
@@ -172,7 +86,8 @@ with st.sidebar:
     )
 
     st.subheader("Guardrails", divider=True)
-    shield_ids = _list_shield_ids()
+    _VERDICTS.versions = shield_versions()
+    shield_ids = list(_VERDICTS.versions)
     if not shield_ids:
         st.caption("No guardrails registered in Llama Stack.")
     guardrail_enabled = st.checkbox(
@@ -189,11 +104,17 @@ with st.sidebar:
     guardrail_apply_to_response = st.checkbox(
         "Screen assistant responses",
         value=True,
-        help="When enabled, the guardrail checks the model response before it is displayed.",
+        help="When enabled, the guardrail checks the response while it streams; unscreened text is held back "
+        "and generation stops at the first violation.",
         disabled=not guardrail_enabled,
     )
     if guardrail_enabled:
         st.caption("Requests blocked by the shield will not be sent to the model.")
+        verdict_stats = _VERDICTS.stats()
+        st.caption(
+            f"Verdict cache: {verdict_stats['hit_rate']:.0%} of checks answered from cache "
+            f"({verdict_stats['hits']}/{verdict_stats['lookups']}), {verdict_stats['entries']} passes stored"
+        )
 
     # Add clear chat button to sidebar
     if st.button("Clear Chat", use_container_width=True):
@@ -213,6 +134,8 @@ if "messages" not in st.session_state:
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
+    if "waterfall" in message:
+        render_waterfall(*message["waterfall"])
 
 
 def _guardrail_block_message(violation: object, shield_id: str) -> str:
@@ -236,15 +159,24 @@ if prompt := st.chat_input("Example: What is Llama Stack?"):
     with st.chat_message("user"):
         st.markdown(prompt)
 
+    turn = TurnTrace(
+        "chat.turn",
+        label_keys=("guardrail.shield",),
+        **{
+            "gen_ai.request.model": selected_model,
+            "guardrail.shield": selected_shield if guardrail_enabled else None,
+        },
+    )
     guardrail_violation = None
     guardrail_error = None
     if guardrail_enabled and selected_shield:
-        guardrail_violation, guardrail_error = _run_guardrail(
+        guardrail_violation, guardrail_error = run_guardrail(
             selected_shield,
             [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": prompt},
             ],
+            turn,
         )
         if guardrail_error:
             st.warning(f"Guardrail check failed: {guardrail_error}")
@@ -271,6 +203,7 @@ if prompt := st.chat_input("Example: What is Llama Stack?"):
 
             # Always use user's streaming preference, even with guardrails enabled
             # We'll stream the response, then check it afterwards
+            stream_started = time.time()
             response = llama_stack_api.client.inference.chat_completion(
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -285,29 +218,69 @@ if prompt := st.chat_input("Example: What is Llama Stack?"):
                 },
             )
 
+            screen_response = guardrail_enabled and guardrail_apply_to_response and selected_shield
+            output_guard = None
+            if screen_response and stream:
+                output_guard = StreamingGuardrail(
+                    selected_shield,
+                    [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt},
+                    ],
+                    turn=turn,
+                )
+
+            post_guardrail_violation = None
+            post_guardrail_error = None
             if stream:
+                first_token_at = None
+                streamed_tokens = 0
+                render_s = 0.0
                 for chunk in response:
                     if chunk.event.event_type == "progress":
+                        first_token_at = first_token_at or time.time()
+                        streamed_tokens += 1
                         full_response += chunk.event.delta.text
-                    message_placeholder.markdown(full_response + "▌")
-                message_placeholder.markdown(full_response)
+                        if output_guard and not output_guard.feed(chunk.event.delta.text):
+                            close_stream(response)  # violation: stop generating
+                            break
+                    render_started = time.perf_counter()
+                    message_placeholder.markdown((output_guard.visible if output_guard else full_response) + "▌")
+                    render_s += time.perf_counter() - render_started
+                turn.add_generation(
+                    stream_started,
+                    first_token_at,
+                    time.time(),
+                    streamed_tokens,
+                    render_s,
+                    **{"gen_ai.request.model": selected_model},
+                )
+                if output_guard:
+                    post_guardrail_violation = output_guard.finish()
+                    post_guardrail_error = output_guard.error
+                    if post_guardrail_error:
+                        st.warning(f"Guardrail response check failed: {post_guardrail_error}")
+                else:
+                    message_placeholder.markdown(full_response)
             else:
                 full_response = response.completion_message.content
+                turn.add("llm.generate", stream_started, time.time(), **{"gen_ai.request.model": selected_model})
 
-            post_guardrail_violation = None
-            post_guardrail_error = None
-            if guardrail_enabled and guardrail_apply_to_response and selected_shield:
-                post_guardrail_violation, post_guardrail_error = _run_guardrail(
+            if screen_response and output_guard is None:
+                post_guardrail_violation, post_guardrail_error = run_guardrail(
                     selected_shield,
                     [
                         {"role": "system", "content": system_prompt},
                         {"role": "user", "content": prompt},
                         {"role": "assistant", "content": full_response},
                     ],
+                    turn,
+                    "response",
                 )
                 if post_guardrail_error:
                     st.warning(f"Guardrail response check failed: {post_guardrail_error}")
 
+            render_started = time.time()
             if post_guardrail_violation:
                 guardrail_message = _guardrail_block_message(post_guardrail_violation, selected_shield)
                 message_placeholder.markdown(guardrail_message)
@@ -315,4 +288,10 @@ if prompt := st.chat_input("Example: What is Llama Stack?"):
             else:
                 message_placeholder.markdown(full_response)
                 st.session_state.messages.append({"role": "assistant", "content": full_response})
+            turn.add("ui.render", render_started, time.time())
+
+    turn.finish(tracer("playground-chat"))
+    # Kept with the answer, so the waterfall survives reruns
+    st.session_state.messages[-1]["waterfall"] = turn.waterfall()
+    render_waterfall(*st.session_state.messages[-1]["waterfall"])
 
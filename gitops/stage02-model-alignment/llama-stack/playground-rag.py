@@ -1,16 +1,56 @@
 # Patched version of the upstream Streamlit RAG page.
 
+import base64
+import hashlib
 import json
+import mimetypes
+import mmap
+import os
+import re
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
 from typing import Iterable, List, Optional
 
+import numpy as np
+import requests
 import streamlit as st
 from llama_stack_client import Agent, AgentEventLogger, RAGDocument
 
 from llama_stack.apis.common.content_types import ToolCallDelta
 from llama_stack.distribution.ui.modules.api import llama_stack_api
-from llama_stack.distribution.ui.modules.utils import data_url_from_file
 
+# The ingestion pipeline's chunker (stages/stage2-model-alignment/kfp/runtime-image/), baked
+# into the playground image so uploads get the same chunks and metadata as pipeline runs
+from markdown_chunker import PAGE_BREAK_PLACEHOLDER, chunk_document
+# Shared with the chat and tools pages (playground_common.py, baked in next to the pages)
+from playground_common import (
+    StreamingGuardrail,
+    TurnTrace,
+    catalog,
+    close_stream,
+    render_waterfall,
+    run_guardrail,
+    shield_versions,
+    tracer,
+    verdict_cache,
+)
+
+try:
+    # Lexical index download and collection markers; without it retrieval stays vector-only
+    import boto3
+    from botocore.config import Config as BotoConfig
+except ImportError:
+    boto3 = None
+
+try:
+    import onnxruntime as ort  # cross-encoder reranking; without it the fused order is used
+    from tokenizers import Tokenizer
+except ImportError:
+    ort = None
+    Tokenizer = None
 
 def _format_retrieved_context(chunks: List[dict]) -> str:
     if not chunks:
@@ -19,8 +59,12 @@ def _format_retrieved_context(chunks: List[dict]) -> str:
     formatted = []
     for item in chunks:
         header_parts = [f"[{item['vector_db']}"]
+        if item.get("retriever") == "bm25":
+            header_parts.append("bm25")
         if item["score"] is not None:
             header_parts.append(f"score={item['score']:.3f}")
+        if item.get("rerank_score") is not None:
+            header_parts.append(f"rerank={item['rerank_score']:.2f}")
         doc_id = item["metadata"].get("document_id")
         if doc_id:
             header_parts.append(doc_id)
@@ -63,6 +107,782 @@ def _dedupe_chunks_by_document(chunks: List[dict]) -> List[dict]:
     return deduped
 
 
+def _query_vector_db(vector_db_id: str, query: str, top_k: int, timeout_s: float) -> tuple[List[dict], float]:
+    started = time.perf_counter()
+    query_result = llama_stack_api.client.vector_io.query(
+        vector_db_id=vector_db_id,
+        query=query,
+        params={"top_k": top_k},
+        timeout=timeout_s,
+    )
+    chunks = [
+        {
+            "vector_db": vector_db_id,
+            "score": score,
+            "content": getattr(chunk, "content", "") or "",
+            "metadata": getattr(chunk, "metadata", {}) or {},
+        }
+        for chunk, score in zip(query_result.chunks or [], query_result.scores or [])
+    ]
+    return chunks, (time.perf_counter() - started) * 1000
+
+
+# One instance per process (cache_resource), reused by every rerun and session
+_CATALOG = catalog()
+
+
+class _RetrievalCache:
+    """
+    Process-wide LRU cache of vector_io.query results, shared by all playground sessions.
+
+    Keyed by (collection, normalized query, top_k, filters). Entries expire after ttl_s,
+    the least recently used ones are evicted beyond max_entries or max_bytes, and an entry
+    stored for another collection version (blue/green reindex) is dropped on lookup.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024, ttl_s: float = 600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[tuple, tuple[float, int, str, List[dict]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(vector_db_id: str, query: str, top_k: int, filters: Optional[dict] = None) -> tuple:
+        normalized = " ".join(query.lower().split())
+        return (vector_db_id, normalized, top_k, json.dumps(filters or {}, sort_keys=True))
+
+    def _drop(self, key: tuple) -> None:
+        _, size, _, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key: tuple, version: str = "") -> Optional[List[dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] < time.monotonic() or entry[2] != version):
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(chunk) for chunk in entry[3]]
+
+    def put(self, key: tuple, chunks: List[dict], version: str = "") -> None:
+        size = len(json.dumps(chunks, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_s, size, version, chunks)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, vector_db_id: str, version: Optional[str] = None) -> None:
+        """Drop a collection's entries that belong to another version (all of them without one)."""
+        with self._lock:
+            for key in [
+                k for k, entry in self._entries.items()
+                if k[0] == vector_db_id and (version is None or entry[2] != version)
+            ]:
+                self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+@st.cache_resource
+def _retrieval_cache() -> _RetrievalCache:
+    return _RetrievalCache(
+        max_entries=int(os.environ.get("RAG_RETRIEVAL_CACHE_ENTRIES", "512")),
+        max_bytes=int(float(os.environ.get("RAG_RETRIEVAL_CACHE_MB", "32")) * 1024 * 1024),
+        ttl_s=float(os.environ.get("RAG_RETRIEVAL_CACHE_TTL_S", "600")),
+    )
+
+
+class _CollectionStateStore:
+    """
+    Which physical collection serves each name, and when it was last ingested into.
+
+    Reads the markers the ingestion pipelines publish under state_uri:
+    `<name>/serving.json` (switch_collection_alias, blue/green reindex) and
+    `<collection>/ingested.json` (stamp_collection_ingestion, every ingestion run). A name
+    without a serving marker serves itself. Markers are re-read at most every check_s; a
+    failed read keeps the last known state.
+    """
+
+    def __init__(self, state_uri: str, endpoint_url: str, check_s: float = 30.0):
+        self.bucket, _, prefix = state_uri.replace("s3://", "", 1).rstrip("/").partition("/")
+        self.prefix = f"{prefix}/" if prefix else ""
+        self.check_s = check_s
+        # Credentials come from AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY; read on the script thread
+        self._s3 = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name="us-east-1",
+            config=BotoConfig(connect_timeout=2, read_timeout=2, retries={"max_attempts": 1}),
+        )
+        self._states: dict[str, tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+
+    def _read(self, key: str) -> dict:
+        try:
+            return json.loads(self._s3.get_object(Bucket=self.bucket, Key=f"{self.prefix}{key}")["Body"].read())
+        except self._s3.exceptions.NoSuchKey:
+            return {}
+
+    def get(self, vector_db_id: str) -> dict:
+        """{"collection": served physical collection, "generation": "<collection>@<ingested_at>"}"""
+        with self._lock:
+            checked, state = self._states.get(vector_db_id, (0.0, None))
+        if state is not None and time.monotonic() - checked < self.check_s:
+            return state
+        try:
+            collection = self._read(f"{vector_db_id}/serving.json").get("collection") or vector_db_id
+            ingested_at = self._read(f"{collection}/ingested.json").get("ingested_at", "")
+            state = {"collection": collection, "generation": f"{collection}@{ingested_at}"}
+        except Exception as exc:  # noqa: BLE001 - keep the last known state
+            print(f"[collection-state] {vector_db_id}: {exc}")
+            state = state or {"collection": vector_db_id, "generation": f"{vector_db_id}@"}
+        with self._lock:
+            self._states[vector_db_id] = (time.monotonic(), state)
+        return state
+
+
+@st.cache_resource
+def _collection_states() -> Optional[_CollectionStateStore]:
+    state_uri = os.environ.get("RAG_COLLECTION_STATE_URI", "")
+    if not state_uri or boto3 is None:
+        return None
+    return _CollectionStateStore(
+        state_uri,
+        endpoint_url=os.environ.get("RAG_S3_ENDPOINT", ""),
+        check_s=float(os.environ.get("RAG_COLLECTION_STATE_CHECK_S", "30")),
+    )
+
+
+def _served_collections(vector_db_ids: Iterable[str]) -> dict[str, dict]:
+    """
+    Served collection and cache generation per name (see _CollectionStateStore).
+
+    The generation changes when the alias is switched or the served collection is
+    re-ingested; rebuilds that have not switched (or failed) leave it alone. Without
+    RAG_COLLECTION_STATE_URI it is "" and cached entries only age out.
+    """
+    vector_db_ids = list(vector_db_ids)
+    store = _collection_states()
+    if store is None or not vector_db_ids:
+        return {vector_db_id: {"collection": vector_db_id, "generation": ""} for vector_db_id in vector_db_ids}
+    with ThreadPoolExecutor(max_workers=len(vector_db_ids), thread_name_prefix="rag-state") as pool:
+        return dict(zip(vector_db_ids, pool.map(store.get, vector_db_ids)))
+
+
+# Lexical (BM25) index published by the ingestion pipeline
+# (stages/stage2-model-alignment/kfp/components/build_lexical_index.py). The tokenizer
+# must match the builder's; indexes built with another one are ignored.
+_LEXICAL_TOKENIZER = "bm25-v1"
+_LEXICAL_TOKEN_RE = re.compile(r"[0-9a-z]+(?:[-_./:][0-9a-z]+)*")
+_LEXICAL_SPLIT_RE = re.compile(r"[-_./:]")
+_LEXICAL_FILES = (
+    "term_offsets.npy",
+    "postings_doc.npy",
+    "postings_tf.npy",
+    "doc_len.npy",
+    "chunk_offsets.npy",
+    "terms.json",
+    "chunks.jsonl",
+)
+
+
+def _lexical_terms(text: str) -> List[str]:
+    terms = []
+    for match in _LEXICAL_TOKEN_RE.finditer(text.lower()):
+        token = match.group(0)
+        terms.append(token)
+        if _LEXICAL_SPLIT_RE.search(token):
+            terms.extend(part for part in _LEXICAL_SPLIT_RE.split(token) if part)
+    return terms
+
+
+class _LexicalIndex:
+    """BM25 over one collection's chunks; postings and chunks are memory-mapped from disk."""
+
+    def __init__(self, path: str, meta: dict):
+        self.built_at = meta["built_at"]
+        self.k1 = float(meta.get("k1", 1.2))
+        self.b = float(meta.get("b", 0.75))
+        self.avgdl = float(meta.get("avgdl") or 1.0)
+        with open(os.path.join(path, "terms.json"), "r", encoding="utf-8") as f:
+            self._term_ids = {term: i for i, term in enumerate(json.load(f))}
+        self._term_offsets = np.load(os.path.join(path, "term_offsets.npy"), mmap_mode="r")
+        self._postings_doc = np.load(os.path.join(path, "postings_doc.npy"), mmap_mode="r")
+        self._postings_tf = np.load(os.path.join(path, "postings_tf.npy"), mmap_mode="r")
+        self._doc_len = np.load(os.path.join(path, "doc_len.npy"), mmap_mode="r")
+        self._chunk_offsets = np.load(os.path.join(path, "chunk_offsets.npy"), mmap_mode="r")
+        with open(os.path.join(path, "chunks.jsonl"), "rb") as f:
+            self._chunks = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def query(self, vector_db_id: str, query: str, top_k: int) -> List[dict]:
+        num_docs = len(self._doc_len)
+        scores = np.zeros(num_docs, dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * np.asarray(self._doc_len, dtype=np.float32) / self.avgdl)
+        for term in dict.fromkeys(_lexical_terms(query)):
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = int(self._term_offsets[term_id]), int(self._term_offsets[term_id + 1])
+            docs = np.asarray(self._postings_doc[start:end])
+            tf = np.asarray(self._postings_tf[start:end], dtype=np.float32)
+            idf = np.log1p((num_docs - (end - start) + 0.5) / ((end - start) + 0.5))
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm[docs])
+        matched = int(np.count_nonzero(scores))
+        if not matched:
+            return []
+        top = np.argpartition(-scores, min(top_k, matched) - 1)[: min(top_k, matched)]
+        results = []
+        for doc_id in sorted(top, key=lambda i: -scores[i]):
+            line = self._chunks[int(self._chunk_offsets[doc_id]) : int(self._chunk_offsets[doc_id + 1])]
+            chunk = json.loads(line)
+            results.append(
+                {
+                    "vector_db": vector_db_id,
+                    "retriever": "bm25",
+                    "score": float(scores[doc_id]),
+                    "content": chunk.get("content", ""),
+                    "metadata": chunk.get("metadata") or {},
+                }
+            )
+        return results
+
+
+class _LexicalIndexStore:
+    """
+    Local copies of the collections' lexical indexes, shared by all sessions.
+
+    meta.json of a collection is re-read at most every check_s; a new build is downloaded
+    once into local_dir/<collection>/<built_at>/ and memory-mapped. Checks and downloads
+    run on the store's own threads, one in flight per collection, while the loaded build
+    keeps serving; only a collection's first query waits for its download. Collections
+    without an index (or with another tokenizer) return None and are searched by vectors only.
+    """
+
+    def __init__(self, index_uri: str, endpoint_url: str, local_dir: str, check_s: float = 300.0):
+        self.bucket, _, prefix = index_uri.replace("s3://", "", 1).rstrip("/").partition("/")
+        self.prefix = f"{prefix}/" if prefix else ""
+        self.local_dir = local_dir
+        self.check_s = check_s
+        # Credentials come from AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY
+        self._s3 = boto3.client("s3", endpoint_url=endpoint_url or None, region_name="us-east-1")
+        self._indexes: dict[str, tuple[float, Optional[_LexicalIndex]]] = {}
+        self._loading: dict[str, Future] = {}
+        self._lock = threading.Lock()  # guards the two dicts only, never held during I/O
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-lexical")
+
+    def _load(self, vector_db_id: str, current: Optional[_LexicalIndex]) -> Optional[_LexicalIndex]:
+        key_prefix = f"{self.prefix}{vector_db_id}/"
+        try:
+            meta = json.loads(
+                self._s3.get_object(Bucket=self.bucket, Key=f"{key_prefix}meta.json")["Body"].read()
+            )
+        except self._s3.exceptions.NoSuchKey:
+            return None
+        if meta.get("tokenizer") != _LEXICAL_TOKENIZER:
+            print(f"[lexical] {vector_db_id}: tokenizer {meta.get('tokenizer')} != {_LEXICAL_TOKENIZER}, ignored")
+            return None
+        if current is not None and current.built_at == meta["built_at"]:
+            return current
+        path = os.path.join(self.local_dir, vector_db_id, meta["built_at"])
+        if not os.path.exists(os.path.join(path, "chunks.jsonl")):
+            os.makedirs(path, exist_ok=True)
+            for name in _LEXICAL_FILES:  # chunks.jsonl last: marks a complete download
+                self._s3.download_file(self.bucket, f"{key_prefix}{meta['path']}{name}", os.path.join(path, name))
+        print(f"[lexical] {vector_db_id}: loaded build {meta['built_at']} ({meta.get('chunks')} chunks)")
+        return _LexicalIndex(path, meta)
+
+    def _refresh(self, vector_db_id: str) -> Optional[_LexicalIndex]:
+        with self._lock:
+            index = self._indexes.get(vector_db_id, (0.0, None))[1]
+        try:
+            index = self._load(vector_db_id, index)
+        except Exception as exc:  # noqa: BLE001 - keep the previous build
+            print(f"[lexical] {vector_db_id}: {exc}")
+        with self._lock:
+            self._indexes[vector_db_id] = (time.monotonic(), index)
+            self._loading.pop(vector_db_id, None)
+        return index
+
+    def get(self, vector_db_id: str) -> Optional[_LexicalIndex]:
+        with self._lock:
+            checked, index = self._indexes.get(vector_db_id, (0.0, None))
+            future = self._loading.get(vector_db_id)
+            if future is None and (not checked or time.monotonic() - checked >= self.check_s):
+                future = self._loading[vector_db_id] = self._pool.submit(self._refresh, vector_db_id)
+        if checked or future is None:
+            return index  # stale builds keep serving while the check runs
+        # First query of the collection: wait for its download (bounded by the retrieval
+        # deadline of the caller); other collections are not held up
+        return future.result()
+
+
+@st.cache_resource
+def _lexical_indexes() -> Optional[_LexicalIndexStore]:
+    index_uri = os.environ.get("RAG_LEXICAL_INDEX_URI", "")
+    if not index_uri or boto3 is None:
+        return None
+    return _LexicalIndexStore(
+        index_uri,
+        endpoint_url=os.environ.get("RAG_S3_ENDPOINT", ""),
+        local_dir=os.environ.get("RAG_LEXICAL_INDEX_DIR", "/tmp/rag-lexical-index"),
+        check_s=float(os.environ.get("RAG_LEXICAL_CHECK_S", "300")),
+    )
+
+
+def _lexical_index_id(vector_db_id: str, collections: dict[str, dict]) -> str:
+    # Indexes are published under the physical collection the name serves
+    return collections.get(vector_db_id, {}).get("collection", vector_db_id)
+
+
+def _query_lexical(
+    store: _LexicalIndexStore, vector_db_id: str, index_id: str, query: str, top_k: int
+) -> Optional[tuple[List[dict], float]]:
+    started = time.perf_counter()
+    index = store.get(index_id)
+    if index is None:
+        return None
+    return index.query(vector_db_id, query, top_k), (time.perf_counter() - started) * 1000
+
+
+def _retrieve_concurrently(
+    vector_db_ids: List[str],
+    query: str,
+    top_k: int = 5,
+    timeout_s: float = 3.0,
+    cache: Optional[_RetrievalCache] = None,
+    collections: Optional[dict[str, dict]] = None,
+    lexical: Optional[_LexicalIndexStore] = None,
+) -> tuple[List[dict], dict[str, dict]]:
+    """
+    Query all collections in parallel; retrieval takes as long as the slowest collection
+    (capped at timeout_s) instead of the sum of the round trips. With `lexical`, each
+    collection's BM25 index (when one is published) is searched alongside, under the same
+    deadline; its chunks are tagged retriever="bm25" and fused by _fuse_chunks.
+
+    Returns the chunks in selection order and per-collection stats
+    ({"status": "ok" | "cached" | "timeout" | "error", "latency_ms", "chunks"}). Collections
+    that fail or miss the deadline contribute a warning entry, the others are used as they
+    are. With a cache, hits skip the round trip and successful results are stored under
+    the collection's generation (`collections`, see _served_collections).
+    """
+    collections = collections or {}
+    versions = {vector_db_id: state["generation"] for vector_db_id, state in collections.items()}
+    cached: dict[str, List[dict]] = {}
+    if cache is not None:
+        for vector_db_id in vector_db_ids:
+            hit = cache.get(_RetrievalCache.key(vector_db_id, query, top_k), versions.get(vector_db_id, ""))
+            if hit is not None:
+                cached[vector_db_id] = hit
+
+    pool = ThreadPoolExecutor(max_workers=max(2 * len(vector_db_ids), 1), thread_name_prefix="rag-retrieval")
+    futures = {
+        vector_db_id: pool.submit(_query_vector_db, vector_db_id, query, top_k, timeout_s)
+        for vector_db_id in vector_db_ids
+        if vector_db_id not in cached
+    }
+    lexical_futures = {}
+    if lexical is not None:
+        for vector_db_id in vector_db_ids:
+            index_id = _lexical_index_id(vector_db_id, collections)
+            lexical_futures[vector_db_id] = pool.submit(_query_lexical, lexical, vector_db_id, index_id, query, top_k)
+    done, _ = wait(list(futures.values()) + list(lexical_futures.values()), timeout=timeout_s)
+    pool.shutdown(wait=False, cancel_futures=True)  # do not wait for stragglers
+
+    retrieved_chunks: List[dict] = []
+    stats: dict[str, dict] = {}
+    for vector_db_id in vector_db_ids:
+        if vector_db_id in cached:
+            stats[vector_db_id] = {"status": "cached", "latency_ms": 0.0, "chunks": len(cached[vector_db_id])}
+            retrieved_chunks.extend(cached[vector_db_id])
+            continue
+        future = futures[vector_db_id]
+        if future not in done:
+            stats[vector_db_id] = {"status": "timeout", "latency_ms": timeout_s * 1000, "chunks": 0}
+            message = f"⚠️ Retrieval timed out after {timeout_s:g}s"
+        elif future.exception() is not None:
+            stats[vector_db_id] = {"status": "error", "latency_ms": None, "chunks": 0}
+            message = f"⚠️ Retrieval failed: {future.exception()}"
+        else:
+            chunks, latency_ms = future.result()
+            stats[vector_db_id] = {"status": "ok", "latency_ms": latency_ms, "chunks": len(chunks)}
+            retrieved_chunks.extend(chunks)
+            if cache is not None:
+                cache.put(_RetrievalCache.key(vector_db_id, query, top_k), chunks, versions.get(vector_db_id, ""))
+            continue
+        retrieved_chunks.append({"vector_db": vector_db_id, "score": None, "content": message, "metadata": {}})
+    for vector_db_id, future in lexical_futures.items():
+        if future not in done:
+            stats[f"{vector_db_id} bm25"] = {"status": "timeout", "latency_ms": timeout_s * 1000, "chunks": 0}
+        elif future.exception() is not None:
+            stats[f"{vector_db_id} bm25"] = {"status": "error", "latency_ms": None, "chunks": 0}
+        elif future.result() is not None:  # None: no lexical index for this collection
+            chunks, latency_ms = future.result()
+            stats[f"{vector_db_id} bm25"] = {"status": "ok", "latency_ms": latency_ms, "chunks": len(chunks)}
+            retrieved_chunks.extend(chunks)
+    return retrieved_chunks, stats
+
+
+def _format_retrieval_stats(stats: dict[str, dict]) -> str:
+    parts = []
+    for vector_db_id, item in stats.items():
+        if item["status"] == "ok":
+            parts.append(f"{vector_db_id} {item['latency_ms']:.0f} ms ({item['chunks']})")
+        elif item["status"] == "cached":
+            parts.append(f"{vector_db_id} cached ({item['chunks']})")
+        elif item["status"] == "timeout":
+            parts.append(f"{vector_db_id} timed out")
+        else:
+            parts.append(f"{vector_db_id} failed")
+    latencies = [item["latency_ms"] for item in stats.values() if item["latency_ms"] is not None]
+    total = f"{max(latencies):.0f} ms" if latencies else "n/a"
+    return f"⏱️ Retrieval {total} · " + " · ".join(parts)
+
+
+def _estimate_tokens(text: str) -> int:
+    # Same ~4 characters/token estimate as the ingestion pipeline (insert_via_llamastack)
+    return max(len(text) // 4, 1)
+
+
+class _ModelTokenizer:
+    """
+    Token counts from the served model's own tokenizer (vLLM `POST /tokenize`).
+
+    The endpoint is resolved from the model's Llama Stack provider config. Counts are
+    memoized per text; `context_window` is vLLM's max_model_len. Without a reachable vLLM
+    endpoint it falls back to the ~4 characters/token estimate.
+    """
+
+    def __init__(self, tokenize_url: Optional[str] = None, model: str = "", api_token: str = "", verify=True):
+        self.tokenize_url = tokenize_url
+        self.model = model
+        self.context_window: Optional[int] = None
+        self._session = requests.Session()
+        self._session.verify = verify
+        if api_token and api_token != "fake":
+            self._session.headers["Authorization"] = f"Bearer {api_token}"
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def exact(self) -> bool:
+        return self.tokenize_url is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        with self._lock:
+            if text in self._counts:
+                self._counts.move_to_end(text)
+                return self._counts[text]
+        tokens = _estimate_tokens(text)
+        if self.tokenize_url:
+            try:
+                response = self._session.post(
+                    self.tokenize_url,
+                    json={"model": self.model, "prompt": text, "add_special_tokens": False},
+                    timeout=5,
+                )
+                response.raise_for_status()
+                payload = response.json()
+                tokens = int(payload["count"])
+                self.context_window = payload.get("max_model_len") or self.context_window
+            except Exception:  # noqa: BLE001 - keep the estimate; the prompt is still bounded
+                pass
+        with self._lock:
+            self._counts[text] = tokens
+            while len(self._counts) > 4096:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        if not self.tokenize_url or len(texts) < 2:
+            return [self.count(text) for text in texts]
+        with ThreadPoolExecutor(max_workers=min(len(texts), 8), thread_name_prefix="rag-tokenize") as pool:
+            return list(pool.map(self.count, texts))
+
+
+@st.cache_resource
+def _model_tokenizer(model_id: str) -> _ModelTokenizer:
+    """One tokenizer client per served model (shared by all sessions)."""
+    try:
+        models, providers = _CATALOG.get("models", "providers")
+        model = next(m for m in models if m.identifier == model_id)
+        provider = next(p for p in providers if p.provider_id == model.provider_id)
+    except Exception:  # noqa: BLE001
+        return _ModelTokenizer()
+    config = getattr(provider, "config", None) or {}
+    url = config.get("url") or ""
+    if "vllm" not in (getattr(provider, "provider_type", "") or "") or not url:
+        return _ModelTokenizer()
+    base_url = re.sub(r"/v1/?$", "", url.rstrip("/"))
+    tokenizer = _ModelTokenizer(
+        f"{base_url}/tokenize",
+        model=getattr(model, "provider_resource_id", None) or model_id,
+        api_token=config.get("api_token") or "",
+        verify=config.get("tls_verify", True),
+    )
+    tokenizer.count("ping")  # fills context_window; falls back to the estimate if unreachable
+    if tokenizer.context_window is None:
+        tokenizer.tokenize_url = None
+    return tokenizer
+
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+
+def _trim_to_sentences(text: str, max_tokens: int, tokenizer: _ModelTokenizer, tokens: int) -> str:
+    """Longest prefix of whole sentences within max_tokens ("" if not even one fits)."""
+    sentences = [s for s in _SENTENCE_END_RE.split(text) if s.strip()]
+    # Pick the cut from the chunk's tokens/character ratio, then confirm with one count
+    per_char = tokens / max(len(text), 1)
+    kept: List[str] = []
+    used = 0.0
+    for sentence in sentences:
+        used += (len(sentence) + 1) * per_char
+        if used > max_tokens:
+            break
+        kept.append(sentence)
+    while kept:
+        trimmed = " ".join(kept)
+        if tokenizer.count(trimmed) <= max_tokens:
+            return trimmed
+        kept.pop()
+    return ""
+
+
+def _pack_context(
+    chunks: List[dict],
+    tokenizer: _ModelTokenizer,
+    token_budget: int,
+    top_k: int = 5,
+    min_trimmed_tokens: int = 48,
+) -> tuple[List[dict], int]:
+    """
+    Pack ranked chunks into at most `token_budget` tokens (served model's tokenizer).
+
+    Chunks are taken in rank order; one that does not fit is trimmed at a sentence
+    boundary when at least `min_trimmed_tokens` remain, otherwise skipped so a shorter,
+    lower-ranked chunk can still fit. Returns the packed chunks and their token count.
+    """
+    candidates = chunks[: top_k * 3]
+    counts = tokenizer.count_many([item.get("content") or "" for item in candidates])
+    packed: List[dict] = []
+    used = 0
+    for item, tokens in zip(candidates, counts):
+        remaining = token_budget - used
+        if tokens > remaining:
+            if remaining < min_trimmed_tokens:
+                continue
+            trimmed = _trim_to_sentences(item.get("content") or "", remaining, tokenizer, tokens)
+            if not trimmed:
+                continue
+            item = {**item, "content": trimmed + " …"}
+            tokens = tokenizer.count(item["content"])
+        packed.append(item)
+        used += tokens
+        if len(packed) >= top_k:
+            break
+    return packed, used
+
+
+def _context_token_budget(
+    tokenizer: _ModelTokenizer,
+    requested: int,
+    max_tokens: int,
+    prompt_overhead: int,
+    safety_margin: int = 64,
+) -> int:
+    """Requested budget, capped by what the model's context window leaves after the rest of the prompt and the answer."""
+    if not tokenizer.context_window:
+        return requested
+    available = tokenizer.context_window - max_tokens - prompt_overhead - safety_margin
+    return max(min(requested, available), 0)
+
+
+# Recap of evicted questions kept in the system message (see _compact_history)
+_RECAP_HEADER = "Earlier in this conversation the user asked:"
+_RECAP_MAX_QUESTIONS = 20
+_RECAP_MAX_CHARS = 200
+
+
+def _compact_history(
+    history: List[dict], tokenizer: _ModelTokenizer, budget: int
+) -> tuple[List[dict], List[str], int]:
+    """
+    Keep the replayed conversation (raw questions and answers, no retrieved context)
+    under `budget` tokens. Returns (kept turns, evicted questions, tokens of kept turns).
+
+    Over budget, the oldest question/answer pairs are evicted until the rest fits in half
+    of it, so evictions come in batches and the replayed prefix stays byte-identical (and
+    cached by vLLM prefix caching) between them.
+    """
+    counts = tokenizer.count_many([str(message.get("content", "")) for message in history])
+    total = sum(counts)
+    if total <= budget:
+        return history, [], total
+    start = 0
+    while start < len(history) and total > budget // 2:
+        end = start + 1
+        while end < len(history) and history[end].get("role") != "user":
+            end += 1
+        total -= sum(counts[start:end])
+        start = end
+    evicted = [str(message.get("content", "")) for message in history[:start] if message.get("role") == "user"]
+    return history[start:], evicted, total
+
+
+def _system_with_recap(system_prompt: str, recap: List[str]) -> str:
+    if not recap:
+        return system_prompt
+    questions = "\n".join(
+        f"- {' '.join(question.split())[:_RECAP_MAX_CHARS]}" for question in recap[-_RECAP_MAX_QUESTIONS:]
+    )
+    return f"{system_prompt}\n\n{_RECAP_HEADER}\n{questions}"
+
+
+def _fuse_chunks(chunks: List[dict], rrf_k: int = 60) -> List[dict]:
+    """
+    Merge per-collection results into one ranking with reciprocal rank fusion.
+
+    Scores from different collections (and embedding models, or BM25) are not comparable,
+    ranks are: each chunk scores sum(1 / (rrf_k + rank)) over the result lists that returned
+    it, one list per collection and retriever (identical text found by vector and lexical
+    search, or in several collections, adds up). Ties are broken by the min-max normalized
+    score within the list. Returns the fused order after
+    per-document dedupe; _pack_context then takes a global top-k under the token budget,
+    so the prompt stays the same size however many collections are selected. Warning
+    entries (failed or timed-out collections) are left out of the context.
+    """
+    per_collection: dict[tuple[str, str], List[dict]] = {}
+    for item in chunks:
+        if item.get("score") is None:
+            continue
+        per_collection.setdefault((item.get("vector_db") or "", item.get("retriever", "vector")), []).append(item)
+
+    fused: dict[str, dict] = {}
+    for items in per_collection.values():
+        ranked = sorted(items, key=lambda entry: entry["score"], reverse=True)
+        low, high = ranked[-1]["score"], ranked[0]["score"]
+        for rank, item in enumerate(ranked, start=1):
+            key = " ".join((item.get("content") or "").split())
+            normalized = (item["score"] - low) / (high - low) if high > low else 1.0
+            entry = fused.setdefault(key, {"item": item, "rrf": 0.0, "normalized": 0.0})
+            entry["rrf"] += 1.0 / (rrf_k + rank)
+            entry["normalized"] = max(entry["normalized"], normalized)
+
+    ordered = [
+        entry["item"]
+        for entry in sorted(fused.values(), key=lambda entry: (entry["rrf"], entry["normalized"]), reverse=True)
+    ]
+    return _dedupe_chunks_by_document(ordered)
+
+
+class _CrossEncoder:
+    """
+    ONNX cross-encoder (int8-quantized ms-marco-MiniLM-L-6-v2 by default) that scores
+    (query, chunk) pairs on CPU, shared by all sessions.
+
+    model_dir holds model.onnx and the Hugging Face tokenizer.json. Pairs are scored in
+    batches padded to the longest pair of the batch and truncated to max_length tokens.
+    """
+
+    def __init__(self, model_dir: str, max_length: int = 256, batch_size: int = 16, threads: int = 0):
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or min(os.cpu_count() or 1, 4)
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self._lock = threading.Lock()  # one scoring run at a time; batches already use all threads
+
+    def score(self, query: str, texts: List[str], deadline: float) -> List[float]:
+        """Scores in input order; stops between batches once `deadline` (monotonic) has passed."""
+        scores: List[float] = []
+        with self._lock:
+            for start in range(0, len(texts), self.batch_size):
+                if scores and time.monotonic() >= deadline:
+                    break
+                encodings = self.tokenizer.encode_batch([(query, text) for text in texts[start : start + self.batch_size]])
+                feeds = {
+                    "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                    "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                    "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+                }
+                logits = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+                scores.extend(float(row[0]) for row in np.asarray(logits).reshape(len(encodings), -1))
+        return scores
+
+
+@st.cache_resource
+def _reranker() -> Optional[_CrossEncoder]:
+    model_dir = os.environ.get("RAG_RERANKER_MODEL_DIR", "/models/reranker")
+    if ort is None or Tokenizer is None or not os.path.exists(os.path.join(model_dir, "model.onnx")):
+        return None
+    try:
+        return _CrossEncoder(model_dir, threads=int(os.environ.get("RAG_RERANKER_THREADS", "0")))
+    except Exception as exc:  # noqa: BLE001
+        print(f"[rerank] cross-encoder unavailable: {exc}")
+        return None
+
+
+def _rerank_chunks(
+    reranker: _CrossEncoder, query: str, chunks: List[dict], candidates: int, budget_ms: float
+) -> tuple[List[dict], dict]:
+    """
+    Re-order the first `candidates` fused chunks by cross-encoder relevance.
+
+    Scoring stops at the latency budget (checked between batches, so at least one batch is
+    scored): the scored prefix is re-ordered, the rest keeps its fused order behind it.
+    Returns the chunks and {"scored", "candidates", "latency_ms"}.
+    """
+    started = time.perf_counter()
+    pool = chunks[:candidates]
+    scores = reranker.score(
+        query, [item.get("content") or "" for item in pool], time.monotonic() + budget_ms / 1000
+    )
+    scored = sorted(
+        ({**item, "rerank_score": score} for item, score in zip(pool, scores)),
+        key=lambda item: item["rerank_score"],
+        reverse=True,
+    )
+    stats = {"scored": len(scores), "candidates": len(pool), "latency_ms": (time.perf_counter() - started) * 1000}
+    return scored + pool[len(scores) :] + chunks[candidates:], stats
+
+
 def _extract_vector_db_id(item) -> str:
     """
     Extract the human-readable vector DB name (not the UUID).
@@ -117,114 +937,380 @@ def _extract_vector_db_id(item) -> str:
     return getattr(item, "identifier", None) or getattr(item, "id", None) or ""
 
 
-def _list_shield_ids() -> List[str]:
-    try:
-        shields = llama_stack_api.client.shields.list()
-    except Exception:
-        return []
-    ids = []
-    for shield in shields:
-        identifier = getattr(shield, "identifier", None)
-        if identifier:
-            ids.append(identifier)
-    return ids
-
-
-def _filter_guardrail_messages(messages: list[dict]) -> list[dict]:
-    """Remove system messages and ensure assistant messages have required fields."""
-    filtered = []
-    for msg in messages:
-        if (msg or {}).get("role") == "system":
-            continue
-        
-        # Add required stop_reason field for assistant messages
-        if msg.get("role") == "assistant" and "stop_reason" not in msg:
-            msg = {**msg, "stop_reason": "end_of_turn"}
-        
-        filtered.append(msg)
-    
-    # If everything was filtered out, fall back to the original payload to avoid empty requests
-    return filtered if filtered else messages
+# Blue/green rebuild versions (stages/stage2-model-alignment/kfp: reindex_collection_pipeline).
+# They are served through the alias without the suffix, so they are hidden from the picker.
+_COLLECTION_VERSION_RE = re.compile(r"__(v\d{14}|legacy)$")
 
 
-def _extract_attr(candidate: object, attr: str, default=None):
-    if candidate is None:
-        return default
-    if isinstance(candidate, dict):
-        return candidate.get(attr, default)
-    value = getattr(candidate, attr, default)
-    if callable(value):
-        try:
-            return value()
-        except Exception:  # noqa: BLE001
-            return default
-    return value
+def _is_collection_version(vector_db_id: str) -> bool:
+    return bool(_COLLECTION_VERSION_RE.search(vector_db_id))
 
 
-def _normalize_violation(payload: object) -> Optional[object]:
-    if payload is None:
-        return None
+# Shared with the other pages (playground_common.verdict_cache)
+_VERDICTS = verdict_cache()
 
-    # Check violation_level first - "info" level indicates informational messages, not actual violations
-    violation_level = _extract_attr(payload, "violation_level")
-    if violation_level and str(violation_level).lower() in {"info", "informational"}:
-        # For info-level messages, still check if there are actual violations
-        pass  # Continue to status/summary checks below
 
-    # Extract metadata (TrustyAI provider returns status/summary nested in metadata)
-    metadata = _extract_attr(payload, "metadata")
-    
-    # Try to get status from metadata first, then fallback to top-level
-    status_raw = _extract_attr(metadata, "status") if metadata else None
-    if status_raw is None:
-        status_raw = _extract_attr(payload, "status")
-    
-    status_value = None
-    if isinstance(status_raw, str):
-        status_value = status_raw.lower()
-    elif hasattr(status_raw, "value"):
-        status_value = str(status_raw.value).lower()
-    elif status_raw is not None:
-        status_value = str(status_raw).lower()
-    if status_value in {"pass", "passed", "verified", "ok"}:
-        return None
+class _AnswerCache:
+    """
+    Process-wide semantic cache of Direct-mode answers, shared by all sessions.
+
+    Entries are grouped by scope (model, collections and their ingestion generation, system
+    prompt, output shield); a question hits when its embedding has cosine similarity of at
+    least the threshold with a cached question of the same scope. Switching or re-ingesting
+    a collection changes its generation (see _served_collections), so older answers stop
+    matching and age out (TTL, LRU beyond max_entries). Each entry records the generation
+    time it saves on a hit; retrieval runs next to the lookup and is not saved.
+    """
 
-    # Try to get summary from metadata first, then fallback to top-level
-    summary = _extract_attr(metadata, "summary") if metadata else None
-    if summary is None:
-        summary = _extract_attr(payload, "summary")
-    
-    if summary is not None:
-        messages_with_violations = _extract_attr(summary, "messages_with_violations", 0)
-        total_violations = _extract_attr(summary, "total_violations_found", 0)
+    def __init__(self, max_entries: int = 1000, ttl_s: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[int, dict]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.lookups = 0
+        self.gpu_s_saved = 0.0
+
+    @staticmethod
+    def scope(model_id: str, generations: dict[str, str], system_prompt: str, output_shield: str) -> tuple:
+        prompt_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+        return (model_id, tuple(sorted(generations.items())), prompt_hash, output_shield)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, scope: tuple, embedding: List[float], threshold: float) -> Optional[dict]:
+        query = self._normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            self.lookups += 1
+            for entry_id in [i for i, entry in self._entries.items() if entry["expires"] < now]:
+                del self._entries[entry_id]
+            candidates = [
+                (entry_id, entry)
+                for entry_id, entry in self._entries.items()
+                if entry["scope"] == scope and entry["vector"].shape == query.shape
+            ]
+            if not candidates:
+                return None
+            similarities = np.stack([entry["vector"] for _, entry in candidates]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < threshold:
+                return None
+            entry_id, entry = candidates[best]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            self.gpu_s_saved += entry["generation_s"]
+            return {**entry, "similarity": float(similarities[best])}
+
+    def put(self, scope: tuple, embedding: List[float], question: str, answer: str, generation_s: float) -> None:
+        with self._lock:
+            self._entries[self._next_id] = {
+                "scope": scope,
+                "vector": self._normalize(embedding),
+                "question": question,
+                "answer": answer,
+                "generation_s": generation_s,
+                "created": time.time(),
+                "expires": time.monotonic() + self.ttl_s,
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, vector_db_id: str) -> None:
+        """Drop answers grounded on a collection (e.g. after documents were added to it)."""
+        with self._lock:
+            for entry_id in [
+                i for i, entry in self._entries.items() if vector_db_id in dict(entry["scope"][1])
+            ]:
+                del self._entries[entry_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "lookups": self.lookups,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "gpu_s_saved": self.gpu_s_saved,
+            }
+
+
+@st.cache_resource
+def _answer_cache() -> _AnswerCache:
+    return _AnswerCache(
+        max_entries=int(os.environ.get("RAG_ANSWER_CACHE_ENTRIES", "1000")),
+        ttl_s=float(os.environ.get("RAG_ANSWER_CACHE_TTL_S", "3600")),
+    )
+
+
+def _embed_question(model_id: str, question: str) -> List[float]:
+    response = llama_stack_api.client.inference.embeddings(model_id=model_id, contents=[question])
+    return list(response.embeddings[0])
+
+
+def _convert_to_markdown(docling_url: str, filename: str, data: bytes, timeout_s: float = 600.0) -> str:
+    """Convert a document with docling-serve (same async API as process_with_docling)."""
+    response = requests.post(
+        f"{docling_url}/v1/convert/file/async",
+        files={"files": (filename, data)},
+        data={"to_formats": "md", "md_page_break_placeholder": PAGE_BREAK_PLACEHOLDER},
+        timeout=30,
+    )
+    response.raise_for_status()
+    task = response.json()
+    deadline = time.monotonic() + timeout_s
+    while task.get("task_status") not in ("success", "failure"):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Docling task {task.get('task_id')} did not complete within {timeout_s:.0f}s")
+        time.sleep(2)
+        response = requests.get(f"{docling_url}/v1/status/poll/{task['task_id']}", timeout=10)
+        response.raise_for_status()
+        task = response.json()
+    if task["task_status"] != "success":
+        raise RuntimeError(f"Docling conversion failed: {task}")
+    response = requests.get(f"{docling_url}/v1/result/{task['task_id']}", timeout=30)
+    response.raise_for_status()
+    result = response.json()
+    document = result.get("document") or (result.get("documents") or [{}])[0]
+    return document.get("md_content") or document.get("markdown") or result.get("markdown") or ""
+
+
+class _IngestionWorker:
+    """
+    Process-wide background ingestion of uploaded documents, shared by all sessions.
 
-        def _to_int(value):
+    A job registers the collection, then converts (docling-serve), chunks and inserts its
+    files in parallel on a thread pool, in vector_io.insert batches retried with backoff as
+    insert_via_llamastack does. Jobs run outside the Streamlit script thread; status()
+    reports their progress. Without docling_url, files other than text/markdown go
+    through rag_tool.insert, which parses and chunks them server-side.
+
+    document_types_dir holds the pipelines' per-collection document type tables
+    (kfp/document-types/<vector_db_id>.json), so uploads get the same document_type.
+    """
+
+    TEXT_SUFFIXES = (".txt", ".md")
+
+    def __init__(
+        self,
+        client,
+        docling_url: str = "",
+        workers: int = 4,
+        batch_size: int = 100,
+        chunk_size: int = 512,
+        chunk_overlap: int = 0,
+        document_types_dir: str = "",
+        max_jobs: int = 50,
+    ):
+        self.client = client
+        self.docling_url = docling_url.rstrip("/")
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.document_types_dir = document_types_dir
+        self.max_jobs = max_jobs
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        vector_db_id: str,
+        files: List[tuple[str, bytes]],
+        embedding_model: str,
+        embedding_dimension: int,
+        provider_id: Optional[str],
+        on_done=None,
+    ) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._jobs[job_id] = {
+                "vector_db_id": vector_db_id,
+                "state": "registering",
+                "files": len(files),
+                "files_done": 0,
+                "files_failed": 0,
+                "chunks": 0,
+                "chunks_inserted": 0,
+                "errors": [],
+                "started": time.time(),
+                "finished": None,
+            }
+            finished = [i for i, job in self._jobs.items() if job["finished"] is not None]
+            for old_id in finished[: max(len(self._jobs) - self.max_jobs, 0)]:
+                del self._jobs[old_id]
+        threading.Thread(
+            target=self._run,
+            args=(job_id, vector_db_id, files, embedding_model, embedding_dimension, provider_id, on_done),
+            name=f"ingest-{job_id}",
+            daemon=True,
+        ).start()
+        return job_id
+
+    def status(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return {**job, "errors": list(job["errors"])} if job else None
+
+    def _update(self, job_id: str, error: Optional[str] = None, **increments) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            for key, value in increments.items():
+                job[key] = job[key] + value if isinstance(value, int) else value
+            if error:
+                job["errors"].append(error)
+
+    def _run(self, job_id, vector_db_id, files, embedding_model, embedding_dimension, provider_id, on_done) -> None:
+        try:
+            self.client.vector_dbs.register(
+                vector_db_id=vector_db_id,
+                embedding_dimension=embedding_dimension,
+                embedding_model=embedding_model,
+                provider_id=provider_id,
+            )
+        except Exception as exc:  # noqa: BLE001
+            self._update(job_id, error=f"register {vector_db_id}: {exc}", state="failed", finished=time.time())
+            return
+        self._update(job_id, state="ingesting")
+        futures = [self._pool.submit(self._ingest_file, job_id, vector_db_id, name, data) for name, data in files]
+        wait(futures)
+        with self._lock:
+            job = self._jobs[job_id]
+            job["state"] = "failed" if job["files_failed"] == job["files"] else "done"
+            job["finished"] = time.time()
+        if on_done is not None:
+            on_done()
+
+    def _document_type_keywords(self, vector_db_id: str) -> list:
+        path = os.path.join(self.document_types_dir, f"{vector_db_id}.json")
+        if not self.document_types_dir or not os.path.isfile(path):
+            return []  # markdown_chunker's default table
+        with open(path) as f:
+            return json.load(f)
+
+    def _ingest_file(self, job_id: str, vector_db_id: str, filename: str, data: bytes) -> None:
+        try:
+            if filename.lower().endswith(self.TEXT_SUFFIXES):
+                markdown = data.decode("utf-8", errors="replace")
+            elif self.docling_url:
+                markdown = _convert_to_markdown(self.docling_url, filename, data)
+            else:
+                mime_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                self.client.tool_runtime.rag_tool.insert(
+                    vector_db_id=vector_db_id,
+                    documents=[
+                        RAGDocument(
+                            document_id=filename,
+                            content=f"data:{mime_type};base64,{base64.b64encode(data).decode('ascii')}",
+                        )
+                    ],
+                    chunk_size_in_tokens=self.chunk_size,
+                )
+                self._update(job_id, files_done=1)
+                return
+
+            # Same chunk records as chunk_markdown + insert_via_llamastack
+            source_uri = f"upload://{vector_db_id}/{filename}"
+            chunks = []
+            keywords = self._document_type_keywords(vector_db_id)
+            for i, chunk in enumerate(
+                chunk_document(markdown, filename, self.chunk_size, self.chunk_overlap, document_type_keywords=keywords)
+            ):
+                text = chunk["text"].strip()
+                chunks.append({
+                    "content": text,
+                    "metadata": {
+                        "document_id": os.path.splitext(filename)[0],
+                        "chunk_index": i,
+                        "chunk_id": i,
+                        "source_uri": source_uri,
+                        "token_count": len(text) // 4,
+                        "character_count": len(text),
+                        **chunk["metadata"],
+                    },
+                })
+            self._update(job_id, chunks=len(chunks))
+            for start in range(0, len(chunks), self.batch_size):
+                batch = chunks[start:start + self.batch_size]
+                self._insert_batch(vector_db_id, batch)
+                self._update(job_id, chunks_inserted=len(batch))
+            self._update(job_id, files_done=1)
+        except Exception as exc:  # noqa: BLE001
+            print(f"[ingest] {vector_db_id}/{filename} failed: {exc}")
+            self._update(job_id, error=f"{filename}: {exc}", files_failed=1)
+
+    def _insert_batch(self, vector_db_id: str, batch: List[dict], max_retries: int = 5) -> None:
+        for attempt in range(max_retries):
             try:
-                return int(value)
-            except (TypeError, ValueError):
-                return value
+                self.client.vector_io.insert(
+                    vector_db_id=vector_db_id,
+                    chunks=batch,
+                    timeout=min(600, len(batch) * 3 + 120),
+                )
+                return
+            except Exception:  # noqa: BLE001
+                if attempt == max_retries - 1:
+                    raise
+                time.sleep(min(30, 2 ** attempt))
+
+
+@st.cache_resource
+def _ingestion_worker() -> _IngestionWorker:
+    return _IngestionWorker(
+        llama_stack_api.client,
+        docling_url=os.environ.get("RAG_DOCLING_URL", ""),
+        workers=int(os.environ.get("RAG_INGEST_WORKERS", "4")),
+        chunk_size=int(os.environ.get("RAG_INGEST_CHUNK_SIZE", "512")),
+        chunk_overlap=int(os.environ.get("RAG_INGEST_CHUNK_OVERLAP", "0")),
+        document_types_dir=os.environ.get("RAG_DOCUMENT_TYPES_DIR", "/app/document-types"),
+    )
 
-        if _to_int(messages_with_violations) in (0, "0") and _to_int(total_violations) in (0, "0"):
-            return None
 
-    return payload
+def _embedding_dimension(model) -> int:
+    """Dimension of a registered embedding model (metadata, else probed with one embedding)."""
+    dimension = (getattr(model, "metadata", None) or {}).get("embedding_dimension")
+    return int(dimension) if dimension else len(_embed_question(model.identifier, "dimension probe"))
 
 
-def _run_guardrail(
-    shield_id: str,
-    messages: Iterable[dict],
-) -> tuple[Optional[object], Optional[Exception]]:
-    try:
-        result = llama_stack_api.client.safety.run_shield(
-            shield_id=shield_id,
-            messages=_filter_guardrail_messages(list(messages)),
-            params={},
+def _render_ingestion_jobs(worker: _IngestionWorker, job_ids: List[str]) -> None:
+    rerun = False
+    for job_id in job_ids:
+        job = worker.status(job_id)
+        if job is None:
+            continue
+        processed = job["files_done"] + job["files_failed"]
+        label = (
+            f"{job['vector_db_id']}: {processed}/{job['files']} files, "
+            f"{job['chunks_inserted']}/{job['chunks']} chunks ({job['state']})"
         )
-    except Exception as exc:  # noqa: BLE001
-        return None, exc
+        st.progress(processed / job["files"] if job["files"] else 1.0, text=label)
+        for error in job["errors"][-3:]:
+            st.warning(error)
+        if job["finished"] is not None and job_id not in st.session_state.ingestion_announced:
+            # Full rerun once, so the collection list picks up the new collection
+            st.session_state.ingestion_announced.add(job_id)
+            rerun = True
+    if rerun:
+        st.rerun()
+
 
-    violation = getattr(result, "violation", None)
-    return _normalize_violation(violation), None
+def _first_violation(checks: List[Future]) -> tuple[Optional[object], Optional[Exception]]:
+    """
+    Wait for concurrent run_guardrail calls; the first violation wins without waiting
+    for the remaining checks. Otherwise returns the first error (or (None, None)).
+    """
+    first_error = None
+    for future in as_completed(checks):
+        violation, error = future.result()
+        if violation is not None:
+            return violation, error
+        first_error = first_error or error
+    return None, first_error
 
 
 def _guardrail_block_message(violation: object, shield_id: str) -> str:
@@ -243,19 +1329,25 @@ def rag_chat_page():
     st.title("🦙 RAG")
 
     def reset_agent_and_chat():
+        # Agents are cached per settings (create_agent); the retrieval cache is shared
+        # across sessions, so cached resources are not cleared here.
         st.session_state.clear()
-        st.cache_resource.clear()
 
     def should_disable_input():
         return "displayed_messages" in st.session_state and len(st.session_state.displayed_messages) > 0
 
     with st.sidebar:
+        if st.button("🔄 Refresh catalog", help="Re-read models, shields and collections from Llama Stack."):
+            _CATALOG.refresh()
+        _CATALOG.warm("models", "shields", "vector_dbs")
+        st.caption(f"Catalog fetched {_CATALOG.age_s() or 0:.0f}s ago, refreshed every {_CATALOG.ttl_s:.0f}s.")
+
         # File/Directory Upload Section
         st.subheader("Upload Documents", divider=True)
         uploaded_files = st.file_uploader(
             "Upload file(s) or directory",
             accept_multiple_files=True,
-            type=["txt", "pdf", "doc", "docx"],  # Add more file types as needed
+            type=["txt", "md", "pdf", "doc", "docx"],  # Add more file types as needed
         )
         # Process uploaded files
         if uploaded_files:
@@ -266,32 +1358,46 @@ def rag_chat_page():
                 value="rag_vector_db",
                 help="Enter a unique identifier for this document collection",
             )
-            if st.button("Create Document Collection"):
-                documents = [
-                    RAGDocument(
-                        document_id=uploaded_file.name,
-                        content=data_url_from_file(uploaded_file),
-                    )
-                    for uploaded_file in uploaded_files
-                ]
-
-                providers = llama_stack_api.client.providers.list()
+            (catalog_models, providers) = _CATALOG.get("models", "providers")
+            embedding_models = [m for m in catalog_models if getattr(m, "model_type", None) == "embedding"]
+            embedding_model = st.selectbox(
+                "Embedding model",
+                embedding_models,
+                format_func=lambda m: m.identifier,
+                help="The collection is registered with this model's embedding dimension.",
+            )
+            if st.button("Create Document Collection", disabled=embedding_model is None):
                 vector_io_provider = next((x.provider_id for x in providers if x.api == "vector_io"), None)
-
-                llama_stack_api.client.vector_dbs.register(
-                    vector_db_id=vector_db_name,  # Use the user-provided name
-                    embedding_dimension=384,
-                    embedding_model="all-MiniLM-L6-v2",
+                answer_cache, retrieval_cache = _answer_cache(), _retrieval_cache()
+                job_id = _ingestion_worker().submit(
+                    vector_db_name,  # Use the user-provided name
+                    [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files],
+                    embedding_model=embedding_model.identifier,
+                    embedding_dimension=_embedding_dimension(embedding_model),
                     provider_id=vector_io_provider,
+                    # Uploads write no ingestion stamp: drop what was cached for the collection
+                    on_done=lambda: (
+                        _CATALOG.refresh("vector_dbs"),
+                        retrieval_cache.invalidate(vector_db_name),
+                        answer_cache.invalidate(vector_db_name),
+                    ),
                 )
-
-                # insert documents using the custom vector db name
-                llama_stack_api.client.tool_runtime.rag_tool.insert(
-                    vector_db_id=vector_db_name,  # Use the user-provided name
-                    documents=documents,
-                    chunk_size_in_tokens=512,
-                )
-                st.success("Vector database created successfully!")
+                st.session_state.setdefault("ingestion_jobs", []).append(job_id)
+
+        # Ingestion runs in the background; progress refreshes on its own where fragments exist
+        st.session_state.setdefault("ingestion_announced", set())
+        ingestion_jobs = st.session_state.get("ingestion_jobs", [])
+        if ingestion_jobs:
+            worker = _ingestion_worker()
+            running = any(
+                (worker.status(job_id) or {}).get("finished", 0) is None for job_id in ingestion_jobs
+            )
+            if running and hasattr(st, "fragment"):
+                st.fragment(run_every=2)(_render_ingestion_jobs)(worker, ingestion_jobs)
+            else:
+                _render_ingestion_jobs(worker, ingestion_jobs)
+                if running:
+                    st.button("🔄 Refresh ingestion status")
 
         st.subheader("RAG Parameters", divider=True)
 
@@ -307,18 +1413,133 @@ def rag_chat_page():
         )
 
         # select memory banks
-        vector_dbs = llama_stack_api.client.vector_dbs.list()
+        (vector_dbs,) = _CATALOG.get("vector_dbs")
         vector_dbs = [_extract_vector_db_id(vector_db) for vector_db in vector_dbs]
-        vector_dbs = [vector_db for vector_db in vector_dbs if vector_db]
+        vector_dbs = [
+            vector_db for vector_db in vector_dbs if vector_db and not _is_collection_version(vector_db)
+        ]
         selected_vector_dbs = st.multiselect(
             label="Select Document Collections to use in RAG queries",
             options=vector_dbs,
             on_change=reset_agent_and_chat,
             disabled=should_disable_input(),
         )
+        # Served collection and ingestion stamp per selected collection; cached results of
+        # another generation (alias switch, re-ingest) are dropped
+        served_collections = _served_collections(selected_vector_dbs)
+        retrieval_cache = _retrieval_cache()
+        for vector_db_id, state in served_collections.items():
+            retrieval_cache.invalidate(vector_db_id, state["generation"])
+        retrieval_timeout = st.slider(
+            "Retrieval timeout (s)",
+            min_value=0.5,
+            max_value=10.0,
+            value=3.0,
+            step=0.5,
+            help="Direct mode queries the selected collections in parallel; slower collections are skipped.",
+        )
+        context_top_k = st.slider(
+            "Context chunks",
+            min_value=1,
+            max_value=20,
+            value=5,
+            help="Chunks sent to the model in Direct mode, fused across all selected collections.",
+        )
+        context_token_budget = st.slider(
+            "Context token budget",
+            min_value=256,
+            max_value=8192,
+            value=1536,
+            step=256,
+            help="Upper bound for the retrieved context in the prompt, counted with the model's tokenizer "
+            "and capped by its context window minus Max tokens (bounds TTFT and KV-cache use).",
+        )
+        reranker = _reranker()
+        use_reranker = st.checkbox(
+            "Rerank with cross-encoder",
+            value=reranker is not None,
+            disabled=reranker is None,
+            help="Over-retrieve, score every candidate against the question with a CPU cross-encoder (ONNX) and "
+            "send only the best Context chunks. Needs onnxruntime, tokenizers and the model in RAG_RERANKER_MODEL_DIR.",
+        )
+        rerank_candidates = st.slider(
+            "Rerank candidates",
+            min_value=5,
+            max_value=50,
+            value=20,
+            step=5,
+            disabled=not use_reranker,
+            help="Fused candidates (across all selected collections) scored by the reranker.",
+        )
+        rerank_budget_ms = st.slider(
+            "Rerank latency budget (ms)",
+            min_value=50,
+            max_value=2000,
+            value=300,
+            step=50,
+            disabled=not use_reranker,
+            help="Scoring stops at the budget; unscored candidates keep their fused order.",
+        )
+        history_token_budget = st.slider(
+            "History token budget",
+            min_value=0,
+            max_value=8192,
+            value=2048,
+            step=256,
+            help="Earlier questions and answers replayed in Direct mode (retrieved context is only sent with "
+            "the current question). Older turns are dropped in batches and listed in the system prompt.",
+        )
+        lexical_indexes = _lexical_indexes()
+        use_lexical = st.checkbox(
+            "Hybrid lexical search (BM25)",
+            value=lexical_indexes is not None,
+            disabled=lexical_indexes is None,
+            help="Also search the collections' BM25 index built by the ingestion pipeline and fuse both result "
+            "lists, so exact IDs, part numbers and article numbers are found without a larger top-k. "
+            "Needs RAG_LEXICAL_INDEX_URI and boto3.",
+        )
+        use_retrieval_cache = st.checkbox(
+            "Cache retrieval results",
+            value=True,
+            help="Reuse results of repeated questions (shared by all users, dropped when a collection is reindexed).",
+        )
+        cache_stats = retrieval_cache.stats()
+        st.caption(
+            f"Retrieval cache: {cache_stats['hit_rate']:.0%} hit rate "
+            f"({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}), "
+            f"{cache_stats['entries']} entries, {cache_stats['bytes'] / 1e6:.1f} MB"
+        )
+        answer_cache = _answer_cache()
+        (catalog_models,) = _CATALOG.get("models")
+        answer_cache_model = os.environ.get("RAG_ANSWER_CACHE_EMBEDDING_MODEL") or next(
+            (m.identifier for m in catalog_models if getattr(m, "model_type", None) == "embedding"), ""
+        )
+        use_answer_cache = st.checkbox(
+            "Semantic answer cache",
+            value=bool(answer_cache_model),
+            disabled=not answer_cache_model,
+            help="Answer the first question of a conversation from a previous answer to a similar question "
+            "(same model, collections and system prompt; shared by all users, dropped when a collection is "
+            "re-ingested). Follow-up questions always go to the model.",
+        )
+        answer_cache_threshold = st.slider(
+            "Answer cache similarity",
+            min_value=0.80,
+            max_value=0.99,
+            value=0.92,
+            step=0.01,
+            disabled=not use_answer_cache,
+            help=f"Minimum cosine similarity of the question embeddings ({answer_cache_model or 'no embedding model'}).",
+        )
+        answer_stats = answer_cache.stats()
+        st.caption(
+            f"Answer cache: {answer_stats['hit_rate']:.0%} hit rate ({answer_stats['hits']}/{answer_stats['lookups']}), "
+            f"{answer_stats['entries']} answers, ~{answer_stats['gpu_s_saved']:.0f} GPU-s saved"
+        )
 
         st.subheader("Guardrails", divider=True)
-        shield_ids = _list_shield_ids()
+        _VERDICTS.versions = shield_versions()
+        shield_ids = list(_VERDICTS.versions)
         if not shield_ids:
             st.caption("No guardrails registered in Llama Stack.")
         guardrail_enabled = st.checkbox(
@@ -341,14 +1562,20 @@ def rag_chat_page():
         guardrail_apply_to_response = st.checkbox(
             "Screen assistant responses",
             value=True,
-            help="When enabled, the guardrail checks the model response before it is displayed.",
+            help="When enabled, the guardrail checks the response while it streams; unscreened text is held back "
+            "and generation stops at the first violation.",
             disabled=not guardrail_enabled,
         )
         if guardrail_enabled:
             st.caption("Guardrail applies before executing the model call.")
+            verdict_stats = _VERDICTS.stats()
+            st.caption(
+                f"Verdict cache: {verdict_stats['hit_rate']:.0%} of checks answered from cache "
+                f"({verdict_stats['hits']}/{verdict_stats['lookups']}), {verdict_stats['entries']} passes stored"
+            )
 
         st.subheader("Inference Parameters", divider=True)
-        available_models = llama_stack_api.client.models.list()
+        (available_models,) = _CATALOG.get("models")
         available_models = [model.identifier for model in available_models if model.model_type == "llm"]
         selected_model = st.selectbox(
             label="Choose a model",
@@ -435,6 +1662,8 @@ def rag_chat_page():
     for message in st.session_state.displayed_messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
+        if "waterfall" in message:
+            render_waterfall(*message["waterfall"])
 
     if temperature > 0.0:
         strategy = {
@@ -457,8 +1686,8 @@ def rag_chat_page():
         sort_keys=True,
     )
 
-    @st.cache_resource
-    def create_agent(_cache_key: str):
+    @st.cache_resource(max_entries=8)
+    def create_agent(cache_key: str):
         agent_tools = [
             dict(
                 name="builtin::rag/knowledge_search",
@@ -494,16 +1723,17 @@ def rag_chat_page():
 
         session_id = st.session_state["agent_session_id"]
 
-    def agent_process_prompt(prompt):
+    def agent_process_prompt(prompt, turn: TurnTrace):
         guardrail_violation = None
         guardrail_error = None
         if guardrail_enabled and selected_shield:
-            guardrail_violation, guardrail_error = _run_guardrail(
+            guardrail_violation, guardrail_error = run_guardrail(
                 selected_shield,
                 [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt},
                 ],
+                turn,
             )
         if guardrail_error:
             st.warning(f"Guardrail check failed: {guardrail_error}")
@@ -521,6 +1751,7 @@ def rag_chat_page():
         # which causes vLLM 400 errors. Call the underlying agents API directly instead.
         turn_tool_config = {"tool_choice": "required"} if agent.agent_config.get("toolgroups") else {"tool_choice": "none"}
         
+        stream_started = time.time()
         response = llama_stack_api.client.agents.turn.create(
             agent_id=agent.agent_id,
             session_id=session_id,
@@ -539,6 +1770,20 @@ def rag_chat_page():
             message_placeholder = st.empty()
             full_response = ""
             tool_event_outputs: list[str] = []
+            output_guard = None
+            if guardrail_enabled and guardrail_apply_to_response and selected_shield:
+                output_guard = StreamingGuardrail(
+                    selected_shield,
+                    [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt},
+                    ],
+                    turn=turn,
+                )
+            # TTFT covers the agent's server-side knowledge search, which happens before the answer
+            first_token_at = None
+            streamed_tokens = 0
+            render_s = 0.0
             for log in AgentEventLogger().log(response):
                 log.print()
                 if log.role == "tool_execution":
@@ -550,23 +1795,33 @@ def rag_chat_page():
                     tool_event_outputs.append(tool_output)
                     retrieval_message_placeholder.info("\n\n".join(tool_event_outputs))
                 else:
+                    first_token_at = first_token_at or time.time()
+                    streamed_tokens += 1
                     full_response += log.content
-                    message_placeholder.markdown(full_response + "▌")
+                    if output_guard and not output_guard.feed(log.content):
+                        close_stream(response)  # violation: stop the turn
+                        break
+                    render_started = time.perf_counter()
+                    message_placeholder.markdown((output_guard.visible if output_guard else full_response) + "▌")
+                    render_s += time.perf_counter() - render_started
+            turn.add_generation(
+                stream_started,
+                first_token_at,
+                time.time(),
+                streamed_tokens,
+                render_s,
+                **{"gen_ai.request.model": selected_model},
+            )
 
             post_guardrail_violation = None
             post_guardrail_error = None
-            if guardrail_enabled and guardrail_apply_to_response and selected_shield:
-                post_guardrail_violation, post_guardrail_error = _run_guardrail(
-                    selected_shield,
-                    [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": prompt},
-                        {"role": "assistant", "content": full_response},
-                    ],
-                )
+            if output_guard:
+                post_guardrail_violation = output_guard.finish()
+                post_guardrail_error = output_guard.error
                 if post_guardrail_error:
                     st.warning(f"Guardrail response check failed: {post_guardrail_error}")
 
+            render_started = time.time()
             if post_guardrail_violation:
                 guardrail_message = _guardrail_block_message(post_guardrail_violation, selected_shield)
                 message_placeholder.markdown(guardrail_message)
@@ -576,8 +1831,9 @@ def rag_chat_page():
                 message_placeholder.markdown(full_response)
                 st.session_state.messages.append({"role": "assistant", "content": full_response})
                 st.session_state.displayed_messages.append({"role": "assistant", "content": full_response})
+            turn.add("ui.render", render_started, time.time())
 
-    def direct_process_prompt(prompt):
+    def direct_process_prompt(prompt, turn: TurnTrace):
         if len(st.session_state.messages) == 0:
             st.session_state.messages.append({"role": "system", "content": system_prompt})
 
@@ -585,58 +1841,144 @@ def rag_chat_page():
             st.warning("Select at least one document collection to run RAG.")
             return
 
-        retrieved_chunks: List[dict] = []
-        for vector_db_id in selected_vector_dbs:
+        # Prompt shield, retrieval and the prompt-size count run concurrently; the context
+        # shield starts as soon as the context is packed. The critical path before the model
+        # call is max(retrieval + context check, prompt check), and a prompt violation ends
+        # the turn without waiting for retrieval.
+        screen = guardrail_enabled and bool(selected_shield)
+        tokenizer = _model_tokenizer(selected_model)
+        turn_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag-turn")
+        guardrail_checks: List[Future] = []
+        if screen:
+            pre_messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt},
+            ]
+            guardrail_checks.append(turn_pool.submit(run_guardrail, selected_shield, pre_messages, turn))
+        # Semantic answer cache: the question is embedded next to the prompt check and retrieval
+        # (a hit saves the generation; retrieval is not held back for the lookup). Only the first
+        # question of a conversation is cached (follow-ups depend on the history).
+        answer_scope = None
+        embedding_future = None
+        if use_answer_cache and len(st.session_state.messages) == 1:
+            # Generation: served collection plus its ingestion stamp, read in the sidebar
+            generations = {
+                vector_db_id: served_collections[vector_db_id]["generation"] for vector_db_id in selected_vector_dbs
+            }
+            output_shield = selected_shield if guardrail_enabled and guardrail_apply_to_response else ""
+            answer_scope = _AnswerCache.scope(selected_model, generations, system_prompt, output_shield)
+            embedding_future = turn_pool.submit(_embed_question, answer_cache_model, prompt)
+            lookup_started = time.time()
+
+        # With the reranker, over-retrieve so the candidate pool is filled across collections
+        retrieval_top_k = 5
+        if use_reranker:
+            retrieval_top_k = max(5, -(-rerank_candidates // len(selected_vector_dbs)))
+        retrieval_started = time.time()
+        retrieval_future = turn_pool.submit(
+            _retrieve_concurrently,
+            list(selected_vector_dbs),
+            prompt,
+            top_k=retrieval_top_k,
+            timeout_s=retrieval_timeout,
+            cache=retrieval_cache if use_retrieval_cache else None,
+            collections=served_collections,
+            lexical=lexical_indexes if use_lexical else None,
+        )
+        history_future = turn_pool.submit(
+            _compact_history, st.session_state.messages[1:], tokenizer, history_token_budget
+        )
+        overhead_future = turn_pool.submit(
+            tokenizer.count, "\n".join([st.session_state.messages[0]["content"], prompt])
+        )
+
+        cached_answer = None
+        question_embedding = None
+        if embedding_future is not None:
             try:
-                query_result = llama_stack_api.client.vector_io.query(
-                    vector_db_id=vector_db_id,
-                    query=prompt,
-                    params={"top_k": 5},
+                question_embedding = embedding_future.result(timeout=retrieval_timeout)
+                cached_answer = answer_cache.lookup(answer_scope, question_embedding, answer_cache_threshold)
+            except Exception as exc:  # noqa: BLE001 - the cache only saves work
+                print(f"[answer-cache] lookup skipped: {exc}")
+            turn.add("answer_cache.lookup", lookup_started, time.time(), **{"answer_cache.hit": cached_answer is not None})
+
+        guardrail_violation = None
+        guardrail_error = None
+        if cached_answer is not None:
+            retrieval_future.cancel()  # only drops it if it has not started yet
+            if guardrail_checks:  # the prompt is still screened; the answer was when it was cached
+                guardrail_violation, guardrail_error = guardrail_checks[0].result()
+        elif guardrail_checks:
+            done, _ = wait([guardrail_checks[0], retrieval_future], return_when=FIRST_COMPLETED)
+            if guardrail_checks[0] in done:
+                guardrail_violation, guardrail_error = guardrail_checks[0].result()
+
+        if guardrail_violation is None and cached_answer is None:
+            retrieved_chunks, retrieval_stats = retrieval_future.result()
+            retrieval_ended = time.time()
+            for source, item in retrieval_stats.items():
+                latency_ms = item["latency_ms"]
+                turn.add(
+                    "retrieval",
+                    retrieval_started,
+                    retrieval_started + latency_ms / 1000 if latency_ms is not None else retrieval_ended,
+                    **{
+                        "rag.collection": source.split(" ", 1)[0],
+                        "rag.retriever": "bm25" if source.endswith(" bm25") else "vector",
+                        "rag.status": item["status"],
+                        "rag.chunks": item["chunks"],
+                    },
                 )
-                for chunk, score in zip(query_result.chunks or [], query_result.scores or []):
-                    chunk_text = getattr(chunk, "content", "") or ""
-                    metadata = getattr(chunk, "metadata", {}) or {}
-                    retrieved_chunks.append(
-                        {
-                            "vector_db": vector_db_id,
-                            "score": score,
-                            "content": chunk_text,
-                            "metadata": metadata,
-                        }
+
+            # Conversation memory: the system message (plus recap of evicted questions) and
+            # the raw turns that fit the history budget; only this turn carries context
+            history, evicted, history_tokens = history_future.result()
+            prompt_overhead = overhead_future.result() + history_tokens
+            if evicted:
+                recap = st.session_state.get("history_recap", []) + evicted
+                st.session_state.history_recap = recap[-_RECAP_MAX_QUESTIONS:]
+                system_message = {"role": "system", "content": _system_with_recap(system_prompt, recap)}
+                st.session_state.messages = [system_message] + history
+                prompt_overhead += sum(_estimate_tokens(question[:_RECAP_MAX_CHARS]) for question in evicted)
+
+            # Candidates: top 5 per collection (more when reranking); context: one fused (and
+            # reranked) top-k under the token budget
+            token_budget = _context_token_budget(tokenizer, context_token_budget, max_tokens, prompt_overhead)
+            ranked_chunks = _fuse_chunks(retrieved_chunks)
+            rerank_stats = None
+            if use_reranker and ranked_chunks:
+                with turn.span("rerank") as span_attributes:
+                    ranked_chunks, rerank_stats = _rerank_chunks(
+                        reranker, prompt, ranked_chunks, rerank_candidates, rerank_budget_ms
                     )
-            except Exception as err:
-                retrieved_chunks.append(
-                    {
-                        "vector_db": vector_db_id,
-                        "score": None,
-                        "content": f"⚠️ Retrieval failed: {err}",
-                        "metadata": {},
-                    }
+                    span_attributes.update({"rerank.candidates": rerank_stats["candidates"], "rerank.scored": rerank_stats["scored"]})
+            with turn.span("context.pack") as span_attributes:
+                context_chunks, context_tokens = _pack_context(
+                    ranked_chunks, tokenizer, token_budget, top_k=context_top_k
                 )
+                span_attributes.update({"rag.context_chunks": len(context_chunks), "rag.context_tokens": context_tokens})
+            prompt_context = _format_retrieved_context(context_chunks)
 
-        deduped_chunks = _dedupe_chunks_by_document(retrieved_chunks)
-        prompt_context = _format_retrieved_context(deduped_chunks)
-
-        guardrail_violation = None
-        guardrail_error = None
-        if guardrail_enabled and selected_shield:
-            pre_messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt},
-            ]
-            guardrail_violation, guardrail_error = _run_guardrail(selected_shield, pre_messages)
-            if guardrail_violation is None and guardrail_apply_to_context:
+            if screen and guardrail_apply_to_context:
                 extended_prompt_preview = (
                     "Please answer the following query using the context below.\n\n"
                     f"CONTEXT:\n{prompt_context}\n\nQUERY:\n{prompt}"
                 )
-                guardrail_violation, guardrail_error = _run_guardrail(
-                    selected_shield,
-                    [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": extended_prompt_preview},
-                    ],
+                guardrail_checks.append(
+                    turn_pool.submit(
+                        run_guardrail,
+                        selected_shield,
+                        [
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": extended_prompt_preview},
+                        ],
+                        turn,
+                        "context",
+                    )
                 )
+            if guardrail_checks:
+                guardrail_violation, guardrail_error = _first_violation(guardrail_checks)
+        turn_pool.shutdown(wait=False, cancel_futures=True)  # abandon checks/retrieval still running
 
         if guardrail_error:
             st.warning(f"Guardrail check failed: {guardrail_error}")
@@ -648,22 +1990,59 @@ def rag_chat_page():
                 st.markdown(guardrail_message)
             return
 
+        if cached_answer is not None:
+            label = (
+                f"♻️ *Cached answer: {cached_answer['similarity']:.0%} similar to "
+                f"\"{' '.join(cached_answer['question'].split())[:120]}\", "
+                f"{(time.time() - cached_answer['created']) / 60:.0f} min old, "
+                f"~{cached_answer['generation_s']:.1f} GPU-s saved*"
+            )
+            answer = cached_answer["answer"]
+            with turn.span("ui.render"), st.chat_message("assistant"):
+                st.caption(label)
+                st.write_stream(answer[i : i + 64] for i in range(0, len(answer), 64))
+            st.session_state.messages.extend(
+                [{"role": "user", "content": prompt}, {"role": "assistant", "content": answer, "stop_reason": "end_of_message"}]
+            )
+            st.session_state.displayed_messages.append({"role": "assistant", "content": f"{label}\n\n{answer}"})
+            return
+
         extended_prompt = (
             "Please answer the following query using the context below.\n\n"
             f"CONTEXT:\n{prompt_context}\n\nQUERY:\n{prompt}"
         )
-        user_message = {"role": "user", "content": extended_prompt}
-        conversation_messages = st.session_state.messages + [user_message]
+        # Stored without its context: later turns replay the question, not the chunks
+        user_message = {"role": "user", "content": prompt}
+        conversation_messages = st.session_state.messages + [{"role": "user", "content": extended_prompt}]
 
         with st.chat_message("assistant"):
+            st.caption(
+                f"{_format_retrieval_stats(retrieval_stats)} · context {len(context_chunks)} chunk(s), "
+                f"{'' if tokenizer.exact else '~'}{context_tokens}/{token_budget} tokens · "
+                f"history {len(history) // 2} turn(s), {history_tokens} tokens"
+                + (
+                    f" · rerank {rerank_stats['scored']}/{rerank_stats['candidates']} in "
+                    f"{rerank_stats['latency_ms']:.0f} ms"
+                    if rerank_stats
+                    else ""
+                )
+            )
             retrieval_message_placeholder = st.empty()
             message_placeholder = st.empty()
             full_response = ""
 
             retrieval_message_placeholder.info(prompt_context)
 
-            # Always stream responses, even with guardrails enabled
-            # We'll stream the response, then check it afterwards
+            # Always stream responses, even with guardrails enabled: the output shield screens
+            # the stream in windows and only screened text is shown
+            output_guard = None
+            if guardrail_enabled and guardrail_apply_to_response and selected_shield:
+                output_guard = StreamingGuardrail(selected_shield, conversation_messages, turn=turn)
+            generation_started = time.perf_counter()
+            stream_started = time.time()
+            first_token_at = None
+            streamed_tokens = 0
+            render_s = 0.0
             response = llama_stack_api.client.inference.chat_completion(
                 messages=conversation_messages,
                 model_id=selected_model,
@@ -681,26 +2060,33 @@ def rag_chat_page():
                         f"{prompt_context}\n\n{response_delta.tool_call.replace('====', '').strip()}"
                     )
                 else:
+                    first_token_at = first_token_at or time.time()
+                    streamed_tokens += 1
                     full_response += chunk.event.delta.text
-                    message_placeholder.markdown(full_response + "▌")
-            message_placeholder.markdown(full_response)
+                    if output_guard and not output_guard.feed(chunk.event.delta.text):
+                        close_stream(response)  # violation: stop generating on vLLM
+                        break
+                    render_started = time.perf_counter()
+                    message_placeholder.markdown((output_guard.visible if output_guard else full_response) + "▌")
+                    render_s += time.perf_counter() - render_started
+            turn.add_generation(
+                stream_started,
+                first_token_at,
+                time.time(),
+                streamed_tokens,
+                render_s,
+                **{"gen_ai.request.model": selected_model},
+            )
 
             post_guardrail_violation = None
             post_guardrail_error = None
-            if guardrail_enabled and guardrail_apply_to_response and selected_shield:
-                post_guardrail_violation, post_guardrail_error = _run_guardrail(
-                    selected_shield,
-                    conversation_messages
-                    + [
-                        {
-                            "role": "assistant",
-                            "content": full_response,
-                        }
-                    ],
-                )
+            if output_guard:
+                post_guardrail_violation = output_guard.finish()
+                post_guardrail_error = output_guard.error
                 if post_guardrail_error:
                     st.warning(f"Guardrail response check failed: {post_guardrail_error}")
 
+            render_started = time.time()
             if post_guardrail_violation:
                 guardrail_message = _guardrail_block_message(post_guardrail_violation, selected_shield)
                 message_placeholder.markdown(guardrail_message)
@@ -713,6 +2099,15 @@ def rag_chat_page():
                 response_dict = {"role": "assistant", "content": full_response, "stop_reason": "end_of_message"}
                 st.session_state.messages.extend([user_message, response_dict])
                 st.session_state.displayed_messages.append(response_dict)
+                if question_embedding is not None and full_response.strip():
+                    answer_cache.put(
+                        answer_scope,
+                        question_embedding,
+                        prompt,
+                        full_response,
+                        generation_s=time.perf_counter() - generation_started,
+                    )
+            turn.add("ui.render", render_started, time.time())
 
     if prompt := st.chat_input("Ask a question about your documents"):
         st.session_state.displayed_messages.append({"role": "user", "content": prompt})
@@ -724,10 +2119,25 @@ def rag_chat_page():
         st.rerun()
 
     if "prompt" in st.session_state and st.session_state.prompt is not None:
+        turn = TurnTrace(
+            "rag.turn",
+            label_keys=("rag.collection", "guardrail.shield"),
+            **{
+                "rag.mode": rag_mode,
+                "gen_ai.request.model": selected_model,
+                "rag.collections": list(selected_vector_dbs),
+                "guardrail.shield": selected_shield if guardrail_enabled else None,
+            },
+        )
         if rag_mode == "Agent-based":
-            agent_process_prompt(st.session_state.prompt)
+            agent_process_prompt(st.session_state.prompt, turn)
         else:  # rag_mode == "Direct"
-            direct_process_prompt(st.session_state.prompt)
+            direct_process_prompt(st.session_state.prompt, turn)
+        turn.finish(tracer("playground-rag"))
+        if st.session_state.displayed_messages and st.session_state.displayed_messages[-1]["role"] == "assistant":
+            # Kept with the answer, so the waterfall survives reruns
+            st.session_state.displayed_messages[-1]["waterfall"] = turn.waterfall()
+            render_waterfall(*st.session_state.displayed_messages[-1]["waterfall"])
         st.session_state.prompt = None
 
 
@@ -12,26 +12,35 @@ from llama_stack_client.lib.agents.react.agent import ReActAgent
 from llama_stack_client.lib.agents.event_logger import EventLogger
 
 from llama_stack.distribution.ui.modules.api import llama_stack_api
+from playground_common import catalog
+
+
+# One instance per process (cache_resource), reused by every rerun and session
+_CATALOG = catalog()
 
 
 def tool_chat_page():
     st.title("🛠 Tools")
 
     client = llama_stack_api.client
-    models = client.models.list()
+    models, tool_groups = _CATALOG.get("models", "toolgroups")
     model_list = [model.identifier for model in models if model.api_model_type == "llm"]
 
-    tool_groups = client.toolgroups.list()
     tool_groups_list = [tool_group.identifier for tool_group in tool_groups]
     mcp_tools_list = [tool for tool in tool_groups_list if tool.startswith("mcp::")]
     builtin_tools_list = [tool for tool in tool_groups_list if not tool.startswith("mcp::")]
 
     def reset_agent():
+        # Agents are not cached and the catalog is shared across sessions,
+        # so only the session state is reset here.
         st.session_state.clear()
-        st.cache_resource.clear()
 
     with st.sidebar:
         st.title("Configuration")
+        if st.button("🔄 Refresh catalog", help="Re-read models, collections and tools from Llama Stack."):
+            _CATALOG.refresh()
+            st.rerun()
+        st.caption(f"Catalog fetched {_CATALOG.age_s() or 0:.0f}s ago, refreshed every {_CATALOG.ttl_s:.0f}s.")
         st.subheader("Model")
         model = st.selectbox(label="Model", options=model_list, on_change=reset_agent, label_visibility="collapsed")
 
@@ -47,7 +56,7 @@ def tool_chat_page():
         )
 
         if "builtin::rag" in toolgroup_selection:
-            vector_dbs = llama_stack_api.client.vector_dbs.list() or []
+            (vector_dbs,) = _CATALOG.get("vector_dbs")
             if not vector_dbs:
                 st.info("No vector databases available for selection.")
             # Use human-readable names (e.g., "red_hat_docs") instead of UUIDs (e.g., "vs_0e19961e...")
@@ -73,12 +82,10 @@ def tool_chat_page():
         toolgroup_selection.extend(mcp_selection)
 
         active_tool_list = []
-        for toolgroup_id in toolgroup_selection:
+        toolgroup_tools = _CATALOG.get(*[f"tools:{toolgroup_id}" for toolgroup_id in toolgroup_selection])
+        for toolgroup_id, tools in zip(toolgroup_selection, toolgroup_tools):
             active_tool_list.extend(
-                [
-                    f"{''.join(toolgroup_id.split('::')[1:])}:{t.identifier}"
-                    for t in client.tools.list(toolgroup_id=toolgroup_id)
-                ]
+                [f"{''.join(toolgroup_id.split('::')[1:])}:{t.identifier}" for t in tools]
             )
 
         st.markdown(f"Active Tools: 🛠 {len(active_tool_list)}", help="List of currently active tools.")
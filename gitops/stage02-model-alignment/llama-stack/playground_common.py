@@ -0,0 +1,545 @@
+# Helpers shared by the patched playground pages (chat, RAG, tools).
+#
+# Baked into the playground image next to the pages (playground-image/Dockerfile). State
+# behind @st.cache_resource lives here once per server process, so every page and session
+# sees the same instance (e.g. a catalog refresh on one page reaches the others).
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+import streamlit as st
+
+from llama_stack.distribution.ui.modules.api import llama_stack_api
+
+try:
+    # Turn spans for Tempo; without it the waterfall is only shown in the page
+    from opentelemetry import trace
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+except ImportError:
+    trace = None
+
+
+class Catalog:
+    """
+    Process-wide TTL cache of the LlamaStack catalog, shared by all playground sessions.
+
+    Holds the lists behind models, shields, vector_dbs, providers and toolgroups (plus
+    "tools:<toolgroup_id>"), so sidebar reruns are served from memory. Expired lists are
+    fetched in parallel; a failed refetch keeps serving the previous list. refresh()
+    drops entries (all of them, or the named ones after a registration).
+    """
+
+    def __init__(self, client, ttl_s: float = 60.0):
+        self.client = client
+        self.ttl_s = ttl_s
+        self._entries: dict[str, tuple[float, list]] = {}
+        self._lock = threading.Lock()
+
+    def _fetch(self, name: str) -> list:
+        if name.startswith("tools:"):
+            return list(self.client.tools.list(toolgroup_id=name.split(":", 1)[1]) or [])
+        return list(getattr(self.client, name).list() or [])
+
+    def get(self, *names: str) -> tuple[list, ...]:
+        now = time.monotonic()
+        with self._lock:
+            stale = [
+                name for name in dict.fromkeys(names)
+                if name not in self._entries or self._entries[name][0] + self.ttl_s < now
+            ]
+        if stale:
+            with ThreadPoolExecutor(max_workers=min(len(stale), 8), thread_name_prefix="catalog") as pool:
+                futures = {name: pool.submit(self._fetch, name) for name in stale}
+            error = None
+            for name, future in futures.items():
+                try:
+                    value = future.result()
+                except Exception as exc:  # noqa: BLE001
+                    with self._lock:
+                        cached = name in self._entries
+                    if not cached:
+                        error = error or exc
+                    print(f"[catalog] {name}.list() failed ({exc}); {'serving cached list' if cached else 'no cached list'}")
+                    continue
+                with self._lock:
+                    self._entries[name] = (time.monotonic(), value)
+            if error is not None:
+                raise error
+        with self._lock:
+            return tuple(list(self._entries[name][1]) for name in names)
+
+    def warm(self, *names: str) -> None:
+        """Fetch a page's lists in one parallel round trip; failures resurface in get()."""
+        try:
+            self.get(*names)
+        except Exception:  # noqa: BLE001
+            pass
+
+    def refresh(self, *names: str) -> None:
+        with self._lock:
+            for name in names or list(self._entries):
+                self._entries.pop(name, None)
+
+    def age_s(self) -> Optional[float]:
+        """Seconds since the oldest cached list was fetched (None when empty)."""
+        with self._lock:
+            if not self._entries:
+                return None
+            return time.monotonic() - min(fetched for fetched, _ in self._entries.values())
+
+
+@st.cache_resource
+def catalog() -> Catalog:
+    """The process-wide Catalog (one per server process, shared by every page)."""
+    return Catalog(llama_stack_api.client, ttl_s=float(os.environ.get("PLAYGROUND_CATALOG_TTL_S", "60")))
+
+
+class TurnTrace:
+    """
+    Latency waterfall of one chat turn, exported as OpenTelemetry spans.
+
+    Steps are recorded with their wall-clock start and end, also from worker threads
+    (retrieval, guardrail checks), and exported under one root span when the turn is
+    finished, so no tracing context has to cross threads. Steps still running at that
+    point (abandoned checks) are dropped.
+
+    `label_keys` are the attributes that name a step in the waterfall (e.g. the shield of
+    a guardrail check); the others are shown as details.
+    """
+
+    def __init__(self, name: str, label_keys: Iterable[str] = ("guardrail.shield",), **attributes):
+        self.name = name
+        self.label_keys = tuple(label_keys)
+        self.attributes = attributes
+        self.started = time.time()
+        self.ended: Optional[float] = None
+        self.spans: List[dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, started: float, ended: float, **attributes) -> None:
+        with self._lock:
+            if self.ended is None:
+                self.spans.append({"name": name, "start": started, "end": ended, "attributes": attributes})
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time a block; attributes added to the yielded dict are recorded with it."""
+        started = time.time()
+        try:
+            yield attributes
+        finally:
+            self.add(name, started, time.time(), **attributes)
+
+    def add_generation(
+        self, started: float, first_token: Optional[float], ended: float, tokens: int, render_s: float, **attributes
+    ) -> None:
+        """TTFT and decode spans of a streamed response; render_s is time spent updating the page."""
+        if first_token is not None:
+            self.add("llm.ttft", started, first_token, **attributes)
+        decode_s = ended - (first_token or ended)
+        self.add(
+            "llm.generate",
+            started,
+            ended,
+            **attributes,
+            **{
+                "llm.tokens": tokens,
+                "llm.tokens_per_s": round((tokens - 1) / decode_s, 1) if tokens > 1 and decode_s > 0 else None,
+                "ui.stream_render_ms": round(render_s * 1000, 1),
+            },
+        )
+
+    def finish(self, tracer=None) -> None:
+        with self._lock:
+            self.ended = time.time()
+        if tracer is None:
+            return
+
+        def _ns(seconds: float) -> int:
+            return int(seconds * 1e9)
+
+        def _attributes(attributes: dict) -> dict:
+            return {
+                key: tuple(str(v) for v in value) if isinstance(value, (list, tuple)) else value
+                for key, value in attributes.items()
+                if value is not None
+            }
+
+        try:
+            root = tracer.start_span(self.name, start_time=_ns(self.started), attributes=_attributes(self.attributes))
+            context = trace.set_span_in_context(root)
+            for span in self.spans:
+                child = tracer.start_span(
+                    span["name"], context=context, start_time=_ns(span["start"]), attributes=_attributes(span["attributes"])
+                )
+                child.end(end_time=_ns(span["end"]))
+            root.end(end_time=_ns(self.ended))
+        except Exception as exc:  # noqa: BLE001 - tracing never fails a turn
+            print(f"[trace] export failed: {exc}")
+
+    def waterfall(self, width: int = 32) -> tuple[str, str]:
+        """(expander title, fixed-width waterfall) of the finished turn."""
+        ended = max([self.ended or time.time()] + [span["end"] for span in self.spans])
+        total_s = max(ended - self.started, 1e-6)
+        summary = [f"{((self.ended or time.time()) - self.started) * 1000:.0f} ms"]
+        rows = []
+        for span in sorted(self.spans, key=lambda item: item["start"]):
+            attributes = span["attributes"]
+            label = " ".join([span["name"]] + [str(attributes[key]) for key in self.label_keys if key in attributes])
+            start = min(max(int((span["start"] - self.started) / total_s * width), 0), width - 1)
+            end = min(max(round((span["end"] - self.started) / total_s * width), start + 1), width)
+            details = " ".join(
+                f"{key.rsplit('.', 1)[-1]}={value}"
+                for key, value in attributes.items()
+                if key not in self.label_keys and key != "gen_ai.request.model" and value is not None
+            )
+            rows.append(
+                f"{label[:36]:<36} |{' ' * start}{'█' * (end - start)}{' ' * (width - end)}| "
+                f"{(span['start'] - self.started) * 1000:>6.0f} {(span['end'] - span['start']) * 1000:>6.0f} ms  {details}"
+            )
+            if span["name"] == "llm.ttft":
+                summary.append(f"TTFT {(span['end'] - span['start']) * 1000:.0f} ms")
+            elif span["name"] == "llm.generate" and attributes.get("llm.tokens_per_s"):
+                summary.append(f"{attributes['llm.tokens_per_s']:.1f} tok/s")
+        header = f"{'step':<36} |{'':<{width}}| {'start':>6} {'dur':>6}"
+        return f"⏱️ Latency waterfall · {' · '.join(summary)}", "\n".join([header] + rows)
+
+
+def render_waterfall(title: str, waterfall: str) -> None:
+    with st.expander(title, expanded=False):
+        st.code(waterfall, language=None)
+
+
+@st.cache_resource
+def _tracer_provider():
+    """One OTLP/HTTP exporter per process (None without opentelemetry or OTEL_EXPORTER_OTLP_ENDPOINT)."""
+    if trace is None or not os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return None
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": os.environ.get("OTEL_SERVICE_NAME", "llama-stack-playground")})
+    )
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))  # endpoint from OTEL_EXPORTER_OTLP_*
+    return provider
+
+
+def tracer(name: str):
+    """Tracer for a page's turn spans (instrumentation scope `name`); None when tracing is off."""
+    provider = _tracer_provider()
+    return provider.get_tracer(name) if provider is not None else None
+
+
+class VerdictCache:
+    """
+    Process-wide cache of shield checks that passed, shared by all sessions.
+
+    Keyed by (shield_id, shield config version, SHA-256 of the screened messages), so the
+    same system prompt, retrieved context or repeated question is screened once. Only
+    passes are cached: violations and errors always go back to the orchestrator. A shield
+    re-registered with other detectors gets a new version (see shield_versions).
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl_s: float = 900.0):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.versions: dict[str, str] = {}
+        self._passes: "OrderedDict[tuple, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, shield_id: str, messages: List[dict]) -> tuple:
+        digest = hashlib.sha256(json.dumps(messages, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return (shield_id, self.versions.get(shield_id, ""), digest)
+
+    def passed(self, key: tuple) -> bool:
+        with self._lock:
+            expires = self._passes.get(key)
+            if expires is not None and expires >= time.monotonic():
+                self._passes.move_to_end(key)
+                self.hits += 1
+                return True
+            self._passes.pop(key, None)
+            self.misses += 1
+            return False
+
+    def add_pass(self, key: tuple) -> None:
+        with self._lock:
+            self._passes[key] = time.monotonic() + self.ttl_s
+            self._passes.move_to_end(key)
+            while len(self._passes) > self.max_entries:
+                self._passes.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._passes),
+                "hits": self.hits,
+                "lookups": lookups,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+@st.cache_resource
+def verdict_cache() -> VerdictCache:
+    """The process-wide VerdictCache (shared by every page)."""
+    return VerdictCache(
+        max_entries=int(os.environ.get("GUARDRAIL_VERDICT_CACHE_ENTRIES", "4096")),
+        ttl_s=float(os.environ.get("GUARDRAIL_VERDICT_CACHE_TTL_S", "900")),
+    )
+
+
+# Resolved on the script thread (first import); run_guardrail also runs on worker threads
+_VERDICTS = verdict_cache()
+
+
+def shield_versions() -> dict[str, str]:
+    """Registered shields -> hash of their provider and detector params (the config version)."""
+    try:
+        (shields,) = catalog().get("shields")
+    except Exception:
+        return {}
+    versions = {}
+    for shield in shields:
+        identifier = getattr(shield, "identifier", None)
+        if identifier:
+            config = {
+                "provider_id": getattr(shield, "provider_id", None),
+                "provider_resource_id": getattr(shield, "provider_resource_id", None),
+                "params": getattr(shield, "params", None) or {},
+            }
+            versions[identifier] = hashlib.sha1(
+                json.dumps(config, sort_keys=True, default=str).encode("utf-8")
+            ).hexdigest()[:12]
+    return versions
+
+
+def _filter_guardrail_messages(messages: list[dict]) -> list[dict]:
+    """Remove system messages and ensure assistant messages have required fields."""
+    filtered = []
+    for msg in messages:
+        if (msg or {}).get("role") == "system":
+            continue
+        
+        # Add required stop_reason field for assistant messages
+        if msg.get("role") == "assistant" and "stop_reason" not in msg:
+            msg = {**msg, "stop_reason": "end_of_turn"}
+        
+        filtered.append(msg)
+    
+    return filtered if filtered else messages
+
+
+def _extract_attr(candidate: object, attr: str, default=None):
+    if candidate is None:
+        return default
+    if isinstance(candidate, dict):
+        return candidate.get(attr, default)
+    value = getattr(candidate, attr, default)
+    if callable(value):
+        try:
+            return value()
+        except Exception:  # noqa: BLE001
+            return default
+    return value
+
+
+def _normalize_violation(payload: object) -> Optional[object]:
+    if payload is None:
+        return None
+
+    # Check violation_level first - "info" level indicates informational messages, not actual violations
+    violation_level = _extract_attr(payload, "violation_level")
+    if violation_level and str(violation_level).lower() in {"info", "informational"}:
+        # For info-level messages, still check if there are actual violations
+        pass  # Continue to status/summary checks below
+
+    # Extract metadata (TrustyAI provider returns status/summary nested in metadata)
+    metadata = _extract_attr(payload, "metadata")
+    
+    # Try to get status from metadata first, then fallback to top-level
+    status_raw = _extract_attr(metadata, "status") if metadata else None
+    if status_raw is None:
+        status_raw = _extract_attr(payload, "status")
+    
+    status_value = None
+    if isinstance(status_raw, str):
+        status_value = status_raw.lower()
+    elif hasattr(status_raw, "value"):
+        status_value = str(status_raw.value).lower()
+    elif status_raw is not None:
+        status_value = str(status_raw).lower()
+    if status_value in {"pass", "passed", "verified", "ok"}:
+        return None
+
+    # Try to get summary from metadata first, then fallback to top-level
+    summary = _extract_attr(metadata, "summary") if metadata else None
+    if summary is None:
+        summary = _extract_attr(payload, "summary")
+    
+    if summary is not None:
+        messages_with_violations = _extract_attr(summary, "messages_with_violations", 0)
+        total_violations = _extract_attr(summary, "total_violations_found", 0)
+
+        def _to_int(value):
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return value
+
+        if _to_int(messages_with_violations) in (0, "0") and _to_int(total_violations) in (0, "0"):
+            return None
+
+    return payload
+
+
+def run_guardrail(
+    shield_id: str,
+    messages: Iterable[dict],
+    turn: Optional[TurnTrace] = None,
+    stage: str = "prompt",
+) -> tuple[Optional[object], Optional[Exception]]:
+    """
+    Screen `messages` with one shield; passes are answered from the verdict cache.
+
+    Returns (violation, error). With a page's turn trace, the check is recorded as a
+    guardrail.<stage> span.
+    """
+    started = time.time()
+    violation, error, outcome = None, None, "pass"
+    screened = _filter_guardrail_messages(list(messages))
+    cache_key = _VERDICTS.key(shield_id, screened)
+    if _VERDICTS.passed(cache_key):
+        outcome = "cached"
+    else:
+        try:
+            result = llama_stack_api.client.safety.run_shield(
+                shield_id=shield_id,
+                messages=screened,
+                params={},
+            )
+        except Exception as exc:  # noqa: BLE001
+            error, outcome = exc, "error"
+        else:
+            violation = _normalize_violation(getattr(result, "violation", None))
+            if violation is None:
+                _VERDICTS.add_pass(cache_key)
+            else:
+                outcome = "violation"
+    if turn is not None:
+        turn.add(f"guardrail.{stage}", started, time.time(), **{"guardrail.shield": shield_id, "guardrail.outcome": outcome})
+    return violation, error
+
+
+class StreamingGuardrail:
+    """
+    Screen a response while it streams instead of after the last token.
+
+    Text is checked in windows that end at a sentence boundary (or a word boundary when a
+    sentence runs long), each overlapping the previous one by `overlap_chars` so a
+    violation spanning two windows is still seen. At most one check is in flight, so
+    generation never waits for the shield. Only screened text is released for display
+    (hold-back buffer); after a violation `feed` returns False and the caller stops the
+    stream. Shield errors fail open, as the single post-response check did.
+    """
+
+    _SENTENCE_END = (". ", "! ", "? ", ".\n", "!\n", "?\n", "\n\n")
+
+    def __init__(
+        self,
+        shield_id: str,
+        messages: List[dict],
+        min_window_chars: int = 160,
+        overlap_chars: int = 200,
+        turn: Optional[TurnTrace] = None,
+    ):
+        self.shield_id = shield_id
+        self.turn = turn
+        self.messages = list(messages)
+        self.min_window_chars = min_window_chars
+        self.overlap_chars = overlap_chars
+        self.text = ""
+        self.released = 0
+        self.violation: Optional[object] = None
+        self.error: Optional[Exception] = None
+        self.checks = 0
+        self._pending: Optional[Future] = None
+        self._pending_end = 0
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="output-guardrail")
+
+    @property
+    def visible(self) -> str:
+        return self.text[: self.released]
+
+    def _boundary(self) -> Optional[int]:
+        pending = self.text[self.released :]
+        if len(pending) < self.min_window_chars:
+            return None
+        cut = max((pending.rfind(marker) + len(marker) for marker in self._SENTENCE_END if marker in pending), default=0)
+        if cut < self.min_window_chars // 2 and len(pending) >= 2 * self.min_window_chars:
+            cut = pending.rfind(" ") + 1  # long sentence: fall back to a word boundary
+        return self.released + cut if cut > 0 else None
+
+    def _submit(self, end: int) -> None:
+        window = self.text[max(self.released - self.overlap_chars, 0) : end]
+        self._pending_end = end
+        self._pending = self._pool.submit(
+            run_guardrail,
+            self.shield_id,
+            self.messages + [{"role": "assistant", "content": window}],
+            self.turn,
+            "response",
+        )
+        self.checks += 1
+
+    def _collect(self, block: bool) -> None:
+        if self._pending is None or (not block and not self._pending.done()):
+            return
+        violation, error = self._pending.result()
+        self._pending = None
+        if violation is not None:
+            self.violation = violation
+            return
+        self.error = self.error or error
+        self.released = self._pending_end
+
+    def feed(self, delta: str) -> bool:
+        """Add streamed text; False once a violation was found (stop generating)."""
+        self.text += delta
+        self._collect(block=False)
+        if self.violation is not None:
+            return False
+        if self._pending is None:
+            end = self._boundary()
+            if end:
+                self._submit(end)
+        return True
+
+    def finish(self) -> Optional[object]:
+        """Screen the remaining tail once the stream ended; returns the violation, if any."""
+        self._collect(block=True)
+        if self.violation is None and self.released < len(self.text):
+            self._submit(len(self.text))
+            self._collect(block=True)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        return self.violation
+
+
+def close_stream(response) -> None:
+    """Drop the HTTP stream so Llama Stack (and vLLM behind it) stops generating."""
+    close = getattr(response, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception:  # noqa: BLE001
+            pass
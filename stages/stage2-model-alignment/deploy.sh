@@ -425,9 +425,11 @@ if [ -f "$PIPELINE_SOURCE" ]; then
         python3 -m venv "$VENV_PATH"
     fi
     
-    echo "   Installing KFP SDK..."
+    # Same KFP version as the executor baked into the ingestion runtime image
+    KFP_SDK_PIN=$(grep -E '^kfp==' "${SCRIPT_DIR}/kfp/runtime-image/requirements.txt")
+    echo "   Installing KFP SDK (${KFP_SDK_PIN})..."
     "$VENV_PATH/bin/pip" install -q --upgrade pip
-    "$VENV_PATH/bin/pip" install -q kfp
+    "$VENV_PATH/bin/pip" install -q "$KFP_SDK_PIN"
     
     # Create artifacts directory
     mkdir -p "${PROJECT_ROOT}/artifacts"
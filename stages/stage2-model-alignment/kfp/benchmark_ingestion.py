@@ -0,0 +1,192 @@
+"""
+Ingestion benchmark - per-pod startup vs. work time for KFP runs
+
+Every ingestion component (components.runtime.ingestion_component) prints a marker right
+before its function runs:
+
+    [TIMING] component=<name> start=<epoch seconds>
+
+Combined with the pod/container timestamps from the Kubernetes API this splits each
+executor pod's wall time into:
+
+- queue:     pod created -> scheduled
+- init:      scheduled -> main container started (init containers, image pull)
+- bootstrap: main container started -> component body entered
+             (KFP launcher artifact download, pip installs, executor import)
+- work:      component body entered -> main container finished
+
+"startup" = queue + init + bootstrap, i.e. everything a pod spends before doing work.
+
+Usage (requires `oc` logged into the cluster):
+    # Single run
+    python3 benchmark_ingestion.py --run-id <kfp-run-id>
+
+    # Before/after comparison (e.g. pip-install image vs. prebuilt ingestion-runtime)
+    python3 benchmark_ingestion.py --run-id <baseline-run-id> --compare-run-id <new-run-id>
+
+    # Machine-readable output
+    python3 benchmark_ingestion.py --run-id <kfp-run-id> --json
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+
+NAMESPACE = "private-ai-demo"
+MARKER_RE = re.compile(r"\[TIMING\] component=(\w+) start=([\d.]+)")
+PHASES = ("queue", "init", "bootstrap", "work")
+
+
+def _oc(*args: str) -> str:
+    result = subprocess.run(["oc", *args], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"oc {' '.join(args)} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def _ts(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def collect_pod_timings(run_id: str, namespace: str = NAMESPACE) -> List[Dict]:
+    """Return one timing record per executor pod of a KFP run."""
+    pods = json.loads(_oc("get", "pods", "-n", namespace, "-l", f"pipeline/runid={run_id}", "-o", "json"))
+    records = []
+    for pod in pods.get("items", []):
+        name = pod["metadata"]["name"]
+        main = next(
+            (cs for cs in pod["status"].get("containerStatuses", []) if cs["name"] == "main"),
+            None,
+        )
+        if main is None:
+            continue  # driver pods have no main container
+
+        try:
+            logs = _oc("logs", "-n", namespace, name, "-c", "main")
+        except RuntimeError as err:
+            print(f"[WARN] {name}: {err}", file=sys.stderr)
+            continue
+        marker = MARKER_RE.search(logs)
+        if not marker:
+            continue  # not an ingestion component (or failed before entering the body)
+
+        state = main.get("state", {})
+        terminated = state.get("terminated") or {}
+        started = _ts(terminated.get("startedAt") or (state.get("running") or {}).get("startedAt"))
+        finished = _ts(terminated.get("finishedAt"))
+        created = _ts(pod["metadata"]["creationTimestamp"])
+        scheduled = _ts(next(
+            (c.get("lastTransitionTime") for c in pod["status"].get("conditions", []) if c["type"] == "PodScheduled"),
+            None,
+        ))
+        body_start = float(marker.group(2))
+
+        record = {
+            "pod": name,
+            "component": marker.group(1),
+            "queue": (scheduled - created) if scheduled and created else None,
+            "init": (started - scheduled) if started and scheduled else None,
+            "bootstrap": (body_start - started) if started else None,
+            "work": (finished - body_start) if finished else None,
+        }
+        record["startup"] = sum(record[p] or 0.0 for p in ("queue", "init", "bootstrap"))
+        records.append(record)
+    return records
+
+
+def summarize(records: List[Dict]) -> Dict[str, Dict[str, float]]:
+    """Aggregate per component: pod count, mean/p50/max startup and mean of each phase."""
+    by_component: Dict[str, List[Dict]] = {}
+    for record in records:
+        by_component.setdefault(record["component"], []).append(record)
+
+    summary = {}
+    for component, items in sorted(by_component.items()):
+        startups = [r["startup"] for r in items]
+        row = {
+            "pods": len(items),
+            "startup_mean": statistics.mean(startups),
+            "startup_p50": statistics.median(startups),
+            "startup_max": max(startups),
+        }
+        for phase in PHASES:
+            values = [r[phase] for r in items if r[phase] is not None]
+            row[f"{phase}_mean"] = statistics.mean(values) if values else 0.0
+        summary[component] = row
+
+    all_startups = [r["startup"] for r in records]
+    if all_startups:
+        summary["ALL"] = {
+            "pods": len(records),
+            "startup_mean": statistics.mean(all_startups),
+            "startup_p50": statistics.median(all_startups),
+            "startup_max": max(all_startups),
+            "startup_total": sum(all_startups),
+            **{
+                f"{phase}_mean": statistics.mean([r[phase] for r in records if r[phase] is not None] or [0.0])
+                for phase in PHASES
+            },
+        }
+    return summary
+
+
+def print_summary(title: str, summary: Dict[str, Dict[str, float]]) -> None:
+    print(f"\n{title}")
+    header = f"{'component':<24}{'pods':>5}{'startup':>10}{'p50':>8}{'max':>8}{'queue':>8}{'init':>8}{'boot':>8}{'work':>8}"
+    print(header)
+    print("-" * len(header))
+    for component, row in summary.items():
+        print(
+            f"{component:<24}{row['pods']:>5}{row['startup_mean']:>10.1f}{row['startup_p50']:>8.1f}"
+            f"{row['startup_max']:>8.1f}{row['queue_mean']:>8.1f}{row['init_mean']:>8.1f}"
+            f"{row['bootstrap_mean']:>8.1f}{row['work_mean']:>8.1f}"
+        )
+
+
+def print_comparison(baseline: Dict, candidate: Dict) -> None:
+    print("\nStartup per pod (mean seconds): baseline -> candidate")
+    for component in sorted(set(baseline) | set(candidate)):
+        before = baseline.get(component, {}).get("startup_mean")
+        after = candidate.get(component, {}).get("startup_mean")
+        if before is None or after is None:
+            continue
+        change = ((after - before) / before * 100) if before else 0.0
+        print(f"  {component:<24}{before:>8.1f} -> {after:>8.1f}  ({change:+.0f}%)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Per-pod startup benchmark for RAG ingestion runs")
+    parser.add_argument("--run-id", required=True, help="KFP run ID (baseline when comparing)")
+    parser.add_argument("--compare-run-id", help="Second KFP run ID to compare against --run-id")
+    parser.add_argument("--namespace", default=NAMESPACE)
+    parser.add_argument("--json", action="store_true", help="Print raw records and summaries as JSON")
+    args = parser.parse_args()
+
+    runs = [args.run_id] + ([args.compare_run_id] if args.compare_run_id else [])
+    results = {}
+    for run_id in runs:
+        records = collect_pod_timings(run_id, args.namespace)
+        if not records:
+            print(f"[WARN] No component pods with [TIMING] markers found for run {run_id}", file=sys.stderr)
+        results[run_id] = {"records": records, "summary": summarize(records)}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    for run_id in runs:
+        print_summary(f"Run {run_id}", results[run_id]["summary"])
+    if args.compare_run_id:
+        print_comparison(results[args.run_id]["summary"], results[args.compare_run_id]["summary"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+Vector index benchmark - latency/QPS/memory vs. recall for the RAG collections
+
+The milvus-shared LlamaStack provider creates collections with Milvus' default vector
+index. This harness measures the alternatives on our own vectors:
+
+1. export:  copy the vectors of a live collection to a local .npz file
+2. sweep:   load them into scratch collections on a benchmark Milvus and, per index
+            build setting, every search setting, report QPS, p50/p99 latency, estimated
+            index memory and recall@k against exact (numpy brute-force) search
+
+Queries are held out from the indexed vectors (real chunk embeddings, not random
+points). The winner is the highest-QPS setting that reaches --target-recall; the sweep
+prints the values to apply (vector_index_type/vector_index_params on the reindex
+pipeline, search_params in the LlamaStack provider config).
+
+Usage (pip install pymilvus numpy):
+    oc port-forward svc/milvus-standalone 19530:19530 -n private-ai-demo &
+    python3 benchmark_vector_index.py export --collection acme_corporate --output acme.npz
+
+    # Sweep on a throwaway Milvus (docker run milvusdb/milvus:v2.4.0 standalone) or the
+    # port-forwarded one (scratch collections are named bench_* and dropped afterwards)
+    python3 benchmark_vector_index.py sweep --vectors acme.npz --output acme-index.json
+
+    # Milvus Lite (pip install milvus-lite) only implements FLAT: baseline numbers only
+    python3 benchmark_vector_index.py sweep --vectors acme.npz --milvus-uri ./bench.db --types FLAT
+"""
+
+import argparse
+import json
+import math
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+MILVUS_URI = "http://localhost:19530"
+VECTOR_FIELD = "vector"  # field name used by the LlamaStack Milvus provider
+
+# index type -> [(build params, [search params, ...]), ...]
+SWEEP = {
+    "FLAT": [({}, [{}])],
+    "HNSW": [
+        ({"M": m, "efConstruction": 200}, [{"ef": ef} for ef in (16, 32, 64, 128, 256)])
+        for m in (8, 16, 32)
+    ],
+    "IVF_FLAT": [
+        ({"nlist": nlist}, [{"nprobe": nprobe} for nprobe in (1, 4, 8, 16, 32) if nprobe <= nlist])
+        for nlist in (64, 128, 256)
+    ],
+    "IVF_PQ": [
+        ({"nlist": 128, "m": m, "nbits": 8}, [{"nprobe": nprobe} for nprobe in (4, 8, 16, 32)])
+        for m in (48, 96)
+    ],
+}
+
+
+def _client(uri: str):
+    from pymilvus import MilvusClient
+
+    return MilvusClient(uri=uri.replace("tcp://", "http://", 1))
+
+
+def export_vectors(uri: str, collection: str, output: str, limit: int = 0) -> None:
+    """Write the collection's vectors (and its metric type) to an .npz file."""
+    import numpy as np
+
+    client = _client(uri)
+    metric_type = "L2"
+    for index_name in client.list_indexes(collection_name=collection):
+        info = client.describe_index(collection_name=collection, index_name=index_name)
+        if info.get("field_name") == VECTOR_FIELD:
+            metric_type = info.get("metric_type", metric_type)
+
+    client.load_collection(collection_name=collection)
+    iterator = client.query_iterator(
+        collection_name=collection, batch_size=1000, filter="", output_fields=[VECTOR_FIELD]
+    )
+    vectors = []
+    while True:
+        batch = iterator.next()
+        if not batch:
+            break
+        vectors.extend(row[VECTOR_FIELD] for row in batch)
+        if limit and len(vectors) >= limit:
+            vectors = vectors[:limit]
+            break
+    iterator.close()
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    np.savez_compressed(output, vectors=matrix, metric_type=metric_type, collection=collection)
+    print(f"Exported {matrix.shape[0]} x {matrix.shape[1]} vectors ({metric_type}) from {collection} to {output}")
+
+
+def exact_neighbors(base, queries, metric_type: str, k: int):
+    """Ground truth: ids of the k nearest base vectors per query (brute force)."""
+    import numpy as np
+
+    if metric_type == "L2":
+        # ||q - x||^2 = ||q||^2 - 2 q.x + ||x||^2 (||q||^2 is constant per query)
+        scores = -(-2 * queries @ base.T + (base ** 2).sum(axis=1))
+    else:
+        if metric_type == "COSINE":
+            base = base / np.linalg.norm(base, axis=1, keepdims=True)
+            queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = queries @ base.T
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return [set(row.tolist()) for row in top]
+
+
+def estimate_memory_bytes(index_type: str, params: Dict, num_vectors: int, dim: int) -> int:
+    """Approximate in-memory index size (Milvus does not report it per index)."""
+    raw = num_vectors * dim * 4
+    if index_type == "HNSW":
+        return raw + num_vectors * params["M"] * 2 * 4  # level-0 links dominate
+    if index_type == "IVF_FLAT":
+        return raw + params["nlist"] * dim * 4
+    if index_type == "IVF_PQ":
+        codes = num_vectors * params["m"] * params["nbits"] // 8
+        codebooks = params["m"] * (2 ** params["nbits"]) * (dim // params["m"]) * 4
+        return codes + codebooks + params["nlist"] * dim * 4
+    return raw
+
+
+def _build(client, name: str, base, index_type: str, build_params: Dict, metric_type: str) -> float:
+    from pymilvus import DataType
+
+    if client.has_collection(name):
+        client.drop_collection(collection_name=name)
+    schema = client.create_schema(auto_id=False)
+    schema.add_field("id", DataType.INT64, is_primary=True)
+    schema.add_field(VECTOR_FIELD, DataType.FLOAT_VECTOR, dim=base.shape[1])
+    client.create_collection(collection_name=name, schema=schema)
+
+    for start in range(0, len(base), 1000):
+        rows = [{"id": start + i, VECTOR_FIELD: vector.tolist()} for i, vector in enumerate(base[start:start + 1000])]
+        client.insert(collection_name=name, data=rows)
+    client.flush(collection_name=name)
+
+    started = time.perf_counter()
+    index_params = client.prepare_index_params()
+    index_params.add_index(
+        field_name=VECTOR_FIELD, index_type=index_type, metric_type=metric_type, params=build_params
+    )
+    client.create_index(collection_name=name, index_params=index_params)
+    client.load_collection(collection_name=name)
+    return time.perf_counter() - started
+
+
+def _measure(client, name: str, queries, truth, metric_type: str, search_params: Dict,
+             k: int, concurrency: int) -> Dict:
+    def _search(query) -> Tuple[float, set]:
+        started = time.perf_counter()
+        hits = client.search(
+            collection_name=name,
+            data=[query.tolist()],
+            limit=k,
+            search_params={"metric_type": metric_type, "params": search_params},
+        )
+        return (time.perf_counter() - started) * 1000, {hit["id"] for hit in hits[0]}
+
+    for query in queries[:10]:  # warm-up
+        _search(query)
+
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        latency_ms, found = _search(query)
+        latencies.append(latency_ms)
+        recalls.append(len(found & expected) / k)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(_search, queries))
+    qps = len(queries) / (time.perf_counter() - started)
+
+    latencies.sort()
+    return {
+        "recall": round(statistics.fmean(recalls), 4),
+        "qps": round(qps, 1),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p99_ms": round(latencies[max(math.ceil(0.99 * len(latencies)) - 1, 0)], 2),
+    }
+
+
+def sweep(args) -> List[Dict]:
+    import numpy as np
+
+    data = np.load(args.vectors)
+    vectors = data["vectors"].astype(np.float32)
+    metric_type = args.metric or str(data["metric_type"])
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(vectors))
+    num_queries = min(args.num_queries, len(vectors) // 10 or 1)
+    queries, base = vectors[order[:num_queries]], vectors[order[num_queries:]]
+    k = min(args.top_k, len(base) - 1)
+    print(f"{len(base)} indexed vectors, {num_queries} held-out queries, dim {base.shape[1]}, {metric_type}, k={k}")
+    truth = exact_neighbors(base, queries, metric_type, k)
+
+    client = _client(args.milvus_uri)
+    results = []
+    for index_type in args.types:
+        for build_params, search_settings in SWEEP[index_type]:
+            if index_type.startswith("IVF") and build_params["nlist"] > len(base) // 39:
+                continue  # Milvus needs >= 39 training vectors per list
+            name = f"bench_{index_type.lower()}_{'_'.join(str(v) for v in build_params.values()) or 'default'}"
+            try:
+                build_s = _build(client, name, base, index_type, build_params, metric_type)
+                for search_params in search_settings:
+                    metrics = _measure(client, name, queries, truth, metric_type, search_params, k, args.concurrency)
+                    results.append({
+                        "index_type": index_type,
+                        "index_params": build_params,
+                        "search_params": search_params,
+                        "build_s": round(build_s, 2),
+                        "memory_mb": round(estimate_memory_bytes(index_type, build_params, len(base), base.shape[1]) / 1e6, 1),
+                        **metrics,
+                    })
+                    print(f"  {index_type:8} {json.dumps(build_params):36} {json.dumps(search_params):16} {results[-1]}")
+            finally:
+                if client.has_collection(name):
+                    client.drop_collection(collection_name=name)
+    return results
+
+
+def print_recommendation(results: List[Dict], target_recall: float, metric_type: str) -> None:
+    eligible = [r for r in results if r["recall"] >= target_recall]
+    if not eligible:
+        print(f"\nNo setting reached recall {target_recall}; best: {max(results, key=lambda r: r['recall'])}")
+        return
+    best = max(eligible, key=lambda r: (r["qps"], -r["p99_ms"]))
+    print(f"\nRecommended (recall >= {target_recall}, highest QPS): {best}")
+    print("\nApply with a reindex (reindex pipeline parameters, run-batch-ingestion.sh env with REINDEX=true):")
+    print(f"  VECTOR_INDEX_TYPE={best['index_type']} VECTOR_INDEX_PARAMS='{json.dumps(best['index_params'])}'")
+    print("\nApply to the LlamaStack provider (gitops/stage02-model-alignment/llama-stack/configmap.yaml):")
+    print("  search_params:")
+    print(f'    metric_type: "{metric_type}"')
+    print("    params:")
+    for key, value in best["search_params"].items():
+        print(f"      {key}: {value}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Milvus vector index benchmark for the RAG collections")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="Copy a collection's vectors to an .npz file")
+    export.add_argument("--collection", required=True)
+    export.add_argument("--output", required=True)
+    export.add_argument("--milvus-uri", default=MILVUS_URI)
+    export.add_argument("--limit", type=int, default=0, help="Max vectors (0 = all)")
+
+    run = sub.add_parser("sweep", help="Benchmark index types/parameters on exported vectors")
+    run.add_argument("--vectors", required=True, help=".npz written by 'export'")
+    run.add_argument("--milvus-uri", default=MILVUS_URI, help="Benchmark Milvus (URI or Milvus Lite .db path)")
+    run.add_argument("--types", type=lambda v: v.split(","), default=list(SWEEP), help=f"Subset of {','.join(SWEEP)}")
+    run.add_argument("--metric", choices=["L2", "IP", "COSINE"], help="Override the exported metric type")
+    run.add_argument("--num-queries", type=int, default=200)
+    run.add_argument("--top-k", type=int, default=10)
+    run.add_argument("--concurrency", type=int, default=8, help="Client threads for the QPS measurement")
+    run.add_argument("--target-recall", type=float, default=0.95)
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--output", help="Write all results as JSON")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export_vectors(args.milvus_uri, args.collection, args.output, args.limit)
+        return 0
+
+    unknown = set(args.types) - set(SWEEP)
+    if unknown:
+        parser.error(f"Unknown index types: {', '.join(sorted(unknown))}")
+    results = sweep(args)
+    if not results:
+        print("No results (collection too small for the selected index types?)", file=sys.stderr)
+        return 1
+
+    import numpy as np
+    metric_type = args.metric or str(np.load(args.vectors)["metric_type"])
+    print_recommendation(results, args.target_recall, metric_type)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"metric_type": metric_type, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""
+Summarize one ingestion run from its per-document ledger records
+
+insert_via_llamastack stages one JSON record per document under
+`<ledger_uri>/staging/<run_id>/`. This component:
+- appends them to the Parquet ledger
+  `<ledger_uri>/runs/vector_db_id=<collection>/run_date=<YYYY-MM-DD>/<run_id>.parquet`
+  (Hive-style partitions, readable with pyarrow/DuckDB/Spark)
+- marks discovered PDFs without a record as failed (their chain stopped before insert)
+- reports throughput (pages/min, MB/min, chunks), per-stage time, stragglers and the
+  change against the previous runs of the same collection
+- pushes the summary to the Prometheus Pushgateway for the Grafana ingestion dashboard
+
+Blue/green version suffixes (`__vYYYYMMDDHHMMSS`) are stripped from the collection label
+so reindex runs compare with regular runs of the same collection.
+"""
+
+from typing import List
+
+from kfp.dsl import Markdown, Output
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component("boto3", "pyarrow", "prometheus-client")
+def aggregate_ingestion_ledger(
+    run_id: str,
+    vector_db_id: str,
+    ledger_uri: str,
+    report: Output[Markdown],
+    pdf_uris: List[str] = [],
+    s3_secret_mount_path: str = "/mnt/secrets",
+    minio_endpoint: str = "",
+    minio_creds_b64: str = "",
+    pushgateway_url: str = "http://prometheus-pushgateway.private-ai-demo.svc.cluster.local:9091",
+    history_runs: int = 10,
+    straggler_factor: float = 2.0,
+) -> dict:
+    """
+    Returns:
+        Run summary: {"run_id", "vector_db_id", "documents", "failed", "wall_s",
+        "pages_per_min", "mb_per_min", "chunks", "doc_p50_s", "doc_p95_s", "stragglers",
+        "vs_history"}. The Markdown report is shown in the KFP UI.
+    """
+    import time
+    import io
+    import json
+    import math
+    import re
+    import statistics
+    from datetime import datetime, timezone
+    from pathlib import Path
+
+    import boto3
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from botocore.client import Config
+
+    def _read_secret(key: str) -> str:
+        file_path = Path(s3_secret_mount_path) / key
+        if file_path.is_file():
+            return file_path.read_text().strip()
+        raise FileNotFoundError
+
+    try:
+        endpoint_url = _read_secret("S3_ENDPOINT_URL")
+        access_key = _read_secret("S3_ACCESS_KEY")
+        secret_key = _read_secret("S3_SECRET_KEY")
+    except FileNotFoundError:
+        import base64
+
+        creds_decoded = base64.b64decode(minio_creds_b64).decode("utf-8").strip()
+        access_key, secret_key = [c.strip() for c in creds_decoded.split(":", 1)]
+        endpoint_url = minio_endpoint if minio_endpoint.startswith("http") else f"http://{minio_endpoint}"
+
+    s3_client = boto3.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+        region_name="us-east-1",
+    )
+    bucket, _, prefix = ledger_uri.replace("s3://", "", 1).rstrip("/").partition("/")
+    prefix = f"{prefix}/" if prefix else ""
+    collection = re.sub(r"__v\d{14}$", "", vector_db_id)
+
+    def _list_objects(key_prefix):
+        paginator = s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=key_prefix):
+            yield from page.get("Contents", [])
+
+    # 1. Collect this run's staged records; discovered PDFs without one failed upstream
+    staging_prefix = f"{prefix}staging/{run_id}/"
+    staged_keys = [obj["Key"] for obj in _list_objects(staging_prefix)]
+    records = {}
+    for key in staged_keys:
+        record = json.loads(s3_client.get_object(Bucket=bucket, Key=key)["Body"].read())
+        records[record["source_uri"]] = record
+    for uri in pdf_uris:
+        records.setdefault(uri, {"source_uri": uri, "outcome": "failure", "error": "no ledger record (failed before insert)"})
+    if not records:
+        raise ValueError(f"No ledger records under s3://{bucket}/{staging_prefix} and no PDFs listed")
+
+    columns = {
+        "source_uri": pa.string(), "outcome": pa.string(), "error": pa.string(),
+        "bytes": pa.int64(), "pages": pa.int64(), "chunks": pa.int64(),
+        "download_s": pa.float64(), "docling_s": pa.float64(), "chunk_s": pa.float64(), "insert_s": pa.float64(),
+        "docling_attempts": pa.int64(), "insert_retries": pa.int64(),
+        "started_at": pa.float64(), "finished_at": pa.float64(),
+    }
+    rows = []
+    for record in records.values():
+        row = {name: record.get(name) for name in columns}
+        stage_times = [row[name] for name in ("download_s", "docling_s", "chunk_s", "insert_s") if row[name] is not None]
+        row["document_s"] = round(sum(stage_times), 3) if stage_times else None
+        rows.append(row)
+    schema = pa.schema(
+        [pa.field("run_id", pa.string()), pa.field("vector_db_id", pa.string())]
+        + [pa.field(name, dtype) for name, dtype in columns.items()]
+        + [pa.field("document_s", pa.float64())]
+    )
+    table = pa.Table.from_pylist(
+        [{"run_id": run_id, "vector_db_id": vector_db_id, **row} for row in rows], schema=schema
+    )
+
+    run_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    collection_prefix = f"{prefix}runs/vector_db_id={collection}/"
+    ledger_key = f"{collection_prefix}run_date={run_date}/{run_id}.parquet"
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression="zstd")
+    s3_client.put_object(Bucket=bucket, Key=ledger_key, Body=buffer.getvalue())
+    print(f"[OK] Appended {len(rows)} document(s) to s3://{bucket}/{ledger_key}")
+
+    # 2. Run summary
+    ok = [row for row in rows if row["outcome"] == "success"]
+    failed = [row for row in rows if row["outcome"] != "success"]
+    started = [row["started_at"] for row in rows if row["started_at"]]
+    finished = [row["finished_at"] for row in rows if row["finished_at"]]
+    wall_s = max(max(finished) - min(started), 1e-3) if started and finished else 0.0
+    pages = sum(row["pages"] or 0 for row in ok)
+    megabytes = sum(row["bytes"] or 0 for row in ok) / 1e6
+    chunks = sum(row["chunks"] or 0 for row in ok)
+    durations = sorted(row["document_s"] for row in ok if row["document_s"] is not None)
+
+    def _percentile(values, pct):
+        return values[max(math.ceil(pct / 100 * len(values)) - 1, 0)] if values else 0.0
+
+    doc_p50 = _percentile(durations, 50)
+    stage_totals = {
+        stage: round(sum(row[f"{stage}_s"] or 0 for row in ok), 1) for stage in ("download", "docling", "chunk", "insert")
+    }
+    # Stragglers: documents over straggler_factor x the median, normalized per page so long
+    # PDFs are not flagged just for being long
+    per_page = [row["document_s"] / max(row["pages"] or 1, 1) for row in ok if row["document_s"] is not None]
+    median_per_page = statistics.median(per_page) if per_page else 0.0
+    stragglers = sorted(
+        (
+            row for row in ok
+            if row["document_s"] is not None and median_per_page
+            and row["document_s"] / max(row["pages"] or 1, 1) > straggler_factor * median_per_page
+        ),
+        key=lambda row: row["document_s"],
+        reverse=True,
+    )
+    summary = {
+        "run_id": run_id,
+        "vector_db_id": vector_db_id,
+        "documents": len(ok),
+        "failed": len(failed),
+        "wall_s": round(wall_s, 1),
+        "pages_per_min": round(pages / wall_s * 60, 1) if wall_s else 0.0,
+        "mb_per_min": round(megabytes / wall_s * 60, 2) if wall_s else 0.0,
+        "chunks": chunks,
+        "doc_p50_s": round(doc_p50, 1),
+        "doc_p95_s": round(_percentile(durations, 95), 1),
+        "stragglers": [row["source_uri"] for row in stragglers],
+    }
+
+    # 3. Compare with the previous runs of the collection
+    # Ordered by write time: several runs a day share a run_date= partition and run ids do not sort
+    previous = [
+        obj["Key"]
+        for obj in sorted(_list_objects(collection_prefix), key=lambda obj: obj["LastModified"])
+        if obj["Key"].endswith(".parquet") and obj["Key"] != ledger_key
+    ]
+    previous = previous[-history_runs:] if history_runs > 0 else []
+    history = []
+    for key in previous:
+        body = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+        old = pq.read_table(io.BytesIO(body)).to_pylist()
+        old_ok = [row for row in old if row["outcome"] == "success"]
+        old_start = [row["started_at"] for row in old if row["started_at"]]
+        old_end = [row["finished_at"] for row in old if row["finished_at"]]
+        if not old_ok or not old_start or not old_end:
+            continue
+        old_wall = max(max(old_end) - min(old_start), 1e-3)
+        history.append({
+            "pages_per_min": sum(row["pages"] or 0 for row in old_ok) / old_wall * 60,
+            "doc_p50_s": statistics.median(row["document_s"] or 0 for row in old_ok),
+        })
+    vs_history = {}
+    if history:
+        for metric in ("pages_per_min", "doc_p50_s"):
+            baseline = statistics.median(run[metric] for run in history)
+            vs_history[metric] = round(summary[metric] / baseline, 2) if baseline else None
+    summary["vs_history"] = vs_history
+    summary["history_runs"] = len(history)
+
+    lines = [
+        f"## Ingestion run ledger: {vector_db_id}",
+        "",
+        f"Run `{run_id}`: {len(ok)} document(s) ingested, {len(failed)} failed, wall time {wall_s:.0f}s",
+        "",
+        "| pages/min | MB/min | chunks | doc p50 s | doc p95 s | download s | docling s | chunk s | insert s |",
+        "|---:|---:|---:|---:|---:|---:|---:|---:|---:|",
+        f"| {summary['pages_per_min']} | {summary['mb_per_min']} | {chunks} | {summary['doc_p50_s']} "
+        f"| {summary['doc_p95_s']} | {stage_totals['download']} | {stage_totals['docling']} "
+        f"| {stage_totals['chunk']} | {stage_totals['insert']} |",
+        "",
+    ]
+    if vs_history:
+        lines.append(
+            f"Versus the median of the last {len(history)} run(s): pages/min x{vs_history.get('pages_per_min')}, "
+            f"doc p50 x{vs_history.get('doc_p50_s')}"
+        )
+        lines.append("")
+    if stragglers:
+        lines += [f"Stragglers (> {straggler_factor}x median s/page):", ""]
+        lines += [f"- {row['source_uri']}: {row['document_s']:.1f}s, {row['pages'] or '?'} page(s)" for row in stragglers[:10]]
+        lines.append("")
+    if failed:
+        lines += ["Failed:", ""]
+        lines += [f"- {row['source_uri']}: {row['error'] or 'unknown error'}" for row in failed]
+    text = "\n".join(lines)
+    print(text)
+    with open(report.path, "w") as f:
+        f.write(text + "\n")
+
+    # 4. Publish for Grafana (same Pushgateway as the GuideLLM benchmarks)
+    if pushgateway_url:
+        from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
+
+        registry = CollectorRegistry()
+        gauges = {
+            "documents": ("ingestion_run_documents", "Documents ingested in the last run"),
+            "failed": ("ingestion_run_failed_documents", "Documents that failed in the last run"),
+            "wall_s": ("ingestion_run_wall_seconds", "Wall time of the last run"),
+            "pages_per_min": ("ingestion_run_pages_per_minute", "Pages converted per minute"),
+            "mb_per_min": ("ingestion_run_megabytes_per_minute", "PDF megabytes ingested per minute"),
+            "chunks": ("ingestion_run_chunks", "Chunks inserted in the last run"),
+            "doc_p50_s": ("ingestion_run_document_p50_seconds", "Median per-document processing time"),
+            "doc_p95_s": ("ingestion_run_document_p95_seconds", "p95 per-document processing time"),
+        }
+        for field, (name, description) in gauges.items():
+            Gauge(name, description, registry=registry).set(summary[field])
+        Gauge("ingestion_run_stragglers", "Straggler documents in the last run", registry=registry).set(len(stragglers))
+        stage_gauge = Gauge("ingestion_run_stage_seconds", "Summed per-document time by stage", ["stage"], registry=registry)
+        for stage, seconds in stage_totals.items():
+            stage_gauge.labels(stage=stage).set(seconds)
+        Gauge("ingestion_run_finished_timestamp_seconds", "Completion time of the last run", registry=registry).set(time.time())
+        try:
+            push_to_gateway(
+                pushgateway_url,
+                job="ingestion_ledger",
+                grouping_key={"vector_db_id": collection},
+                registry=registry,
+            )
+            print(f"[OK] Pushed run metrics to {pushgateway_url}")
+        except Exception as e:  # metrics are best effort; the Parquet ledger is the record
+            print(f"[WARN] Pushgateway push failed: {e}")
+
+    for key in staged_keys:
+        s3_client.delete_object(Bucket=bucket, Key=key)
+
+    return summary
@@ -0,0 +1,222 @@
+"""
+Build a BM25 lexical index over a collection's chunks
+
+Embedding search misses many identifier-heavy queries (equipment IDs, part numbers,
+regulation article numbers). This component reads every chunk of the collection from
+Milvus (the `chunk_content` JSON written by the LlamaStack provider), builds a BM25 index
+and publishes it as a compact artifact the RAG playground memory-maps and queries next
+to vector_io.query (results are fused with RRF there).
+
+Artifact layout (`<index_uri>/<collection>/`; `<collection>` is the physical collection behind
+a blue/green alias, so the playground switches indexes with the serving marker):
+- `<built_at>/` with numpy arrays (term_offsets, postings_doc, postings_tf, doc_len,
+  chunk_offsets), the sorted vocabulary (terms.json) and the chunks (chunks.jsonl)
+- `meta.json` pointing at the current `<built_at>/`, written last so readers never see
+  a partial build. The previous build is kept for readers still downloading it.
+
+Tokenization is versioned (`tokenizer` in meta.json) and must match _lexical_terms in
+gitops/stage02-model-alignment/llama-stack/playground-rag.py.
+"""
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component("boto3", "numpy", "pymilvus")
+def build_lexical_index(
+    milvus_uri: str,
+    vector_db_id: str,
+    index_uri: str,
+    s3_secret_mount_path: str = "/mnt/secrets",
+    minio_endpoint: str = "",
+    minio_creds_b64: str = "",
+    json_field: str = "chunk_content",
+    k1: float = 1.2,
+    b: float = 0.75,
+    keep_builds: int = 2,
+) -> dict:
+    """
+    Index all chunks of `vector_db_id` for BM25 and upload the artifact.
+
+    Re-run after every ingestion: the index covers the whole collection, not just the
+    documents of the current run.
+
+    Returns:
+        {"vector_db_id", "collection", "chunks", "terms", "postings", "bytes", "built_at", "status"}
+    """
+    import io
+    import json
+    import re
+    from collections import Counter
+    from datetime import datetime, timezone
+    from pathlib import Path
+
+    import boto3
+    import numpy as np
+    from botocore.client import Config
+    from pymilvus import MilvusClient
+
+    # Must match _lexical_terms in playground-rag.py (bump TOKENIZER when changing it)
+    TOKENIZER = "bm25-v1"
+    TOKEN_RE = re.compile(r"[0-9a-z]+(?:[-_./:][0-9a-z]+)*")
+    SPLIT_RE = re.compile(r"[-_./:]")
+
+    def _terms(text):
+        # Compound identifiers ("xr-5000/b", "2024/1689", "art.6") are kept whole and
+        # also split into their parts, so exact and partial mentions both match
+        terms = []
+        for match in TOKEN_RE.finditer(text.lower()):
+            token = match.group(0)
+            terms.append(token)
+            if SPLIT_RE.search(token):
+                terms.extend(part for part in SPLIT_RE.split(token) if part)
+        return terms
+
+    # 1. Read the collection's chunks
+    uri = milvus_uri.replace("tcp://", "http://", 1)
+    client = MilvusClient(uri=uri)
+    try:
+        collection = client.describe_alias(alias=vector_db_id)["collection_name"]
+    except Exception:  # noqa: BLE001 - not an alias: the name is the physical collection
+        collection = vector_db_id
+    print(f"Building lexical index for collection '{vector_db_id}' ({collection}, {uri})")
+    if not client.has_collection(collection):
+        raise ValueError(f"Collection '{collection}' does not exist in Milvus")
+    client.flush(collection_name=collection)
+
+    chunks = []
+    iterator = client.query_iterator(
+        collection_name=collection, batch_size=1000, filter="", output_fields=[json_field]
+    )
+    while True:
+        batch = iterator.next()
+        if not batch:
+            iterator.close()
+            break
+        for row in batch:
+            payload = row.get(json_field) or {}
+            if isinstance(payload, str):
+                payload = json.loads(payload)
+            content = payload.get("content") or ""
+            if isinstance(content, str) and content.strip():
+                chunks.append({"content": content, "metadata": payload.get("metadata") or {}})
+    print(f"Read {len(chunks)} chunk(s)")
+    if not chunks:
+        print("[SKIP] Collection has no chunks; lexical index not published")
+        return {"vector_db_id": vector_db_id, "collection": collection, "chunks": 0, "terms": 0, "postings": 0,
+                "bytes": 0, "built_at": "", "status": "skipped"}
+
+    # 2. Inverted index: postings sorted by term, doc ids ascending within a term
+    postings = {}
+    doc_len = np.zeros(len(chunks), dtype=np.int32)
+    for doc_id, chunk in enumerate(chunks):
+        counts = Counter(_terms(chunk["content"]))
+        doc_len[doc_id] = sum(counts.values())
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc_id, tf))
+    terms = sorted(postings)
+    term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    for i, term in enumerate(terms):
+        term_offsets[i + 1] = term_offsets[i] + len(postings[term])
+    postings_doc = np.fromiter(
+        (doc_id for term in terms for doc_id, _ in postings[term]), dtype=np.int32, count=int(term_offsets[-1])
+    )
+    postings_tf = np.fromiter(
+        (min(tf, 65535) for term in terms for _, tf in postings[term]), dtype=np.uint16, count=int(term_offsets[-1])
+    )
+
+    # Chunks as JSON lines with byte offsets, so readers slice one chunk out of a mmap
+    chunk_lines = [json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n" for chunk in chunks]
+    chunk_offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    chunk_offsets[1:] = np.cumsum([len(line) for line in chunk_lines])
+
+    def _npy(array):
+        buffer = io.BytesIO()
+        np.save(buffer, array, allow_pickle=False)
+        return buffer.getvalue()
+
+    built_at = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    files = {
+        "term_offsets.npy": _npy(term_offsets),
+        "postings_doc.npy": _npy(postings_doc),
+        "postings_tf.npy": _npy(postings_tf),
+        "doc_len.npy": _npy(doc_len),
+        "chunk_offsets.npy": _npy(chunk_offsets),
+        "terms.json": json.dumps(terms, ensure_ascii=False).encode("utf-8"),
+        "chunks.jsonl": b"".join(chunk_lines),
+    }
+    meta = {
+        "vector_db_id": vector_db_id,
+        "collection": collection,
+        "tokenizer": TOKENIZER,
+        "built_at": built_at,
+        "path": f"{built_at}/",
+        "chunks": len(chunks),
+        "terms": len(terms),
+        "avgdl": float(doc_len.mean()),
+        "k1": k1,
+        "b": b,
+        "files": sorted(files),
+    }
+
+    # 3. Upload the build, then switch meta.json to it and drop older builds
+    def _read_secret(key: str) -> str:
+        file_path = Path(s3_secret_mount_path) / key
+        if file_path.is_file():
+            return file_path.read_text().strip()
+        raise FileNotFoundError
+
+    try:
+        endpoint_url = _read_secret("S3_ENDPOINT_URL")
+        access_key = _read_secret("S3_ACCESS_KEY")
+        secret_key = _read_secret("S3_SECRET_KEY")
+    except FileNotFoundError:
+        import base64
+
+        creds_decoded = base64.b64decode(minio_creds_b64).decode("utf-8").strip()
+        access_key, secret_key = [c.strip() for c in creds_decoded.split(":", 1)]
+        endpoint_url = minio_endpoint if minio_endpoint.startswith("http") else f"http://{minio_endpoint}"
+
+    s3_client = boto3.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+        region_name="us-east-1",
+    )
+    bucket, _, prefix = index_uri.replace("s3://", "", 1).rstrip("/").partition("/")
+    prefix = f"{prefix}/{collection}/" if prefix else f"{collection}/"
+
+    for name, body in files.items():
+        s3_client.put_object(Bucket=bucket, Key=f"{prefix}{built_at}/{name}", Body=body)
+    s3_client.put_object(
+        Bucket=bucket, Key=f"{prefix}meta.json", Body=json.dumps(meta, indent=2).encode("utf-8")
+    )
+    total_bytes = sum(len(body) for body in files.values())
+    print(f"[OK] Published s3://{bucket}/{prefix}{built_at}/ ({total_bytes / 1e6:.1f} MB)")
+
+    paginator = s3_client.get_paginator("list_objects_v2")
+    builds = set()
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+        builds.update(p["Prefix"][len(prefix):].rstrip("/") for p in page.get("CommonPrefixes", []))
+    for old_build in sorted(builds)[: -max(keep_builds, 1)]:
+        for page in paginator.paginate(Bucket=bucket, Prefix=f"{prefix}{old_build}/"):
+            keys = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+            if keys:
+                s3_client.delete_objects(Bucket=bucket, Delete={"Objects": keys})
+        print(f"Removed previous build {old_build}")
+
+    print(
+        f"Index: {len(chunks)} chunks, {len(terms)} terms, {int(term_offsets[-1])} postings, "
+        f"avgdl {meta['avgdl']:.1f}"
+    )
+    return {
+        "vector_db_id": vector_db_id,
+        "collection": collection,
+        "chunks": len(chunks),
+        "terms": len(terms),
+        "postings": int(term_offsets[-1]),
+        "bytes": total_bytes,
+        "built_at": built_at,
+        "status": "success",
+    }
@@ -1,135 +1,131 @@
 """
 Chunk markdown document for RAG ingestion
 
-This component splits markdown into manageable chunks for vector storage.
+This component splits markdown into manageable chunks for vector storage and
+records structural metadata (section, pages, document type/date) per chunk.
 Respects Milvus field size limits and handles edge cases robustly.
 
 NOTE: Embeddings are computed server-side by LlamaStack, not by this component.
 """
 
-from kfp import dsl
 from kfp.dsl import Dataset, Output, Input
 
-# Base container images
-# Pinned to specific version for reproducibility (per KFP best practices)
-BASE_PYTHON_IMAGE = "registry.access.redhat.com/ubi9/python-311:1-77"
+from components.runtime import ingestion_component
 
 
-@dsl.component(
-    base_image=BASE_PYTHON_IMAGE
-)
+@ingestion_component(modules=("markdown_chunker",))
 def chunk_markdown(
     markdown_file: Input[Dataset],
     chunk_size: int,
-    output_chunks: Output[Dataset]
+    output_chunks: Output[Dataset],
+    workspace_dir: str = "",
+    chunk_overlap: int = 0,
+    document_type_keywords: list = [],
 ):
     """
     Chunk markdown document for RAG ingestion
     
     NOTE: Embeddings are computed server-side by LlamaStack, not by this step.
     This is purely chunking - no HTTP calls, faster and cheaper.
+    
+    Each chunk carries structural metadata so retrieval can push filters down to Milvus:
+    - section_path / section_title: markdown heading trail the chunk belongs to
+    - page_start / page_end: page range (from Docling page-break placeholders)
+    - document_type / document_date / page_count: document-level facts
+
+    With `workspace_dir` set, the chunks JSON is written to the shared workspace PVC and
+    only a manifest is uploaded (same scheme as download_from_s3).
+
+    `chunk_overlap` > 0 prefixes every chunk after the first with the tail of the previous
+    one (cut at a word boundary); chunks are packed `chunk_overlap` chars smaller so the
+    result still fits `chunk_size`.
+
+    `document_type_keywords` ([keyword, type] pairs, first match in filename + title wins)
+    replaces markdown_chunker's default table; see kfp/document-types/<vector_db_id>.json.
+
+    Directory input (process_with_docling_batch output) is chunked per document into
+    `<stem>.json` files plus a `manifest.json` listing `source_uri` and chunk counts;
+    documents whose conversion failed are skipped.
     """
+    import time
     import json
-    
+    import os
+
+    # Shared with the RAG playground's upload path (kfp/runtime-image/markdown_chunker.py)
+    from markdown_chunker import chunk_document
+
     print(f"Chunking markdown document...")
     
-    # Read markdown
-    with open(markdown_file.path, "r") as f:
-        content = f.read()
+    # Read markdown (resolve shared-volume artifacts: manifest in S3, payload on the PVC).
+    # A directory input comes from process_with_docling_batch: <stem>.md files + manifest.json
+    markdown_path = markdown_file.metadata.get("workspace_path") or markdown_file.path
+    # Run ledger (see aggregate_ingestion_ledger): add chunk counts/time per document
+    ledger = dict(markdown_file.metadata.get("ledger") or {})
     
-    # Smart chunking with size limit (Milvus dynamic field limit is 65536 chars)
-    # Use chunk_size parameter but enforce Milvus limit
-    MAX_CHUNK_SIZE = 60000  # Absolute ceiling enforced by Milvus dynamic field limit
-    effective_chunk_size = min(max(chunk_size, 1), MAX_CHUNK_SIZE)
+    def _write(payload, output_path):
+        with open(output_path, "w") as f:
+            json.dump(payload, f)
     
-    print(f"Chunking with max size: {effective_chunk_size} chars")
-    
-    # Split by paragraphs first
-    paragraphs = [p.strip() for p in content.split("\n\n") if p.strip()]
-    
-    # Combine paragraphs into chunks respecting size limit
-    chunks = []
-    current_chunk = []
-    current_length = 0
-    
-    for para in paragraphs:
-        para_len = len(para)
+    if os.path.isdir(markdown_path):
+        with open(os.path.join(markdown_path, "manifest.json")) as f:
+            documents = json.load(f)["documents"]
+        target_dir = output_chunks.path
+        if workspace_dir:
+            target_dir = os.path.join(workspace_dir, output_chunks.uri.split("://", 1)[-1])
+        os.makedirs(target_dir, exist_ok=True)
         
-        # If single paragraph exceeds limit, split it
-        if para_len > effective_chunk_size:
-            # Add current chunk if any
-            if current_chunk:
-                chunks.append("\n\n".join(current_chunk))
-                current_chunk = []
-                current_length = 0
-            
-            # Split large paragraph by sentences
-            sentences = para.split(". ")
-            temp_chunk = []
-            temp_len = 0
-            
-            for sent in sentences:
-                sent_len = len(sent) + 2  # +2 for ". "
-                if temp_len + sent_len > effective_chunk_size:
-                    if temp_chunk:
-                        chunks.append(". ".join(temp_chunk) + ".")
-                    temp_chunk = [sent]
-                    temp_len = sent_len
-                else:
-                    temp_chunk.append(sent)
-                    temp_len += sent_len
-            
-            if temp_chunk:
-                chunks.append(". ".join(temp_chunk) + ".")
+        manifest = []
+        total_chunks = 0
+        for doc in documents:
+            if doc.get("status") != "success":
+                print(f"[SKIP] {doc['source_uri']}: conversion failed")
+                continue
+            print(f"--- {doc['source_filename']} ---")
+            doc_started = time.time()
+            with open(os.path.join(markdown_path, doc["name"]), "r") as f:
+                chunk_data = chunk_document(
+                    f.read(), doc["source_filename"], chunk_size, chunk_overlap, doc.get("page_count"),
+                    document_type_keywords,
+                )
+            name = f"{os.path.splitext(doc['name'])[0]}.json"
+            _write(chunk_data, os.path.join(target_dir, name))
+            manifest.append({"name": name, "source_uri": doc["source_uri"], "num_chunks": len(chunk_data)})
+            total_chunks += len(chunk_data)
+            ledger.setdefault(doc["source_uri"], {}).update(
+                chunks=len(chunk_data), chunk_s=round(time.time() - doc_started, 3)
+            )
         
-        # Normal paragraph fits or can be added
-        elif current_length + para_len + 2 > effective_chunk_size:
-            # Current chunk is full, start new one
-            if current_chunk:
-                chunks.append("\n\n".join(current_chunk))
-            current_chunk = [para]
-            current_length = para_len
-        else:
-            # Add to current chunk
-            current_chunk.append(para)
-            current_length += para_len + 2  # +2 for \n\n
-    
-    # Add final chunk
-    if current_chunk:
-        chunks.append("\n\n".join(current_chunk))
+        _write({"documents": manifest}, os.path.join(target_dir, "manifest.json"))
+        output_chunks.metadata["ledger"] = ledger
+        if workspace_dir:
+            output_chunks.metadata["workspace_path"] = target_dir
+            os.makedirs(output_chunks.path, exist_ok=True)
+            _write({"workspace_path": target_dir}, os.path.join(output_chunks.path, "manifest.json"))
+        print(f"[OK] Created {total_chunks} chunks for {len(manifest)} document(s) (embeddings will be computed by LlamaStack)")
+        return
     
-    # CRITICAL: Final safety check - force-split any chunk that STILL exceeds limit
-    # This handles edge cases like very long sentences or code blocks
-    final_chunks = []
-    for chunk in chunks:
-        chunk_len = len(chunk)
-        if chunk_len > effective_chunk_size:
-            # Force-split by characters as last resort
-            print(f"SAFETY: Force-splitting {chunk_len} char chunk into {effective_chunk_size} char pieces")
-            for i in range(0, chunk_len, effective_chunk_size):
-                piece = chunk[i:i + effective_chunk_size]
-                if len(piece) > 50:  # Filter very short pieces
-                    final_chunks.append(piece)
-        elif chunk_len > 50:  # Filter out very short chunks
-            final_chunks.append(chunk)
+    doc_started = time.time()
+    with open(markdown_path, "r") as f:
+        chunk_data = chunk_document(
+            f.read(),
+            markdown_file.metadata.get("source_filename", ""),
+            chunk_size,
+            chunk_overlap,
+            markdown_file.metadata.get("page_count"),
+            document_type_keywords,
+        )
     
-    chunks = final_chunks
+    output_path = output_chunks.path
+    if workspace_dir:
+        output_path = os.path.join(workspace_dir, output_chunks.uri.split("://", 1)[-1])
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    _write(chunk_data, output_path)
+    if workspace_dir:
+        output_chunks.metadata["workspace_path"] = output_path
+        _write({"workspace_path": output_path, "size_bytes": os.path.getsize(output_path)}, output_chunks.path)
+    source_uri = markdown_file.metadata.get("source_uri", "")
+    if source_uri:
+        ledger.setdefault(source_uri, {}).update(chunks=len(chunk_data), chunk_s=round(time.time() - doc_started, 3))
+    output_chunks.metadata["ledger"] = ledger
     
-    # Verify NO chunk exceeds limit
-    if chunks:
-        max_chunk_len = max(len(c) for c in chunks)
-        print(f"Created {len(chunks)} chunks (max length: {max_chunk_len} chars, limit: {effective_chunk_size})")
-        if max_chunk_len > effective_chunk_size:
-            raise ValueError(f"BUG: Chunk of {max_chunk_len} chars STILL exceeds limit {effective_chunk_size}!")
-    else:
-        print("No chunks created (document too short)")
-    
-    # Save chunks as simple JSON array of text strings
-    # LlamaStack will compute embeddings server-side
-    chunk_data = [{"chunk_id": i, "text": text} for i, text in enumerate(chunks)]
-    
-    with open(output_chunks.path, "w") as f:
-        json.dump(chunk_data, f)
-    
-    print(f"[OK] Created {len(chunks)} chunks (embeddings will be computed by LlamaStack)")
-
+    print(f"[OK] Created {len(chunk_data)} chunks (embeddings will be computed by LlamaStack)")
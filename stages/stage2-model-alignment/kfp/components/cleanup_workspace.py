@@ -0,0 +1,46 @@
+"""
+Remove a run's intermediate artifacts from the shared ingestion workspace
+
+When shared-volume artifact passing is enabled, producers write payloads under
+`<workspace_dir>/<artifact URI path>`, which always contains the KFP run ID as a path
+segment. This component deletes that run directory once the run's documents are inserted.
+"""
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component()
+def cleanup_workspace(
+    workspace_dir: str,
+    run_id: str,
+    max_depth: int = 5,
+) -> int:
+    """
+    Delete every `<run_id>` directory found within `max_depth` levels of `workspace_dir`.
+
+    Returns:
+        Number of bytes freed.
+    """
+    import os
+    import shutil
+
+    if not workspace_dir or not run_id:
+        print("[SKIP] Shared workspace not configured")
+        return 0
+
+    root_depth = workspace_dir.rstrip("/").count("/")
+    freed = 0
+    for root, dirs, _ in os.walk(workspace_dir):
+        if root.rstrip("/").count("/") - root_depth >= max_depth:
+            dirs[:] = []
+            continue
+        if run_id in dirs:
+            run_dir = os.path.join(root, run_id)
+            for dirpath, _, filenames in os.walk(run_dir):
+                freed += sum(os.path.getsize(os.path.join(dirpath, name)) for name in filenames)
+            shutil.rmtree(run_dir)
+            dirs.remove(run_id)
+            print(f"Removed {run_dir}")
+
+    print(f"[OK] Freed {freed / 1024 / 1024:.1f} MB from {workspace_dir}")
+    return freed
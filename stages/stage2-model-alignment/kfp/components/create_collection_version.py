@@ -0,0 +1,48 @@
+"""
+Register a versioned shadow collection for a blue/green rebuild
+
+The reindex pipeline never writes into the collection the playground and agents read.
+It registers `<vector_db_id>__v<UTC timestamp>` in LlamaStack, ingests into that, and only
+switches the serving name over (switch_collection_alias) once the new version verifies.
+"""
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component("requests")
+def create_collection_version(
+    llamastack_url: str,
+    vector_db_id: str,
+    embedding_model: str = "ibm-granite/granite-embedding-125m-english",
+    embedding_dimension: int = 768,
+    provider_id: str = "milvus-shared",
+) -> str:
+    """
+    Register a new, empty collection version with LlamaStack.
+
+    Returns:
+        The versioned vector DB ID (also the Milvus collection name).
+    """
+    import time
+    import requests
+
+    version_id = f"{vector_db_id}__v{time.strftime('%Y%m%d%H%M%S', time.gmtime())}"
+    print(f"Registering shadow collection {version_id} for {vector_db_id}")
+
+    response = requests.post(
+        f"{llamastack_url}/v1/vector-dbs",
+        json={
+            "vector_db_id": version_id,
+            "provider_vector_db_id": version_id,
+            "embedding_model": embedding_model,
+            "embedding_dimension": embedding_dimension,
+            "provider_id": provider_id,
+        },
+        timeout=60,
+    )
+    if response.status_code != 200:
+        print(f"Response: {response.text}")
+    response.raise_for_status()
+
+    print(f"[OK] Registered {version_id} ({embedding_model}, dim {embedding_dimension})")
+    return version_id
@@ -0,0 +1,119 @@
+"""
+Download a group of documents from S3/MinIO into one directory artifact
+
+Batch counterpart of download_from_s3, used by the packed pipeline so one pod (and one
+Docling job per pack) handles many short PDFs instead of one pod chain per file.
+"""
+
+from typing import List
+
+from kfp.dsl import Dataset, Output
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component("boto3", "requests")
+def download_batch_from_s3(
+    input_uris: List[str],
+    s3_secret_mount_path: str,
+    output_dir: Output[Dataset],
+    minio_endpoint: str = "",
+    minio_creds_b64: str = "",
+    workspace_dir: str = ""
+):
+    """
+    Download every URI in `input_uris` into a directory artifact.
+
+    Files are stored as `<index>_<basename>` (index keeps names unique across prefixes)
+    next to a `manifest.json`:
+        {"documents": [{"name", "source_uri", "size_bytes"}, ...]}
+
+    Credentials and `workspace_dir` behave exactly as in download_from_s3.
+    """
+    import time
+    started_at = time.time()
+    import json
+    import os
+    from pathlib import Path
+
+    print(f"Downloading {len(input_uris)} document(s)")
+
+    endpoint_url = ""
+    access_key = ""
+    secret_key = ""
+
+    def _read_secret(key: str) -> str:
+        file_path = Path(s3_secret_mount_path) / key
+        if file_path.is_file():
+            return file_path.read_text().strip()
+        raise FileNotFoundError
+
+    try:
+        endpoint_url = _read_secret("S3_ENDPOINT_URL")
+        access_key = _read_secret("S3_ACCESS_KEY")
+        secret_key = _read_secret("S3_SECRET_KEY")
+        print(f"[OK] Loaded S3 credentials from secret at {s3_secret_mount_path}")
+    except FileNotFoundError:
+        if not minio_endpoint or not minio_creds_b64:
+            raise ValueError(
+                "S3 secret files were not found and fallback credentials were not provided. "
+                "Provide `minio_endpoint` and `minio_creds_b64`, or mount the secret."
+            )
+        import base64
+
+        creds_decoded = base64.b64decode(minio_creds_b64).decode("utf-8").strip()
+        access_key, secret_key = [c.strip() for c in creds_decoded.split(":", 1)]
+        endpoint_url = f"http://{minio_endpoint}" if not minio_endpoint.startswith("http") else minio_endpoint
+        print("[WARN] Falling back to inline credentials (base64 parameter).")
+
+    # Heavy imports deferred until credentials are validated
+    import boto3
+    from botocore.client import Config
+
+    s3_client = boto3.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+        region_name="us-east-1",
+    )
+
+    # Directory output (on the shared workspace when enabled)
+    target_dir = output_dir.path
+    if workspace_dir:
+        target_dir = os.path.join(workspace_dir, output_dir.uri.split("://", 1)[-1])
+    os.makedirs(target_dir, exist_ok=True)
+
+    documents = []
+    ledger = {}
+    total_bytes = 0
+    for index, uri in enumerate(input_uris):
+        doc_started = time.time()
+        bucket, _, key = uri[5:].partition("/") if uri.startswith("s3://") else uri.partition("/")
+        name = f"{index:04d}_{os.path.basename(key)}"
+        local_path = os.path.join(target_dir, name)
+        s3_client.download_file(bucket, key, local_path)
+        size = os.path.getsize(local_path)
+        total_bytes += size
+        documents.append({"name": name, "source_uri": f"s3://{bucket}/{key}", "size_bytes": size})
+        ledger[f"s3://{bucket}/{key}"] = {
+            "bytes": size,
+            "started_at": round(started_at, 3),
+            "download_s": round(time.time() - doc_started, 3),
+        }
+        print(f"  [OK] {uri} ({size} bytes)")
+
+    with open(os.path.join(target_dir, "manifest.json"), "w") as f:
+        json.dump({"documents": documents}, f)
+
+    output_dir.metadata["num_documents"] = len(documents)
+    output_dir.metadata["size_bytes"] = total_bytes
+    output_dir.metadata["ledger"] = ledger  # see aggregate_ingestion_ledger
+    if workspace_dir:
+        output_dir.metadata["workspace_path"] = target_dir
+        os.makedirs(output_dir.path, exist_ok=True)
+        with open(os.path.join(output_dir.path, "manifest.json"), "w") as f:
+            json.dump({"workspace_path": target_dir, "size_bytes": total_bytes}, f)
+
+    print(f"[OK] Downloaded {len(documents)} document(s), {total_bytes / 1024 / 1024:.2f} MB total")
@@ -5,24 +5,19 @@ This component downloads a PDF from MinIO using boto3.
 Credentials are passed as base64-encoded parameter (per KFP v2 limitations).
 """
 
-from kfp import dsl
 from kfp.dsl import Dataset, Output
 
-# Base container images
-# Pinned to specific version for reproducibility (per KFP best practices)
-BASE_PYTHON_IMAGE = "registry.access.redhat.com/ubi9/python-311:1-77"
+from components.runtime import ingestion_component
 
 
-@dsl.component(
-    base_image=BASE_PYTHON_IMAGE,
-    packages_to_install=["boto3", "requests"]
-)
+@ingestion_component("boto3", "requests")
 def download_from_s3(
     input_uri: str,
     s3_secret_mount_path: str,
     output_file: Output[Dataset],
     minio_endpoint: str = "",
-    minio_creds_b64: str = ""
+    minio_creds_b64: str = "",
+    workspace_dir: str = ""
 ):
     """
     Download document from MinIO/S3.
@@ -33,12 +28,15 @@ def download_from_s3(
     the upstream Docling Kubeflow pipeline pattern. For environments where
     Kubernetes secret mounts are not available (for example KFP v2 stripping
     secret refs), provide `minio_endpoint` and `minio_creds_b64` as a fallback.
+
+    If `workspace_dir` is set (shared RWX PVC mounted by the pipeline), the PDF is saved
+    there and `output_file` only carries a JSON manifest pointing at it.
     """
+    import time
+    started_at = time.time()
+    import json
     import os
     from pathlib import Path
-
-    import boto3
-    from botocore.client import Config
     
     print(f"Downloading from: {input_uri}")
 
@@ -80,6 +78,10 @@ def download_from_s3(
     
     print(f"Bucket: {bucket}, Key: {key}")
     
+    # Heavy imports deferred until credentials and URI are validated
+    import boto3
+    from botocore.client import Config
+
     # Configure S3 client for MinIO/S3
     s3_client = boto3.client(
         "s3",
@@ -90,10 +92,27 @@ def download_from_s3(
         region_name="us-east-1",
     )
     
-    # Download file
+    # Download file (to the shared workspace when enabled)
     output_path = output_file.path
+    if workspace_dir:
+        output_path = os.path.join(workspace_dir, output_file.uri.split("://", 1)[-1])
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
     s3_client.download_file(bucket, key, output_path)
     
     file_size = os.path.getsize(output_path)
+    output_file.metadata["source_uri"] = f"s3://{bucket}/{key}"
+    output_file.metadata["size_bytes"] = file_size
+    # Run ledger entry, extended by every later step (see aggregate_ingestion_ledger)
+    output_file.metadata["ledger"] = {
+        f"s3://{bucket}/{key}": {
+            "bytes": file_size,
+            "started_at": round(started_at, 3),
+            "download_s": round(time.time() - started_at, 3),
+        }
+    }
+    if workspace_dir:
+        output_file.metadata["workspace_path"] = output_path
+        with open(output_file.path, "w") as f:
+            json.dump({"workspace_path": output_path, "size_bytes": file_size}, f)
     print(f"[OK] Downloaded: {file_size} bytes to {output_path}")
 
@@ -0,0 +1,46 @@
+"""
+Drop the scratch collections of a chunking autotune run
+
+evaluate_chunking_trial drops its collection once the trial is measured; a trial that
+fails before that (insert, evaluation, or a cancelled run) leaves it behind. This step runs
+after all trials whatever their outcome and removes every `<trial vector_db_id>__v*`
+collection that is still registered.
+"""
+
+from typing import List
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component("pymilvus", "requests")
+def drop_trial_collections(
+    milvus_uri: str,
+    llamastack_url: str,
+    trials: List[dict] = [],
+) -> List[str]:
+    """
+    Unregister and drop the leftover collections of `trials` (plan_chunking_trials output).
+
+    `trials` defaults to empty (nothing to drop) when plan_chunking_trials itself failed.
+
+    Returns:
+        The dropped collection names.
+    """
+    import requests
+    from pymilvus import MilvusClient
+
+    client = MilvusClient(uri=milvus_uri.replace("tcp://", "http://", 1))
+    prefixes = tuple(f"{trial['vector_db_id']}__v" for trial in trials)
+    leftovers = sorted(name for name in client.list_collections() if name.startswith(prefixes))
+    print(f"{len(trials)} trial(s); leftover scratch collections: {leftovers or 'none'}")
+
+    for name in leftovers:
+        # Unregister through LlamaStack first so it stops listing the collection
+        response = requests.delete(f"{llamastack_url}/v1/vector-dbs/{name}", timeout=60)
+        if response.status_code not in (200, 204, 404):
+            print(f"  [WARN] LlamaStack unregister {name}: HTTP {response.status_code}")
+        if client.has_collection(name):
+            client.drop_collection(collection_name=name)
+        print(f"  Dropped {name}")
+
+    return leftovers
@@ -0,0 +1,120 @@
+"""
+Measure one chunking trial: replay a query set against its scratch collection
+
+Reports, per (chunk_size, chunk_overlap):
+- recall@k: share of queries with at least one relevant chunk in the top k
+- p50/p95 query latency through LlamaStack /v1/vector-io/query
+- index size: row count (measured) and an estimate of the vector bytes (rows x dimension x
+  4, raw float32 vectors only; index structures and scalar fields are not counted)
+- avg context tokens: size of the top-k context the model would be sent (~4 chars/token)
+
+The scratch collection is dropped afterwards unless keep_collection is set
+(drop_trial_collections catches the ones a failed trial leaves behind).
+"""
+
+from typing import List
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component("pymilvus", "requests")
+def evaluate_chunking_trial(
+    milvus_uri: str,
+    llamastack_url: str,
+    version_id: str,
+    trial: dict,
+    queries: List[dict],
+    top_k: int = 5,
+    repeats: int = 3,
+    embedding_dimension: int = 768,
+    keep_collection: bool = False,
+) -> dict:
+    """
+    Evaluate the collection `version_id` built for `trial`.
+
+    Each query is {"query": str, "expected_source": str, "expected_text": str (optional)}.
+    A chunk is relevant when its source_uri/document_id contains expected_source
+    (case-insensitive) and, if given, its text contains expected_text.
+    """
+    import time
+    import math
+    import requests
+    from pymilvus import MilvusClient
+
+    if not queries:
+        raise ValueError("Query set is empty")
+
+    def _content(chunk):
+        content = chunk.get("content", "")
+        if isinstance(content, list):
+            return " ".join(item.get("text", "") if isinstance(item, dict) else str(item) for item in content)
+        return str(content)
+
+    def _is_relevant(chunk, query):
+        metadata = chunk.get("metadata") or {}
+        source = f"{metadata.get('source_uri', '')} {metadata.get('document_id', '')}".lower()
+        if query.get("expected_source", "").lower() not in source:
+            return False
+        expected_text = query.get("expected_text", "").lower()
+        return not expected_text or expected_text in _content(chunk).lower()
+
+    def _percentile(values, pct):
+        ordered = sorted(values)
+        return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+    session = requests.Session()
+
+    def _query(text):
+        started = time.perf_counter()
+        response = session.post(
+            f"{llamastack_url}/v1/vector-io/query",
+            json={"vector_db_id": version_id, "query": text, "params": {"top_k": top_k}},
+            timeout=60,
+        )
+        response.raise_for_status()
+        return response.json().get("chunks", [])[:top_k], (time.perf_counter() - started) * 1000
+
+    # Warm-up: first query loads the collection and the embedding model
+    _query(queries[0]["query"])
+
+    latencies_ms = []
+    hits = 0
+    context_chars = []
+    for query in queries:
+        for _ in range(max(repeats, 1)):
+            chunks, latency_ms = _query(query["query"])
+            latencies_ms.append(latency_ms)
+        relevant = any(_is_relevant(chunk, query) for chunk in chunks)
+        hits += relevant
+        context_chars.append(sum(len(_content(chunk)) for chunk in chunks))
+        print(f"  {'HIT ' if relevant else 'MISS'} {query['query'][:70]}")
+
+    client = MilvusClient(uri=milvus_uri.replace("tcp://", "http://", 1))
+    client.flush(collection_name=version_id)
+    result = client.query(
+        collection_name=version_id, filter="", output_fields=["count(*)"], consistency_level="Strong"
+    )
+    num_rows = int(result[0]["count(*)"]) if result else 0
+
+    metrics = {
+        **trial,
+        "version_id": version_id,
+        "recall": round(hits / len(queries), 4),
+        "top_k": top_k,
+        "p50_latency_ms": round(_percentile(latencies_ms, 50), 1),
+        "p95_latency_ms": round(_percentile(latencies_ms, 95), 1),
+        "num_rows": num_rows,
+        "est_vector_bytes": num_rows * embedding_dimension * 4,
+        "avg_context_tokens": round(sum(context_chars) / len(context_chars) / 4),
+    }
+    print(f"Trial c{trial['chunk_size']}/o{trial['chunk_overlap']}: {metrics}")
+
+    if not keep_collection:
+        response = session.delete(f"{llamastack_url}/v1/vector-dbs/{version_id}", timeout=60)
+        if response.status_code not in (200, 204, 404):
+            print(f"[WARN] LlamaStack unregister {version_id}: HTTP {response.status_code}")
+        if client.has_collection(version_id):
+            client.drop_collection(collection_name=version_id)
+        print(f"Dropped scratch collection {version_id}")
+
+    return metrics
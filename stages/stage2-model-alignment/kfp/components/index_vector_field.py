@@ -0,0 +1,96 @@
+"""
+Rebuild the vector index of a collection with tuned settings
+
+The LlamaStack Milvus provider creates each collection with Milvus' default vector index.
+This component replaces it with the index type/parameters picked by
+kfp/benchmark_vector_index.py, keeping the provider's metric type so its searches still
+match the index.
+
+Rebuilding releases the collection while the new index is built, so it only runs on
+collections nobody reads yet: the reindex pipeline applies it to the shadow version before
+the switch, and a collection that is a serving alias or the target of one is refused.
+"""
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component("pymilvus")
+def index_vector_field(
+    milvus_uri: str,
+    vector_db_id: str,
+    index_type: str,
+    index_params: dict,
+    metric_type: str = "",
+    vector_field: str = "vector",
+) -> dict:
+    """
+    Create `index_type` (e.g. HNSW with {"M": 16, "efConstruction": 200}) on the vector field.
+
+    An existing vector index with the same type and parameters is left alone, so re-runs
+    are no-ops; an empty `index_type` keeps the current index. `metric_type` defaults to
+    the metric of the index being replaced.
+    """
+    import time
+    import json
+
+    from pymilvus import MilvusClient
+
+    if not index_type:
+        print(f"[SKIP] No tuned index requested; {vector_db_id} keeps its default vector index")
+        return {"vector_db_id": vector_db_id, "index_type": "", "status": "skipped"}
+
+    client = MilvusClient(uri=milvus_uri.replace("tcp://", "http://", 1))
+    if not client.has_collection(vector_db_id):
+        raise ValueError(f"Collection '{vector_db_id}' does not exist in Milvus")
+
+    # Readers search through the serving alias: refuse to release what it points at
+    try:
+        served_as = [vector_db_id] if client.describe_alias(alias=vector_db_id) else []
+    except Exception:  # noqa: BLE001 - not an alias
+        served_as = client.list_aliases(collection_name=vector_db_id).get("aliases", [])
+    if served_as:
+        raise ValueError(
+            f"'{vector_db_id}' is served (alias {', '.join(served_as)}); build the index on a "
+            "shadow version with the reindex pipeline"
+        )
+
+    current = None
+    for index_name in client.list_indexes(collection_name=vector_db_id):
+        info = client.describe_index(collection_name=vector_db_id, index_name=index_name)
+        if info.get("field_name") == vector_field:
+            current = {**info, "index_name": index_name}
+            break
+
+    metric_type = metric_type or (current or {}).get("metric_type") or "L2"
+    wanted = {key: str(value) for key, value in index_params.items()}
+    if current and current.get("index_type") == index_type and current.get("metric_type") == metric_type and all(
+        str(current.get(key)) == value for key, value in wanted.items()
+    ):
+        print(f"[OK] {vector_db_id}.{vector_field} already has {index_type} {json.dumps(index_params)}")
+        return {"vector_db_id": vector_db_id, "index_type": index_type, "status": "unchanged"}
+
+    print(f"Replacing {current.get('index_type') if current else 'no'} index on {vector_db_id}.{vector_field} "
+          f"with {index_type} {json.dumps(index_params)} ({metric_type})")
+    started = time.time()
+    client.release_collection(collection_name=vector_db_id)
+    if current:
+        client.drop_index(collection_name=vector_db_id, index_name=current["index_name"])
+
+    params = client.prepare_index_params()
+    params.add_index(
+        field_name=vector_field,
+        index_type=index_type,
+        index_name=(current or {}).get("index_name") or vector_field,
+        metric_type=metric_type,
+        params=index_params,
+    )
+    client.create_index(collection_name=vector_db_id, index_params=params)
+    client.load_collection(collection_name=vector_db_id)
+    print(f"[OK] Index built and collection loaded in {time.time() - started:.1f}s")
+
+    return {
+        "vector_db_id": vector_db_id,
+        "index_type": index_type,
+        "metric_type": metric_type,
+        "status": "success",
+    }
@@ -9,23 +9,22 @@ Chunks are sent with structured metadata (dict, not JSON string) so the provider
 serialize fields appropriately for Milvus. Embeddings are generated server-side.
 """
 
-from kfp import dsl
 from kfp.dsl import Dataset, Input
 
-# Base container images
-# Pinned to specific version for reproducibility (per KFP best practices)
-BASE_PYTHON_IMAGE = "registry.access.redhat.com/ubi9/python-311:1-77"
+from components.runtime import ingestion_component
 
 
-@dsl.component(
-    base_image=BASE_PYTHON_IMAGE,
-    packages_to_install=["requests"]
-)
+@ingestion_component("boto3", "requests")
 def insert_via_llamastack(
     chunks_file: Input[Dataset],
     llamastack_url: str,
     vector_db_id: str,
-    input_uri: str  # For metadata
+    input_uri: str,  # For metadata
+    ledger_uri: str = "",
+    run_id: str = "",
+    s3_secret_mount_path: str = "/mnt/secrets",
+    minio_endpoint: str = "",
+    minio_creds_b64: str = "",
 ) -> dict:
     """
     Insert chunks via LlamaStack /v1/vector-io/insert API
@@ -33,8 +32,17 @@ def insert_via_llamastack(
     LlamaStack computes embeddings server-side - we only send content + metadata.
     This is faster and more efficient than pre-computing embeddings.
     
+    Accepts a single chunks file or a chunk directory with a manifest (packed pipeline);
+    batches of 100 chunks may then span several documents.
+
+    With `ledger_uri` set, one JSON record per document (stage timings, bytes, pages,
+    chunks, retries, outcome; accumulated in artifact metadata by the upstream steps) is
+    written to `<ledger_uri>/staging/<run_id>/` for aggregate_ingestion_ledger.
+    
     Reference: https://docs.redhat.com/en/documentation/red_hat_openshift_ai_self-managed/2.25/html/working_with_llama_stack/
     """
+    import time
+    started_at = time.time()
     import requests
     import json
     import os
@@ -43,13 +51,22 @@ def insert_via_llamastack(
     print(f"Target vector DB: {vector_db_id}")
     
     # Load chunks (just text, no embeddings - LlamaStack computes them server-side)
-    with open(chunks_file.path, "r") as f:
-        chunks_data = json.load(f)
+    # Shared-volume artifacts carry the payload location in metadata (manifest in S3).
+    # A directory (chunk_markdown over process_with_docling_batch output) holds one chunks
+    # file per document; each keeps its own source_uri, and `input_uri` is only a label.
+    chunks_path = chunks_file.metadata.get("workspace_path") or chunks_file.path
+    if os.path.isdir(chunks_path):
+        with open(os.path.join(chunks_path, "manifest.json"), "r") as f:
+            documents = json.load(f)["documents"]
+        sources = []
+        for doc in documents:
+            with open(os.path.join(chunks_path, doc["name"]), "r") as f:
+                sources.append((doc["source_uri"], json.load(f)))
+    else:
+        with open(chunks_path, "r") as f:
+            sources = [(input_uri, json.load(f))]
     
-    print(f"Loaded {len(chunks_data)} chunks (embeddings computed server-side)")
-    
-    # Extract source filename from input_uri for better document IDs
-    source_name = os.path.basename(input_uri).replace(".pdf", "").replace("s3://", "").replace("/", "-")
+    print(f"Loaded {sum(len(c) for _, c in sources)} chunks from {len(sources)} document(s) (embeddings computed server-side)")
     
     # Format chunks for LlamaStack API
     # Reference: https://llama-stack.readthedocs.io/en/v0.2.11/providers/vector_io/milvus.html
@@ -64,45 +81,51 @@ def insert_via_llamastack(
     #
     # NOTE: v0.2.x provider manages chunk IDs internally. Do NOT send stored_chunk_id.
     llamastack_chunks = []
+    chunk_sources = []  # source_uri per chunk, for the per-document ledger
     skipped_chunks = 0
     min_len = None
     max_len = None
-    for i, item in enumerate(chunks_data):
-        content_text = item.get("text") or item.get("content") or ""
-        if not isinstance(content_text, str):
-            content_text = str(content_text)
-        stripped = content_text.strip()
-        if not stripped:
-            skipped_chunks += 1
-            print(f"[SKIP] Chunk {i} empty after stripping; raw length={len(content_text)}")
-            continue
-        content_text = stripped
+    for source_uri, chunks_data in sources:
+        # Extract source filename from the source URI for better document IDs
+        source_name = os.path.basename(source_uri).replace(".pdf", "").replace("s3://", "").replace("/", "-")
+
+        for i, item in enumerate(chunks_data):
+            content_text = item.get("text") or item.get("content") or ""
+            if not isinstance(content_text, str):
+                content_text = str(content_text)
+            stripped = content_text.strip()
+            if not stripped:
+                skipped_chunks += 1
+                print(f"[SKIP] Chunk {i} empty after stripping; raw length={len(content_text)}")
+                continue
+            content_text = stripped
         
-        # Calculate token count (rough estimation: ~4 chars per token)
-        token_count = len(content_text) // 4
+            # Calculate token count (rough estimation: ~4 chars per token)
+            token_count = len(content_text) // 4
         
-        metadata_dict = {
-            "document_id": source_name,
-            "chunk_index": int(i),
-            "chunk_id": int(item.get("chunk_id", i)),
-            "source_uri": input_uri,
-            "token_count": int(token_count),
-            "character_count": len(content_text),
-        }
-
-        extra_metadata = item.get("metadata")
-        if isinstance(extra_metadata, dict):
-            metadata_dict.update(extra_metadata)
-
-        text_len = len(content_text)
-        min_len = text_len if min_len is None else min(min_len, text_len)
-        max_len = text_len if max_len is None else max(max_len, text_len)
-
-        # v0.2.x: Provider auto-generates chunk IDs (no stored_chunk_id needed)
-        llamastack_chunks.append({
-            "content": content_text,
-            "metadata": metadata_dict  # Must be dict - LlamaStack API requires it
-        })
+            metadata_dict = {
+                "document_id": source_name,
+                "chunk_index": int(i),
+                "chunk_id": int(item.get("chunk_id", i)),
+                "source_uri": source_uri,
+                "token_count": int(token_count),
+                "character_count": len(content_text),
+            }
+
+            extra_metadata = item.get("metadata")
+            if isinstance(extra_metadata, dict):
+                metadata_dict.update(extra_metadata)
+
+            text_len = len(content_text)
+            min_len = text_len if min_len is None else min(min_len, text_len)
+            max_len = text_len if max_len is None else max(max_len, text_len)
+
+            # v0.2.x: Provider auto-generates chunk IDs (no stored_chunk_id needed)
+            llamastack_chunks.append({
+                "content": content_text,
+                "metadata": metadata_dict  # Must be dict - LlamaStack API requires it
+            })
+            chunk_sources.append(source_uri)
 
     if skipped_chunks:
         print(f"Skipped {skipped_chunks} chunk(s) with empty content.")
@@ -118,8 +141,9 @@ def insert_via_llamastack(
     batches = [llamastack_chunks[i:i + BATCH_SIZE] for i in range(0, len(llamastack_chunks), BATCH_SIZE)]
     
     print(f"Split into {len(batches)} batch(es) of up to {BATCH_SIZE} chunks")
+    insert_seconds = {}  # source_uri -> share of batch time, by chunk count
+    insert_retries = {}  # source_uri -> retries of the batches holding its chunks
     
-    import time
     for batch_idx, batch in enumerate(batches):
         batch_num = batch_idx + 1
         print(f"Processing batch {batch_num}/{len(batches)} ({len(batch)} chunks)...")
@@ -135,6 +159,7 @@ def insert_via_llamastack(
         # Retry logic with exponential backoff (per Milvus guidance: up to 5 retries)
         max_retries = 5
         response = None
+        batch_started = time.time()
         for attempt in range(max_retries):
             try:
                 # Timeout: ~3 sec/chunk + 120s overhead, max 600s
@@ -165,6 +190,10 @@ def insert_via_llamastack(
                 batch_inserted = result.get("num_inserted", len(batch)) if result else len(batch)
                 total_inserted += batch_inserted
                 print(f"  [OK] Batch {batch_num}: {batch_inserted} chunks inserted")
+                share = (time.time() - batch_started) / len(batch)
+                for source_uri in chunk_sources[batch_idx * BATCH_SIZE:batch_idx * BATCH_SIZE + len(batch)]:
+                    insert_seconds[source_uri] = insert_seconds.get(source_uri, 0.0) + share
+                    insert_retries[source_uri] = max(insert_retries.get(source_uri, 0), attempt)
                 break  # Success
                 
             except requests.exceptions.Timeout:
@@ -190,11 +219,67 @@ def insert_via_llamastack(
     print(f"[OK] Successfully inserted {total_inserted}/{len(llamastack_chunks)} chunks across {len(batches)} batches")
     if llamastack_chunks:
         print(f"Sample document_id: {llamastack_chunks[0]['metadata'].get('document_id')}")
+
+    if ledger_uri:
+        ledger = chunks_file.metadata.get("ledger") or {}
+        if len(sources) == 1 and sources[0][0] not in ledger and len(ledger) == 1:
+            # Single-document mode: input_uri is the label, the ledger is keyed by the S3 key
+            ledger = {sources[0][0]: next(iter(ledger.values()))}
+        records = {source_uri: dict(entry) for source_uri, entry in ledger.items()}
+        for source_uri, _ in sources:
+            records.setdefault(source_uri, {"started_at": round(started_at, 3)})
+        finished_at = round(time.time(), 3)
+        for source_uri, record in records.items():
+            record.update(source_uri=source_uri, run_id=run_id, vector_db_id=vector_db_id, finished_at=finished_at)
+            record.setdefault("outcome", "success")
+            if record["outcome"] == "success":
+                record["insert_s"] = round(insert_seconds.get(source_uri, 0.0), 3)
+                record["insert_retries"] = insert_retries.get(source_uri, 0)
+
+        # Credentials: mounted secret first, base64 parameter as fallback (as download_from_s3)
+        from pathlib import Path
+
+        def _read_secret(key: str) -> str:
+            file_path = Path(s3_secret_mount_path) / key
+            if file_path.is_file():
+                return file_path.read_text().strip()
+            raise FileNotFoundError
+
+        try:
+            endpoint_url = _read_secret("S3_ENDPOINT_URL")
+            access_key = _read_secret("S3_ACCESS_KEY")
+            secret_key = _read_secret("S3_SECRET_KEY")
+        except FileNotFoundError:
+            import base64
+
+            creds_decoded = base64.b64decode(minio_creds_b64).decode("utf-8").strip()
+            access_key, secret_key = [c.strip() for c in creds_decoded.split(":", 1)]
+            endpoint_url = minio_endpoint if minio_endpoint.startswith("http") else f"http://{minio_endpoint}"
+
+        import hashlib
+
+        import boto3
+        from botocore.client import Config
+
+        s3_client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+            region_name="us-east-1",
+        )
+        bucket, _, prefix = ledger_uri.replace("s3://", "", 1).rstrip("/").partition("/")
+        for source_uri, record in records.items():
+            key = f"{prefix}/staging/{run_id}/{hashlib.sha1(source_uri.encode()).hexdigest()[:16]}.json".lstrip("/")
+            s3_client.put_object(Bucket=bucket, Key=key, Body=json.dumps(record).encode("utf-8"))
+        print(f"[OK] Wrote {len(records)} ledger record(s) to {ledger_uri}/staging/{run_id}/")
     
     return {
         "vector_db_id": vector_db_id,
         "num_chunks": total_inserted,
         "source": input_uri,
+        "num_documents": len(sources),
         "status": "success"
     }
 
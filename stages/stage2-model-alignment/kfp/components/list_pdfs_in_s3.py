@@ -5,17 +5,11 @@ This component discovers all PDF files in a given S3 prefix for batch processing
 """
 
 from typing import List
-from kfp import dsl
 
-# Base container images
-# Pinned to specific version for reproducibility (per KFP best practices)
-BASE_PYTHON_IMAGE = "registry.access.redhat.com/ubi9/python-311:1-77"
+from components.runtime import ingestion_component
 
 
-@dsl.component(
-    base_image=BASE_PYTHON_IMAGE,
-    packages_to_install=["boto3"]
-)
+@ingestion_component("boto3")
 def list_pdfs_in_s3(
     s3_prefix: str,
     s3_secret_mount_path: str = "/mnt/secrets",
@@ -36,9 +30,6 @@ def list_pdfs_in_s3(
     """
     import os
     from pathlib import Path
-
-    import boto3
-    from botocore.client import Config
     
     print(f"Discovering PDFs in: {s3_prefix}")
     
@@ -83,6 +74,10 @@ def list_pdfs_in_s3(
     
     print(f"Bucket: {bucket}, Prefix: {prefix}")
     
+    # Heavy imports deferred until credentials and URI are validated
+    import boto3
+    from botocore.client import Config
+
     # Configure S3 client
     s3_client = boto3.client(
         "s3",
@@ -0,0 +1,38 @@
+"""
+Expand the chunking autotune grid into one trial per (chunk_size, chunk_overlap)
+
+Each trial gets its own scratch collection base name; create_collection_version appends
+the `__v<timestamp>` suffix, which also keeps trials out of the playground's picker.
+"""
+
+from typing import List
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component()
+def plan_chunking_trials(
+    vector_db_id: str,
+    chunk_sizes: List[int],
+    chunk_overlaps: List[int],
+) -> List[dict]:
+    """
+    Returns:
+        [{"chunk_size", "chunk_overlap", "vector_db_id"}]. Overlaps larger than half the
+        chunk size are skipped (chunk_markdown would clamp them anyway).
+    """
+    trials = []
+    for chunk_size in sorted(set(chunk_sizes)):
+        for chunk_overlap in sorted(set(chunk_overlaps)):
+            if chunk_overlap < 0 or chunk_overlap > chunk_size // 2:
+                continue
+            trials.append({
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "vector_db_id": f"{vector_db_id}_tune_c{chunk_size}_o{chunk_overlap}",
+            })
+
+    if not trials:
+        raise ValueError(f"No valid trials for chunk_sizes={chunk_sizes}, chunk_overlaps={chunk_overlaps}")
+    print(f"Planned {len(trials)} trial(s): {[(t['chunk_size'], t['chunk_overlap']) for t in trials]}")
+    return trials
@@ -5,22 +5,21 @@ This component uses Docling's async API for robust long-running document convers
 Workflow: submit → poll → fetch result
 """
 
-from kfp import dsl
 from kfp.dsl import Dataset, Output, Input
 
-# Base container images
-# Pinned to specific version for reproducibility (per KFP best practices)
-BASE_PYTHON_IMAGE = "registry.access.redhat.com/ubi9/python-311:1-77"
+from components.runtime import ingestion_component
 
 
-@dsl.component(
-    base_image=BASE_PYTHON_IMAGE,
-    packages_to_install=["requests"]
-)
+@ingestion_component("requests", docling=True)
 def process_with_docling(
     input_file: Input[Dataset],
     docling_url: str,
-    output_markdown: Output[Dataset]
+    output_markdown: Output[Dataset],
+    workspace_dir: str = "",
+    admission: str = "",
+    backend: str = "remote",
+    local_workers: int = 0,
+    local_pages_per_batch: int = 8
 ):
     """
     Process document with Docling to extract markdown (asynchronous API)
@@ -33,121 +32,201 @@ def process_with_docling(
     2. Poll /v1/status/poll/{task_id} until completion
     3. Fetch result from /v1/result/{task_id}
     
+    Page boundaries are preserved in the markdown as PAGE_BREAK_PLACEHOLDER lines so
+    chunk_markdown can record page ranges per chunk. Document-level facts (source
+    filename, page count) are attached to the output artifact metadata.
+    
+    Shared-volume artifact passing: when `workspace_dir` is set (RWX PVC mounted by the
+    pipeline), the payload is written there and the KFP artifact only holds a small
+    manifest, so intermediate files never round-trip through MinIO.
+    
+    Admission control: with `admission` set ("configmap:<name>" or "file:<path>", see
+    kfp/runtime-image/docling_admission.py) the pod holds a shared slot while its job is
+    queued/running, and the observed `task_position` and conversion time tune the slot limit.
+    
+    Backends:
+    - "remote" (default): docling-serve async API as described above
+    - "local": docling library in this pod (kfp/runtime-image/docling_local.py). Page batches
+      of `local_pages_per_batch` pages are converted by `local_workers` processes (0 = one
+      per available CPU) and joined with the page-break placeholder, so the markdown has
+      the same structure as the remote path and needs no docling-serve capacity.
+    
     Reference: https://github.com/docling-project/docling-serve/blob/main/docs/usage.md
     Reference: https://github.com/docling-project/docling-serve/blob/main/docs/configuration.md
     """
-    import requests
     import time
+    started_at = time.time()
+    import contextlib
+    import requests
+    import json
     import os
     
-    print(f"Processing document with Docling (async): {docling_url}")
+    # Must match PAGE_BREAK_PLACEHOLDER in markdown_chunker (runtime image)
+    PAGE_BREAK_PLACEHOLDER = "<!-- page-break -->"
     
-    # Read input file and get filename
-    filename = os.path.basename(input_file.path)
-    if not filename.endswith('.pdf'):
+    if backend == "local":
+        print("Processing document with Docling (in-process)")
+    else:
+        print(f"Processing document with Docling (async): {docling_url}")
+    
+    # Resolve the input (payload on the workspace PVC when shared-volume passing is on) and
+    # take the filename from the original S3 name recorded by download_from_s3
+    input_path = input_file.metadata.get("workspace_path") or input_file.path
+    source_uri = input_file.metadata.get("source_uri", "")
+    filename = os.path.basename(source_uri or input_path)
+    if not filename.lower().endswith('.pdf'):
         filename = 'document.pdf'
     
-    file_size = os.path.getsize(input_file.path)
+    file_size = os.path.getsize(input_path)
     print(f"Converting document: {filename} ({file_size / 1024 / 1024:.2f} MB)")
     
-    # Step 1: Submit async job
-    print(f"Submitting to /v1/convert/file/async...")
-    
-    with open(input_file.path, "rb") as f:
-        files = {"files": (filename, f, "application/pdf")}
+    if backend == "local":
+        # In-process conversion over page batches on this pod's cores (docling_local ships
+        # in the ingestion-runtime-docling image; compile with INGESTION_DOCLING_BACKEND=local)
+        from docling_local import convert_pdf
         
-        response = requests.post(
-            f"{docling_url}/v1/convert/file/async",
-            files=files,
-            data={"to_formats": "md"},
-            timeout=30  # Short timeout for submission only
+        markdown_content, _ = convert_pdf(
+            input_path,
+            PAGE_BREAK_PLACEHOLDER,
+            workers=local_workers,
+            pages_per_batch=local_pages_per_batch,
         )
-        response.raise_for_status()
+    elif backend == "remote":
+        # Acquire a cluster-wide docling-serve slot before submitting (admission control).
+        # docling_admission ships in the ingestion-runtime image, not in the pip-install baseline.
+        limiter = None
+        if admission:
+            try:
+                from docling_admission import admission_from_spec, default_holder
+                limiter = admission_from_spec(admission)
+                # Pod name plus PID: run_local workers share one hostname
+                holder = default_holder(str(os.getpid()))
+            except ImportError:
+                print("[ADMISSION] docling_admission not in this image; submitting unthrottled")
+    
+        with (limiter.slot(holder) if limiter else contextlib.nullcontext()) as slot:
+            # Step 1: Submit async job
+            print(f"Submitting to /v1/convert/file/async...")
+    
+            with open(input_path, "rb") as f:
+                files = {"files": (filename, f, "application/pdf")}
+        
+                response = requests.post(
+                    f"{docling_url}/v1/convert/file/async",
+                    files=files,
+                    data={
+                        "to_formats": "md",
+                        "md_page_break_placeholder": PAGE_BREAK_PLACEHOLDER,
+                    },
+                    timeout=30  # Short timeout for submission only
+                )
+                response.raise_for_status()
+    
+            task = response.json()
+            task_id = task["task_id"]
+            print(f"[OK] Task submitted: {task_id}")
+            print(f"    Initial status: {task.get('task_status', 'unknown')}")
+    
+            # Step 2: Poll for completion
+            print(f"Polling for completion...")
+            poll_count = 0
+            max_polls = 360  # 30 minutes with 5s intervals
+    
+            while task.get("task_status") not in ("success", "failure"):
+                time.sleep(5)
+                poll_count += 1
+        
+                response = requests.get(
+                    f"{docling_url}/v1/status/poll/{task_id}",
+                    timeout=10
+                )
+                response.raise_for_status()
+                task = response.json()
+        
+                if poll_count % 12 == 0:  # Log every minute
+                    print(f"  Check {poll_count}: {task.get('task_status')} (position: {task.get('task_position', 'N/A')})")
+                if slot is not None:
+                    slot.observe_position(task.get("task_position"))
+        
+                if poll_count >= max_polls:
+                    raise TimeoutError(f"Task {task_id} did not complete within 30 minutes")
     
-    task = response.json()
-    task_id = task["task_id"]
-    print(f"[OK] Task submitted: {task_id}")
-    print(f"    Initial status: {task.get('task_status', 'unknown')}")
+            final_status = task.get("task_status")
+            print(f"[OK] Task completed with status: {final_status}")
     
-    # Step 2: Poll for completion
-    print(f"Polling for completion...")
-    poll_count = 0
-    max_polls = 360  # 30 minutes with 5s intervals
+            if final_status != "success":
+                raise RuntimeError(f"Docling task failed: {task}")
     
-    while task.get("task_status") not in ("success", "failure"):
-        time.sleep(5)
-        poll_count += 1
-        
+        # Step 3: Fetch result
+        print(f"Fetching result from /v1/result/{task_id}...")
         response = requests.get(
-            f"{docling_url}/v1/status/poll/{task_id}",
-            timeout=10
+            f"{docling_url}/v1/result/{task_id}",
+            timeout=30
         )
         response.raise_for_status()
-        task = response.json()
-        
-        if poll_count % 12 == 0:  # Log every minute
-            print(f"  Check {poll_count}: {task.get('task_status')} (position: {task.get('task_position', 'N/A')})")
-        
-        if poll_count >= max_polls:
-            raise TimeoutError(f"Task {task_id} did not complete within 30 minutes")
-    
-    final_status = task.get("task_status")
-    print(f"[OK] Task completed with status: {final_status}")
-    
-    if final_status != "success":
-        raise RuntimeError(f"Docling task failed: {task}")
-    
-    # Step 3: Fetch result
-    print(f"Fetching result from /v1/result/{task_id}...")
-    response = requests.get(
-        f"{docling_url}/v1/result/{task_id}",
-        timeout=30
-    )
-    response.raise_for_status()
-    
-    print(f"[OK] Result fetched")
-    
-    # Parse response
-    result = response.json()
-    
-    # Log response structure for debugging
-    print(f"Response keys: {list(result.keys())}")
-    
-    # Extract markdown content from response
-    # Try different response formats Docling might return
-    if "markdown" in result:
-        # Format 1: Direct markdown field
-        markdown_content = result["markdown"]
-    elif "documents" in result and len(result["documents"]) > 0:
-        # Format 2: Documents array with markdown
-        doc = result["documents"][0]
-        if isinstance(doc, dict) and "markdown" in doc:
-            markdown_content = doc["markdown"]
-        elif isinstance(doc, dict) and "md_content" in doc:
-            markdown_content = doc["md_content"]
-        else:
-            markdown_content = str(doc)
-    elif "document" in result:
-        # Format 3: Single document object with md_content
-        doc = result["document"]
-        if isinstance(doc, dict):
-            markdown_content = doc.get("md_content", doc.get("markdown", str(doc)))
-        else:
-            markdown_content = str(doc)
-    elif "content" in result:
-        # Format 4: Direct content field
-        markdown_content = result["content"]
-    else:
-        # Fallback: stringify result and warn
-        markdown_content = str(result)
-        print(f"WARNING: Unexpected response format, stringifying result!")
+    
+        print(f"[OK] Result fetched")
+    
+        # Parse response
+        result = response.json()
+    
+        # Log response structure for debugging
         print(f"Response keys: {list(result.keys())}")
-        print(f"Sample: {str(result)[:500]}")
     
-    # Write markdown output
-    with open(output_markdown.path, "w") as f:
+        # Extract markdown content from response
+        # Try different response formats Docling might return
+        if "markdown" in result:
+            # Format 1: Direct markdown field
+            markdown_content = result["markdown"]
+        elif "documents" in result and len(result["documents"]) > 0:
+            # Format 2: Documents array with markdown
+            doc = result["documents"][0]
+            if isinstance(doc, dict) and "markdown" in doc:
+                markdown_content = doc["markdown"]
+            elif isinstance(doc, dict) and "md_content" in doc:
+                markdown_content = doc["md_content"]
+            else:
+                markdown_content = str(doc)
+        elif "document" in result:
+            # Format 3: Single document object with md_content
+            doc = result["document"]
+            if isinstance(doc, dict):
+                markdown_content = doc.get("md_content", doc.get("markdown", str(doc)))
+            else:
+                markdown_content = str(doc)
+        elif "content" in result:
+            # Format 4: Direct content field
+            markdown_content = result["content"]
+        else:
+            # Fallback: stringify result and warn
+            markdown_content = str(result)
+            print(f"WARNING: Unexpected response format, stringifying result!")
+            print(f"Response keys: {list(result.keys())}")
+            print(f"Sample: {str(result)[:500]}")
+    else:
+        raise ValueError(f"Unknown Docling backend '{backend}' (expected 'remote' or 'local')")
+    
+    # Write markdown output (to the shared workspace when enabled)
+    output_path = output_markdown.path
+    if workspace_dir:
+        output_path = os.path.join(workspace_dir, output_markdown.uri.split("://", 1)[-1])
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w") as f:
         f.write(markdown_content)
-    
-    print(f"[OK] Extracted {len(markdown_content)} characters of markdown")
+    if workspace_dir:
+        output_markdown.metadata["workspace_path"] = output_path
+        with open(output_markdown.path, "w") as f:
+            json.dump({"workspace_path": output_path, "size_bytes": os.path.getsize(output_path)}, f)
+    
+    # Document-level metadata consumed by chunk_markdown (structural enrichment)
+    page_count = markdown_content.count(PAGE_BREAK_PLACEHOLDER) + 1
+    output_markdown.metadata["source_uri"] = source_uri
+    output_markdown.metadata["source_filename"] = filename
+    output_markdown.metadata["page_count"] = page_count
+    ledger = dict(input_file.metadata.get("ledger") or {})
+    ledger.setdefault(source_uri, {}).update(pages=page_count, docling_s=round(time.time() - started_at, 3))
+    output_markdown.metadata["ledger"] = ledger
+    
+    print(f"[OK] Extracted {len(markdown_content)} characters of markdown ({page_count} pages)")
     print(f"Preview: {markdown_content[:200]}...")
 
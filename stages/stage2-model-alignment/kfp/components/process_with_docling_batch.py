@@ -0,0 +1,248 @@
+"""
+Process a directory of PDFs with Docling using multi-file async jobs
+
+docling-serve accepts several `files` parts per conversion request. Packing many short
+documents into one job removes the per-job submit/poll/fetch overhead and keeps the
+docling-serve queue short when ingesting thousands of small PDFs.
+Workflow: pack → submit → poll → fetch → split per document → retry failures singly
+"""
+
+from kfp.dsl import Dataset, Output, Input
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component("requests")
+def process_with_docling_batch(
+    input_dir: Input[Dataset],
+    docling_url: str,
+    output_dir: Output[Dataset],
+    max_files_per_job: int = 8,
+    max_mb_per_job: int = 20,
+    max_concurrent_jobs: int = 2,
+    max_retries: int = 2,
+    workspace_dir: str = "",
+    admission: str = ""
+):
+    """
+    Convert every document listed in `input_dir/manifest.json` (see download_batch_from_s3).
+
+    Documents are packed greedily into jobs of at most `max_files_per_job` files and
+    `max_mb_per_job` MB; up to `max_concurrent_jobs` jobs are in flight at once. Results
+    are split back per document by file stem (zip or JSON responses). Documents missing
+    from a batch result, or whose batch failed, are resubmitted alone up to `max_retries`
+    times so one bad PDF does not sink its pack.
+
+    Output directory: one `<stem>.md` per converted document plus `manifest.json`:
+        {"documents": [{"name", "source_uri", "source_filename", "page_count",
+                        "status": "success"|"failure", "error"}]}
+
+    Fails only when no document converts; partial failures are reported in the manifest
+    and skipped downstream.
+
+    `admission` works as in process_with_docling: every job, packed or retried, holds one
+    shared docling-serve slot, so the concurrent-job cap is cluster-wide, not per pod.
+
+    Reference: https://github.com/docling-project/docling-serve/blob/main/docs/usage.md
+    """
+    import time
+    import contextlib
+    import io
+    import json
+    import os
+    import socket
+    import zipfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    import requests
+
+    # Must match PAGE_BREAK_PLACEHOLDER in markdown_chunker (runtime image)
+    PAGE_BREAK_PLACEHOLDER = "<!-- page-break -->"
+
+    source_dir = input_dir.metadata.get("workspace_path") or input_dir.path
+    with open(os.path.join(source_dir, "manifest.json")) as f:
+        documents = json.load(f)["documents"]
+    print(f"Converting {len(documents)} document(s) with Docling (async, batched): {docling_url}")
+
+    # Cluster-wide docling-serve slots (docling_admission ships in the ingestion-runtime image)
+    limiter = None
+    if admission:
+        try:
+            from docling_admission import admission_from_spec
+            limiter = admission_from_spec(admission)
+        except ImportError:
+            print("[ADMISSION] docling_admission not in this image; submitting unthrottled")
+
+    def _stem(name: str) -> str:
+        return os.path.splitext(os.path.basename(name))[0]
+
+    def _pack(docs):
+        """Greedy packing under the file-count and byte limits (oversized files go alone)."""
+        max_bytes = max_mb_per_job * 1024 * 1024
+        packs, current, current_bytes = [], [], 0
+        for doc in docs:
+            if current and (len(current) >= max_files_per_job or current_bytes + doc["size_bytes"] > max_bytes):
+                packs.append(current)
+                current, current_bytes = [], 0
+            current.append(doc)
+            current_bytes += doc["size_bytes"]
+        if current:
+            packs.append(current)
+        return packs
+
+    def _split_result(response) -> dict:
+        """Map file stem -> markdown for a zip or JSON /v1/result response."""
+        content_type = response.headers.get("content-type", "")
+        if "zip" in content_type or response.content[:2] == b"PK":
+            with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+                return {
+                    _stem(member): archive.read(member).decode("utf-8")
+                    for member in archive.namelist()
+                    if member.endswith(".md")
+                }
+        result = response.json()
+        docs = result.get("documents") or ([result["document"]] if result.get("document") else [])
+        markdown = {}
+        for doc in docs:
+            if isinstance(doc, dict) and doc.get("md_content") is not None:
+                markdown[_stem(doc.get("filename", ""))] = doc["md_content"]
+        return markdown
+
+    job_seconds = {}  # document name -> time spent in Docling jobs (all attempts)
+
+    def _convert(pack) -> dict:
+        """Run one async job for `pack`; returns stem -> markdown for converted files."""
+        job_started = time.time()
+        try:
+            return _run_job(pack)
+        finally:
+            for doc in pack:
+                job_seconds[doc["name"]] = job_seconds.get(doc["name"], 0.0) + time.time() - job_started
+
+    def _run_job(pack) -> dict:
+        holder = f"{socket.gethostname()}-{_stem(pack[0]['name'])}"
+        with (limiter.slot(holder) if limiter else contextlib.nullcontext()) as slot:
+            handles = [open(os.path.join(source_dir, doc["name"]), "rb") for doc in pack]
+            try:
+                response = requests.post(
+                    f"{docling_url}/v1/convert/file/async",
+                    files=[("files", (doc["name"], fh, "application/pdf")) for doc, fh in zip(pack, handles)],
+                    data={
+                        "to_formats": "md",
+                        "md_page_break_placeholder": PAGE_BREAK_PLACEHOLDER,
+                    },
+                    timeout=60
+                )
+                response.raise_for_status()
+            finally:
+                for fh in handles:
+                    fh.close()
+
+            task = response.json()
+            task_id = task["task_id"]
+            print(f"[OK] Task {task_id} submitted ({len(pack)} file(s))")
+
+            poll_count = 0
+            max_polls = 360  # 30 minutes with 5s intervals
+            while task.get("task_status") not in ("success", "partial_success", "failure"):
+                time.sleep(5)
+                poll_count += 1
+                response = requests.get(f"{docling_url}/v1/status/poll/{task_id}", timeout=10)
+                response.raise_for_status()
+                task = response.json()
+                if slot is not None:
+                    slot.observe_position(task.get("task_position"))
+                if poll_count >= max_polls:
+                    raise TimeoutError(f"Task {task_id} did not complete within 30 minutes")
+
+            if task.get("task_status") == "failure":
+                raise RuntimeError(f"Docling task {task_id} failed")
+
+        response = requests.get(f"{docling_url}/v1/result/{task_id}", timeout=120)
+        response.raise_for_status()
+        return _split_result(response)
+
+    converted = {}
+    errors = {}
+    attempts = {}
+    pending = _pack(documents)
+    attempt = 0
+    while pending:
+        print(f"Attempt {attempt + 1}: {len(pending)} job(s), {sum(len(p) for p in pending)} file(s)")
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrent_jobs)) as pool:
+            futures = [(pack, pool.submit(_convert, pack)) for pack in pending]
+            for pack in pending:
+                for doc in pack:
+                    attempts[doc["name"]] = attempts.get(doc["name"], 0) + 1
+            failed = []
+            for pack, future in futures:
+                try:
+                    markdown = future.result()
+                except Exception as exc:  # noqa: BLE001 - retried per document below
+                    markdown = {}
+                    for doc in pack:
+                        errors[doc["name"]] = str(exc)
+                for doc in pack:
+                    stem = _stem(doc["name"])
+                    if stem in markdown:
+                        converted[doc["name"]] = markdown[stem]
+                        errors.pop(doc["name"], None)
+                    else:
+                        errors.setdefault(doc["name"], "missing from Docling result")
+                        failed.append(doc)
+
+        attempt += 1
+        if failed and attempt <= max_retries:
+            # Retry failures one document per job so a single bad PDF cannot fail a pack again
+            pending = [[doc] for doc in failed]
+        else:
+            pending = []
+
+    # Write per-document markdown (to the shared workspace when enabled)
+    target_dir = output_dir.path
+    if workspace_dir:
+        target_dir = os.path.join(workspace_dir, output_dir.uri.split("://", 1)[-1])
+    os.makedirs(target_dir, exist_ok=True)
+
+    manifest = []
+    ledger = dict(input_dir.metadata.get("ledger") or {})
+    for doc in documents:
+        entry = {
+            "name": f"{_stem(doc['name'])}.md",
+            "source_uri": doc["source_uri"],
+            "source_filename": os.path.basename(doc["source_uri"]),
+        }
+        if doc["name"] in converted:
+            markdown_content = converted[doc["name"]]
+            with open(os.path.join(target_dir, entry["name"]), "w") as f:
+                f.write(markdown_content)
+            entry["page_count"] = markdown_content.count(PAGE_BREAK_PLACEHOLDER) + 1
+            entry["status"] = "success"
+        else:
+            entry["status"] = "failure"
+            entry["error"] = errors.get(doc["name"], "unknown error")
+            print(f"  [FAIL] {doc['source_uri']}: {entry['error']}")
+        manifest.append(entry)
+        ledger.setdefault(doc["source_uri"], {}).update(
+            pages=entry.get("page_count", 0),
+            docling_s=round(job_seconds.get(doc["name"], 0.0), 3),
+            docling_attempts=attempts.get(doc["name"], 0),
+            **({"outcome": "failure", "error": entry["error"]} if entry["status"] != "success" else {}),
+        )
+
+    with open(os.path.join(target_dir, "manifest.json"), "w") as f:
+        json.dump({"documents": manifest}, f)
+    if workspace_dir:
+        output_dir.metadata["workspace_path"] = target_dir
+        os.makedirs(output_dir.path, exist_ok=True)
+        with open(os.path.join(output_dir.path, "manifest.json"), "w") as f:
+            json.dump({"workspace_path": target_dir}, f)
+
+    output_dir.metadata["num_documents"] = len(documents)
+    output_dir.metadata["num_converted"] = len(converted)
+    output_dir.metadata["num_failed"] = len(documents) - len(converted)
+    output_dir.metadata["ledger"] = ledger  # see aggregate_ingestion_ledger
+    print(f"[OK] Converted {len(converted)}/{len(documents)} document(s)")
+
+    if not converted:
+        raise RuntimeError(f"Docling converted none of the {len(documents)} document(s)")
@@ -0,0 +1,85 @@
+"""
+Drop superseded collection versions after a blue/green switch
+
+Keeps the version the alias points to, the one it just replaced (`previous`, the rollback
+target of switch_collection_alias) and up to `keep_previous` earlier served versions in all;
+everything else is unregistered from LlamaStack and dropped from Milvus. Versions that
+never served (failed verifies or rebuilds) are dropped regardless of `keep_previous`, so
+they cannot displace a real rollback target. With the default keep_previous=1 a replaced
+version is removed by the *next* rebuild, not the one that replaced it.
+
+Which versions served comes from switch_collection_alias (`served`, backed by the serving
+marker); without that history only `previous` counts as served.
+"""
+
+from typing import List
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component("pymilvus", "requests")
+def prune_collection_versions(
+    milvus_uri: str,
+    llamastack_url: str,
+    vector_db_id: str,
+    previous: str = "",
+    served: List[str] = [],
+    keep_previous: int = 1,
+) -> List[str]:
+    """
+    Remove old `<vector_db_id>__v*` and `<vector_db_id>__legacy` collections.
+
+    Returns:
+        The dropped collection names.
+    """
+    import requests
+    from pymilvus import MilvusClient
+
+    client = MilvusClient(uri=milvus_uri.replace("tcp://", "http://", 1))
+    try:
+        current = client.describe_alias(alias=vector_db_id)["collection_name"]
+    except Exception:  # noqa: BLE001 - no alias yet: nothing was switched, nothing to prune
+        print(f"[SKIP] {vector_db_id} is not an alias")
+        return []
+
+    legacy = f"{vector_db_id}__legacy"
+    collections = client.list_collections()
+    versions = sorted(name for name in collections if name.startswith(f"{vector_db_id}__v") and name != current)
+    if legacy in collections and current != legacy:
+        versions.insert(0, legacy)
+
+    # Served versions, least recently served first; the legacy collection served before all
+    served_versions = [name for name in served if name in versions]
+    if legacy in versions and legacy not in served_versions:
+        served_versions.insert(0, legacy)
+    if previous in versions and previous not in served_versions:
+        served_versions.append(previous)
+
+    retained = [previous] if previous in versions else []
+    for name in reversed(served_versions):
+        if len(retained) >= keep_previous:
+            break
+        if name not in retained:
+            retained.append(name)
+    # Never-served versions newer than the served one may be a rebuild still running;
+    # they are left alone until a later switch moves past them
+    to_drop = [
+        name for name in versions
+        if name not in retained and (name in served_versions or name < current)
+    ]
+    never_served = [name for name in to_drop if name not in served_versions]
+    print(
+        f"Serving {current}; keeping {retained or 'no older versions'}; dropping {to_drop or 'nothing'}"
+        + (f" (never served: {never_served})" if never_served else "")
+    )
+
+    for name in to_drop:
+        # Unregister through LlamaStack first so it stops listing the version
+        response = requests.delete(f"{llamastack_url}/v1/vector-dbs/{name}", timeout=60)
+        if response.status_code not in (200, 204, 404):
+            print(f"  [WARN] LlamaStack unregister {name}: HTTP {response.status_code}")
+        if client.has_collection(name):
+            client.drop_collection(collection_name=name)
+        print(f"  Dropped {name}")
+
+    return to_drop
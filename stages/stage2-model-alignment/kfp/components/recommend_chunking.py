@@ -0,0 +1,66 @@
+"""
+Pick the chunking configuration for a collection from the autotune trials
+
+Highest recall wins; within `recall_tolerance` of the best recall the trial with the
+smallest prompt (avg context tokens), then the lowest p95 latency, is preferred.
+Trials over the latency/token budgets are only chosen when nothing fits.
+"""
+
+from typing import List
+
+from kfp.dsl import Markdown, Output
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component()
+def recommend_chunking(
+    vector_db_id: str,
+    results: List[dict],
+    report: Output[Markdown],
+    recall_tolerance: float = 0.02,
+    max_p95_latency_ms: float = 0.0,
+    max_context_tokens: int = 0,
+) -> dict:
+    """
+    Returns:
+        {"vector_db_id", "chunk_size", "chunk_overlap", ...winning trial metrics}.
+        The comparison table is written to the `report` Markdown artifact (KFP UI).
+    """
+    if not results:
+        raise ValueError("No trial results to compare")
+
+    def _within_budget(trial):
+        return (
+            (not max_p95_latency_ms or trial["p95_latency_ms"] <= max_p95_latency_ms)
+            and (not max_context_tokens or trial["avg_context_tokens"] <= max_context_tokens)
+        )
+
+    candidates = [trial for trial in results if _within_budget(trial)] or results
+    best_recall = max(trial["recall"] for trial in candidates)
+    shortlist = [trial for trial in candidates if trial["recall"] >= best_recall - recall_tolerance]
+    best = min(shortlist, key=lambda t: (t["avg_context_tokens"], t["p95_latency_ms"], -t["recall"]))
+
+    rows = sorted(results, key=lambda t: (t["chunk_size"], t["chunk_overlap"]))
+    lines = [
+        f"## Chunking autotune: {vector_db_id}",
+        "",
+        f"Recommended: **chunk_size={best['chunk_size']}, chunk_overlap={best['chunk_overlap']}**",
+        "",
+        f"| chunk_size | overlap | recall@{best['top_k']} | p95 ms | rows | est. vector MB | ctx tokens |",
+        "|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    for trial in rows:
+        marker = " ✅" if trial is best else ""
+        lines.append(
+            f"| {trial['chunk_size']}{marker} | {trial['chunk_overlap']} | {trial['recall']:.2f} "
+            f"| {trial['p95_latency_ms']:.0f} | {trial['num_rows']} "
+            f"| {trial['est_vector_bytes'] / 1e6:.1f} | {trial['avg_context_tokens']} |"
+        )
+    lines += ["", "est. vector MB = rows x dimension x 4 bytes (raw vectors, not a measured index size)"]
+    table = "\n".join(lines)
+    print(table)
+    with open(report.path, "w") as f:
+        f.write(table + "\n")
+
+    return {**best, "vector_db_id": vector_db_id}
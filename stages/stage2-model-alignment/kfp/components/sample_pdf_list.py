@@ -0,0 +1,29 @@
+"""
+Pick a deterministic sample of PDF URIs
+
+Used by the chunking autotune pipeline so every trial is measured on the same documents
+without converting the whole corpus.
+"""
+
+from typing import List
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component()
+def sample_pdf_list(pdf_uris: List[str], max_documents: int = 5) -> List[str]:
+    """
+    Return up to `max_documents` URIs spread evenly over the sorted input list.
+
+    Documents named in the query set must be part of the sample for recall to be
+    meaningful, so keep max_documents >= the number of distinct expected sources
+    (or 0 for the whole prefix).
+    """
+    ordered_uris = sorted(set(pdf_uris))
+    if max_documents <= 0 or len(ordered_uris) <= max_documents:
+        return ordered_uris
+
+    step = len(ordered_uris) / max_documents
+    sample = [ordered_uris[int(i * step)] for i in range(max_documents)]
+    print(f"Sampled {len(sample)} of {len(ordered_uris)} PDFs")
+    return sample
@@ -9,11 +9,10 @@ from typing import List
 
 from kfp import dsl
 
-# Base container image aligned with other lightweight utilities
-BASE_PYTHON_IMAGE = "registry.access.redhat.com/ubi9/python-311:1-77"
+from components.runtime import ingestion_component
 
 
-@dsl.component(base_image=BASE_PYTHON_IMAGE)
+@ingestion_component()
 def split_pdf_list(pdf_uris: List[str], num_splits: int = 2) -> List[List[str]]:
     """
     Split a list of PDF URIs into roughly even groups.
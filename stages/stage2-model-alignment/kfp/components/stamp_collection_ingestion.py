@@ -0,0 +1,76 @@
+"""
+Publish an ingestion stamp for the collection a run wrote into
+
+Readers that cache per collection (the RAG playground's retrieval and answer caches) need
+to know when a collection's contents changed. Every ingestion run ends by writing
+`<collection_state_uri>/<collection>/ingested.json`, keyed by the physical collection: an
+alias (see switch_collection_alias) is resolved first, so a batch run into the serving
+name stamps the version it actually wrote to, and a reindex stamps its shadow collection.
+"""
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component("boto3", "pymilvus")
+def stamp_collection_ingestion(
+    milvus_uri: str,
+    vector_db_id: str,
+    collection_state_uri: str,
+    run_id: str,
+    s3_secret_mount_path: str = "/mnt/secrets",
+    minio_endpoint: str = "",
+    minio_creds_b64: str = "",
+) -> str:
+    """
+    Record that `run_id` finished writing into `vector_db_id`.
+
+    Returns:
+        The stamp (UTC timestamp) written to ingested.json.
+    """
+    import json
+    from datetime import datetime, timezone
+    from pathlib import Path
+
+    import boto3
+    from botocore.client import Config
+    from pymilvus import MilvusClient
+
+    client = MilvusClient(uri=milvus_uri.replace("tcp://", "http://", 1))
+    try:
+        collection = client.describe_alias(alias=vector_db_id)["collection_name"]
+    except Exception:  # noqa: BLE001 - not an alias: the name is the physical collection
+        collection = vector_db_id
+
+    def _read_secret(key: str) -> str:
+        file_path = Path(s3_secret_mount_path) / key
+        if file_path.is_file():
+            return file_path.read_text().strip()
+        raise FileNotFoundError
+
+    try:
+        endpoint_url = _read_secret("S3_ENDPOINT_URL")
+        access_key = _read_secret("S3_ACCESS_KEY")
+        secret_key = _read_secret("S3_SECRET_KEY")
+    except FileNotFoundError:
+        import base64
+
+        creds_decoded = base64.b64decode(minio_creds_b64).decode("utf-8").strip()
+        access_key, secret_key = [c.strip() for c in creds_decoded.split(":", 1)]
+        endpoint_url = minio_endpoint if minio_endpoint.startswith("http") else f"http://{minio_endpoint}"
+
+    s3_client = boto3.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+        region_name="us-east-1",
+    )
+    bucket, _, prefix = collection_state_uri.replace("s3://", "", 1).rstrip("/").partition("/")
+    stamp_key = f"{prefix}/{collection}/ingested.json" if prefix else f"{collection}/ingested.json"
+
+    ingested_at = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ")
+    stamp = {"collection": collection, "ingested_at": ingested_at, "run_id": run_id}
+    s3_client.put_object(Bucket=bucket, Key=stamp_key, Body=json.dumps(stamp, indent=2).encode("utf-8"))
+    print(f"[OK] {vector_db_id} ({collection}) ingested at {ingested_at}: s3://{bucket}/{stamp_key}")
+    return ingested_at
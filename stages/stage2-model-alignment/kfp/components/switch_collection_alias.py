@@ -0,0 +1,126 @@
+"""
+Point a serving collection name at a new collection version (atomic Milvus alias switch)
+
+Readers (playground, agents, LlamaStack vector-io) keep using `acme_corporate`; in Milvus
+that name is an alias. `alter_alias` re-targets it in one metadata operation, so searches
+go from the old version to the new one with no empty or partial window.
+
+First switch for a name that is still a physical collection: the collection is renamed
+to `<name>__legacy` and the alias is created right after (two back-to-back metadata calls).
+
+After the switch the serving marker `<collection_state_uri>/<name>/serving.json` records
+the collection now served and every collection that served before. The RAG playground
+resolves the name through it (cache generations, lexical index) and
+prune_collection_versions uses the history to tell rollback targets from failed rebuilds.
+"""
+
+from typing import List, NamedTuple
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component("boto3", "pymilvus")
+def switch_collection_alias(
+    milvus_uri: str,
+    vector_db_id: str,
+    version_id: str,
+    collection_state_uri: str = "",
+    s3_secret_mount_path: str = "/mnt/secrets",
+    minio_endpoint: str = "",
+    minio_creds_b64: str = "",
+) -> NamedTuple("SwitchOutputs", [("alias", str), ("collection", str), ("previous", str), ("served", List[str])]):
+    """
+    Make `vector_db_id` resolve to `version_id` and publish the serving marker.
+
+    Also used for rollbacks: run it with an older version ID.
+
+    Returns:
+        (alias, collection, previous, served). "previous" is the collection served before,
+        "served" every collection that has served the name, least recently served first
+        (only the last two without a collection_state_uri).
+    """
+    import json
+    from collections import namedtuple
+    from datetime import datetime, timezone
+    from pathlib import Path
+
+    from pymilvus import MilvusClient
+
+    client = MilvusClient(uri=milvus_uri.replace("tcp://", "http://", 1))
+    if not client.has_collection(version_id):
+        raise ValueError(f"Collection '{version_id}' does not exist")
+
+    try:
+        previous = client.describe_alias(alias=vector_db_id)["collection_name"]
+    except Exception:  # noqa: BLE001 - pymilvus raises MilvusException for unknown aliases
+        previous = None
+
+    if previous:
+        client.alter_alias(collection_name=version_id, alias=vector_db_id)
+    elif client.has_collection(vector_db_id):
+        # One-time migration from a physical collection to an alias
+        previous = f"{vector_db_id}__legacy"
+        client.rename_collection(old_name=vector_db_id, new_name=previous)
+        client.create_alias(collection_name=version_id, alias=vector_db_id)
+        print(f"Migrated physical collection {vector_db_id} -> {previous}")
+    else:
+        client.create_alias(collection_name=version_id, alias=vector_db_id)
+
+    print(f"[OK] {vector_db_id} -> {version_id} (was {previous or 'unset'})")
+
+    served = [previous] if previous else []
+    if collection_state_uri:
+        import boto3
+        from botocore.client import Config
+
+        def _read_secret(key: str) -> str:
+            file_path = Path(s3_secret_mount_path) / key
+            if file_path.is_file():
+                return file_path.read_text().strip()
+            raise FileNotFoundError
+
+        try:
+            endpoint_url = _read_secret("S3_ENDPOINT_URL")
+            access_key = _read_secret("S3_ACCESS_KEY")
+            secret_key = _read_secret("S3_SECRET_KEY")
+        except FileNotFoundError:
+            import base64
+
+            creds_decoded = base64.b64decode(minio_creds_b64).decode("utf-8").strip()
+            access_key, secret_key = [c.strip() for c in creds_decoded.split(":", 1)]
+            endpoint_url = minio_endpoint if minio_endpoint.startswith("http") else f"http://{minio_endpoint}"
+
+        s3_client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+            region_name="us-east-1",
+        )
+        bucket, _, prefix = collection_state_uri.replace("s3://", "", 1).rstrip("/").partition("/")
+        marker_key = f"{prefix}/{vector_db_id}/serving.json" if prefix else f"{vector_db_id}/serving.json"
+
+        try:
+            marker = json.loads(s3_client.get_object(Bucket=bucket, Key=marker_key)["Body"].read())
+        except s3_client.exceptions.NoSuchKey:
+            marker = {}
+        # Most recently served last; a rollback moves the target back to the end. Pruned
+        # collections leave the history.
+        history = [
+            name for name in marker.get("served", [])
+            if name not in (previous, version_id) and client.has_collection(name)
+        ]
+        served = history + served
+        marker = {
+            "alias": vector_db_id,
+            "collection": version_id,
+            "previous": previous or "",
+            "served": served + [version_id],
+            "switched_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+        s3_client.put_object(Bucket=bucket, Key=marker_key, Body=json.dumps(marker, indent=2).encode("utf-8"))
+        print(f"[OK] Serving marker s3://{bucket}/{marker_key} ({len(served)} earlier collection(s))")
+
+    outputs = namedtuple("SwitchOutputs", ["alias", "collection", "previous", "served"])
+    return outputs(vector_db_id, version_id, previous or "", served + [version_id])
@@ -0,0 +1,74 @@
+"""
+Gate a blue/green switch on the shadow collection's contents
+
+Compares the shadow collection's row count with the collection currently served under
+the same name and runs probe queries through LlamaStack. Any failure raises, so the
+pipeline stops before switch_collection_alias and readers keep the old version.
+"""
+
+from typing import List
+
+from components.runtime import ingestion_component
+
+
+@ingestion_component("pymilvus", "requests")
+def verify_collection_version(
+    milvus_uri: str,
+    llamastack_url: str,
+    vector_db_id: str,
+    version_id: str,
+    probe_queries: List[str],
+    min_chunks: int = 10,
+    min_ratio: float = 0.9,
+) -> dict:
+    """
+    Verify `version_id` before it replaces `vector_db_id`.
+
+    Checks:
+    - row count >= min_chunks
+    - row count >= min_ratio x the live collection's row count (skipped if nothing is live)
+    - every probe query returns at least one chunk from the new version
+    """
+    import requests
+    from pymilvus import MilvusClient
+
+    client = MilvusClient(uri=milvus_uri.replace("tcp://", "http://", 1))
+
+    def _row_count(name: str) -> int:
+        client.flush(collection_name=name)
+        result = client.query(
+            collection_name=name,
+            filter="",
+            output_fields=["count(*)"],
+            consistency_level="Strong",
+        )
+        return int(result[0]["count(*)"]) if result else 0
+
+    if not client.has_collection(version_id):
+        raise ValueError(f"Shadow collection '{version_id}' does not exist (nothing was inserted?)")
+    new_count = _row_count(version_id)
+    live_count = _row_count(vector_db_id) if client.has_collection(vector_db_id) else 0
+    print(f"Rows: {version_id}={new_count}, live {vector_db_id}={live_count}")
+
+    failures = []
+    if new_count < min_chunks:
+        failures.append(f"{new_count} rows < min_chunks {min_chunks}")
+    if live_count and new_count < live_count * min_ratio:
+        failures.append(f"{new_count} rows < {min_ratio:.0%} of live {live_count}")
+
+    for query in probe_queries:
+        response = requests.post(
+            f"{llamastack_url}/v1/vector-io/query",
+            json={"vector_db_id": version_id, "query": query, "params": {"top_k": 3}},
+            timeout=60,
+        )
+        hits = len(response.json().get("chunks", [])) if response.status_code == 200 else 0
+        print(f"  Probe '{query}': {hits} chunk(s)")
+        if not hits:
+            failures.append(f"probe '{query}' returned nothing (HTTP {response.status_code})")
+
+    if failures:
+        raise ValueError(f"Shadow collection {version_id} failed verification: {'; '.join(failures)}")
+
+    print(f"[OK] {version_id} verified")
+    return {"version_id": version_id, "num_rows": new_count, "live_rows": live_count, "status": "success"}
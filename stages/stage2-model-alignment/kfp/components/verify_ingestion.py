@@ -5,17 +5,10 @@ This component validates that chunks were successfully inserted and can be retri
 by performing a test query against the vector database.
 """
 
-from kfp import dsl
+from components.runtime import ingestion_component
 
-# Base container images
-# Pinned to specific version for reproducibility (per KFP best practices)
-BASE_PYTHON_IMAGE = "registry.access.redhat.com/ubi9/python-311:1-77"
 
-
-@dsl.component(
-    base_image=BASE_PYTHON_IMAGE,
-    packages_to_install=["requests"]
-)
+@ingestion_component("requests")
 def verify_ingestion(
     llamastack_url: str,
     vector_db_id: str,
@@ -13,7 +13,7 @@ Architecture follows KFP best practices:
 Naming & Versioning:
 - Pipeline names and versions follow conventions in docs/03-STAGE2-RAG/PIPELINE-NAMING-VERSIONING.md
 - Update VERSION in pipeline descriptions when making code changes
-- Current version: v1.0.2
+- Current version: v1.13.0
 
 References:
 - KFP User Guides: https://www.kubeflow.org/docs/components/pipelines/user-guides/
@@ -21,6 +21,9 @@ References:
 - Control Flow: https://www.kubeflow.org/docs/components/pipelines/user-guides/core-functions/#control-flow
 """
 
+import os
+from typing import List
+
 from kfp import dsl, compiler
 from kfp.dsl import PipelineTask
 from pathlib import Path
@@ -30,10 +33,45 @@ from pathlib import Path
 from components.list_pdfs_in_s3 import list_pdfs_in_s3
 from components.download_from_s3 import download_from_s3
 from components.process_with_docling import process_with_docling
+from components.download_batch_from_s3 import download_batch_from_s3
+from components.process_with_docling_batch import process_with_docling_batch
 from components.chunk_markdown import chunk_markdown
 from components.insert_via_llamastack import insert_via_llamastack
 from components.verify_ingestion import verify_ingestion
 from components.split_pdf_list import split_pdf_list
+from components.index_metadata_fields import index_metadata_fields
+from components.index_vector_field import index_vector_field
+from components.cleanup_workspace import cleanup_workspace
+from components.create_collection_version import create_collection_version
+from components.verify_collection_version import verify_collection_version
+from components.switch_collection_alias import switch_collection_alias
+from components.prune_collection_versions import prune_collection_versions
+from components.sample_pdf_list import sample_pdf_list
+from components.plan_chunking_trials import plan_chunking_trials
+from components.evaluate_chunking_trial import evaluate_chunking_trial
+from components.recommend_chunking import recommend_chunking
+from components.drop_trial_collections import drop_trial_collections
+from components.aggregate_ingestion_ledger import aggregate_ingestion_ledger
+from components.build_lexical_index import build_lexical_index
+from components.stamp_collection_ingestion import stamp_collection_ingestion
+from components.runtime import DOCLING_BACKEND
+
+# Optional shared-volume artifact passing (compile-time opt-in)
+# Set INGESTION_WORKSPACE_PVC to an RWX PVC (see gitops/stage02-model-alignment/kfp/
+# pvc-ingestion-workspace.yaml) to pass the PDF, markdown and chunks between steps on that
+# volume. Only small manifests then go to s3://kfp-artifacts/ instead of every payload
+# being uploaded by the producer and downloaded again by the consumer.
+WORKSPACE_PVC = os.environ.get("INGESTION_WORKSPACE_PVC", "")
+WORKSPACE_MOUNT_PATH = "/ingestion-workspace"
+
+# Cluster-wide docling-serve admission control shared by all Docling pods of all runs
+# (kfp/runtime-image/docling_admission.py; RBAC in gitops/stage02-model-alignment/kfp/
+# docling-admission-rbac.yaml). "" disables it, "file:<path>" uses a locked JSON file.
+DOCLING_ADMISSION = "configmap:docling-admission"
+
+# Run ledger metrics go to the Pushgateway that already feeds the GuideLLM dashboards
+# (gitops/stage03-model-monitoring/observability/grafana-dashboard-ingestion-ledger.yaml)
+PUSHGATEWAY_URL = "http://prometheus-pushgateway.private-ai-demo.svc.cluster.local:9091"
 
 
 def _set_resources(
@@ -54,9 +92,28 @@ def _set_resources(
     task.set_memory_limit(memory_limit)
 
 
+def _set_docling_resources(task: PipelineTask) -> None:
+    """
+    Resources for process_with_docling. The default remote backend only uploads and polls;
+    with INGESTION_DOCLING_BACKEND=local the pod runs Docling models on all its cores.
+    """
+    if DOCLING_BACKEND == "local":
+        _set_resources(task, cpu_request="2", cpu_limit="4", memory_request="6Gi", memory_limit="10Gi")
+    else:
+        _set_resources(task, cpu_request="500m", cpu_limit="1", memory_request="512Mi", memory_limit="1Gi")
+
+
+def _mount_workspace(task: PipelineTask) -> None:
+    """Mount the shared ingestion workspace PVC on a task (no-op unless INGESTION_WORKSPACE_PVC is set)."""
+    if WORKSPACE_PVC:
+        from kfp import kubernetes  # kfp-kubernetes, only needed when the workspace is enabled
+
+        kubernetes.mount_pvc(task, pvc_name=WORKSPACE_PVC, mount_path=WORKSPACE_MOUNT_PATH)
+
+
 @dsl.pipeline(
     name="data-processing-and-insertion-single",
-    description="RAG Ingestion Pipeline v1.0.2 - Single document processing with Docling and LlamaStack Vector IO.",
+    description="RAG Ingestion Pipeline v1.13.0 - Single document processing with Docling and LlamaStack Vector IO.",
     # NOTE: Update version in description when making changes (see PIPELINE-NAMING-VERSIONING.md)
 )
 def docling_rag_pipeline(
@@ -65,10 +122,17 @@ def docling_rag_pipeline(
     llamastack_url: str = "http://llama-stack-service.private-ai-demo.svc:8321",
     vector_db_id: str = "acme_corporate",  # Scenario: acme_corporate | red_hat_docs | eu_ai_act
     chunk_size: int = 512,
+    chunk_overlap: int = 0,
+    document_type_keywords: list = [],
     s3_secret_mount_path: str = "/mnt/secrets",
     minio_endpoint: str = "minio.model-storage.svc:9000",
     minio_creds_b64: str = "",
-    min_chunks: int = 10
+    min_chunks: int = 10,
+    milvus_uri: str = "tcp://milvus-standalone.private-ai-demo.svc.cluster.local:19530",
+    workspace_dir: str = WORKSPACE_MOUNT_PATH if WORKSPACE_PVC else "",
+    docling_admission: str = DOCLING_ADMISSION,
+    docling_backend: str = DOCLING_BACKEND,
+    collection_state_uri: str = "s3://kfp-artifacts/collection-state"
 ):
     """
     RAG Ingestion Pipeline (LlamaStack Vector IO - Optimized)
@@ -82,9 +146,12 @@ def docling_rag_pipeline(
     Pipeline steps:
     1. Download from MinIO (s3://) using mounted S3 credentials (Red Hat canonical pattern) with optional base64 fallback for KFP v2
     2. Process with Docling async API (PDF to Markdown)
-    3. Chunk markdown (respecting Milvus 65K limit)
+    3. Chunk markdown (respecting Milvus 65K limit, with section/page/document metadata)
     4. Insert via LlamaStack (embeddings computed server-side)
     5. Verify ingestion (query test)
+    6. Index structural metadata fields in Milvus (filter pushdown)
+    7. Publish the collection's ingestion stamp (see stamp_collection_ingestion)
+    8. Clean up shared workspace (only when compiled with INGESTION_WORKSPACE_PVC)
     
     Reference: https://docs.redhat.com/en/documentation/red_hat_openshift_ai_self-managed/2.25/html/working_with_llama_stack/
     """
@@ -95,8 +162,10 @@ def docling_rag_pipeline(
         s3_secret_mount_path=s3_secret_mount_path,
         minio_endpoint=minio_endpoint,
         minio_creds_b64=minio_creds_b64,
+        workspace_dir=workspace_dir,
     )
     download_task.set_caching_options(False)  # Force fresh download
+    _mount_workspace(download_task)
     _set_resources(
         download_task,
         cpu_request="500m",
@@ -108,23 +177,25 @@ def docling_rag_pipeline(
     # Step 2: Process with Docling
     docling_task = process_with_docling(
         input_file=download_task.outputs["output_file"],
-        docling_url=docling_url
+        docling_url=docling_url,
+        workspace_dir=workspace_dir,
+        admission=docling_admission,
+        backend=docling_backend,
     )
     docling_task.set_caching_options(False)  # Force fresh processing
-    _set_resources(
-        docling_task,
-        cpu_request="500m",
-        cpu_limit="1",
-        memory_request="512Mi",
-        memory_limit="1Gi",
-    )
+    _mount_workspace(docling_task)
+    _set_docling_resources(docling_task)
     
     # Step 3: Chunk markdown (no embeddings - computed server-side by LlamaStack)
     chunking_task = chunk_markdown(
         markdown_file=docling_task.outputs["output_markdown"],
-        chunk_size=chunk_size
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        document_type_keywords=document_type_keywords,
+        workspace_dir=workspace_dir,
     )
     chunking_task.set_caching_options(False)  # Force fresh chunking
+    _mount_workspace(chunking_task)
     _set_resources(
         chunking_task,
         cpu_request="250m",
@@ -143,6 +214,7 @@ def docling_rag_pipeline(
     # CRITICAL: Disable caching to ensure data is always inserted (even if inputs haven't changed)
     # This prevents issues when Milvus is reset but pipeline inputs remain the same
     insert_task.set_caching_options(False)
+    _mount_workspace(insert_task)
     _set_resources(
         insert_task,
         cpu_request="250m",
@@ -167,10 +239,52 @@ def docling_rag_pipeline(
         memory_limit="512Mi",
     )
 
+    # Step 6: Index structural metadata (section/page/document fields) for filtered search
+    index_task = index_metadata_fields(
+        milvus_uri=milvus_uri,
+        vector_db_id=vector_db_id,
+    )
+    index_task.after(insert_task)
+    index_task.set_caching_options(False)
+    _set_resources(
+        index_task,
+        cpu_request="250m",
+        cpu_limit="500m",
+        memory_request="256Mi",
+        memory_limit="512Mi",
+    )
+
+    # Step 7: Tell cache-holding readers (RAG playground) the collection changed
+    with dsl.If(collection_state_uri != "", name="collection-stamp"):
+        stamp_task = stamp_collection_ingestion(
+            milvus_uri=milvus_uri,
+            vector_db_id=vector_db_id,
+            collection_state_uri=collection_state_uri,
+            run_id=dsl.PIPELINE_JOB_ID_PLACEHOLDER,
+            s3_secret_mount_path=s3_secret_mount_path,
+            minio_endpoint=minio_endpoint,
+            minio_creds_b64=minio_creds_b64,
+        )
+        stamp_task.after(index_task)
+        stamp_task.set_caching_options(False)
+        _set_resources(stamp_task)
+
+    # Step 8: Drop this run's intermediate payloads from the shared workspace
+    if WORKSPACE_PVC:
+        cleanup_task = cleanup_workspace(
+            workspace_dir=workspace_dir,
+            run_id=dsl.PIPELINE_JOB_ID_PLACEHOLDER,
+            max_depth=5,  # every input must be bound for ignore_upstream_failure()
+        )
+        cleanup_task.after(insert_task)
+        cleanup_task.ignore_upstream_failure()  # free the PVC even when an upstream step failed
+        cleanup_task.set_caching_options(False)
+        _mount_workspace(cleanup_task)
+        _set_resources(cleanup_task)
 
 @dsl.pipeline(
     name="data-processing-and-insertion",
-    description="RAG Ingestion Pipeline v1.0.2 - Refactored with modular components. Optimized server-side embeddings via LlamaStack Vector IO.",
+    description="RAG Ingestion Pipeline v1.13.0 - Refactored with modular components. Optimized server-side embeddings via LlamaStack Vector IO.",
     # NOTE: Update version in description when making changes (see PIPELINE-NAMING-VERSIONING.md)
     pipeline_root="s3://kfp-artifacts/"  # Explicit root for artifacts
 )
@@ -180,10 +294,21 @@ def batch_docling_rag_pipeline(
     llamastack_url: str = "http://llama-stack-service.private-ai-demo.svc:8321",
     vector_db_id: str = "acme_corporate",  # Scenario: acme_corporate | red_hat_docs | eu_ai_act
     chunk_size: int = 512,
+    chunk_overlap: int = 0,
+    document_type_keywords: list = [],
     num_splits: int = 2,
     s3_secret_mount_path: str = "/mnt/secrets",
     minio_endpoint: str = "minio.model-storage.svc:9000",
     minio_creds_b64: str = "",
+    milvus_uri: str = "tcp://milvus-standalone.private-ai-demo.svc.cluster.local:19530",
+    workspace_dir: str = WORKSPACE_MOUNT_PATH if WORKSPACE_PVC else "",
+    docling_admission: str = DOCLING_ADMISSION,
+    docling_backend: str = DOCLING_BACKEND,
+    pack_documents: bool = False,
+    docling_files_per_job: int = 8,
+    ledger_uri: str = "s3://kfp-artifacts/ingestion-ledger",
+    lexical_index_uri: str = "s3://kfp-artifacts/lexical-index",
+    collection_state_uri: str = "s3://kfp-artifacts/collection-state",
     cache_buster: str = ""  # Unique value per run to prevent caching
 ):
     """
@@ -197,10 +322,27 @@ def batch_docling_rag_pipeline(
     - Auto-discovery: Just provide an S3 folder path, no need to list individual files
     - Parallel processing: Configurable via num_splits (default: 2 groups)
     - Single collection: All discovered PDFs are ingested into one collection
+    - Packed mode (pack_documents=True): each group is converted in multi-file Docling
+      jobs of up to docling_files_per_job PDFs, with one pod per step instead of per PDF.
+      Recommended for many short documents; failed PDFs are retried one per job.
     
     Parameters:
         s3_prefix: S3 folder path containing PDFs (e.g. "s3://llama-files/scenario2-acme/")
         vector_db_id: Target collection name (all docs go here)
+        chunk_size / chunk_overlap: Chunking in characters (chunking_autotune_pipeline recommends values)
+        document_type_keywords: [keyword, type] pairs that classify each document by filename and
+            title (kfp/document-types/<vector_db_id>.json); [] uses markdown_chunker's defaults
+        docling_admission: Shared docling-serve slot store ("" disables admission control)
+        docling_backend: "remote" (docling-serve) or "local" (in-pod, needs a pipeline compiled
+            with INGESTION_DOCLING_BACKEND=local for the docling image); packed mode is remote-only
+        pack_documents: Convert each group in multi-file Docling jobs (see Packed mode)
+        docling_files_per_job: Max PDFs per Docling job in packed mode
+        ledger_uri: S3 prefix of the run ledger (per-document timings/outcomes as Parquet,
+            see aggregate_ingestion_ledger). "" disables it
+        lexical_index_uri: S3 prefix of the BM25 index the RAG playground fuses with vector
+            search (see build_lexical_index). "" disables it
+        collection_state_uri: S3 prefix of the collection markers; the run publishes the
+            collection's ingestion stamp there (see stamp_collection_ingestion). "" disables it
     
     Configuration:
         Parallelism: Controlled via num_splits (balanced groups processed in parallel)
@@ -216,11 +358,19 @@ def batch_docling_rag_pipeline(
     
     Pipeline Flow:
     1. Discover all PDFs in s3_prefix (list_pdfs_in_s3)
-    2. For each PDF (parallel, configurable):
-       a. Download from MinIO
-       b. Process with Docling (PDF → Markdown)
-       c. Chunk markdown
-       d. Insert into collection via LlamaStack
+    2. For each group (parallel, configurable):
+       - pack_documents=False, for each PDF:
+         a. Download from MinIO
+         b. Process with Docling (PDF → Markdown)
+         c. Chunk markdown (section/page/document metadata per chunk)
+         d. Insert into collection via LlamaStack
+       - pack_documents=True: the same four steps once for the whole group
+         (download_batch_from_s3 → process_with_docling_batch → chunk → insert)
+    3. Index structural metadata fields in Milvus once all inserts finish and rebuild the
+       collection's BM25 lexical index
+    4. Append the run to the ingestion ledger and publish its throughput summary, and
+       publish the collection's ingestion stamp (cache invalidation in the RAG playground)
+    5. Clean up shared workspace (only when compiled with INGESTION_WORKSPACE_PVC)
     
     Reference: https://docs.redhat.com/en/documentation/red_hat_openshift_ai_self-managed/2.25/html/working_with_llama_stack/
     """
@@ -266,74 +416,537 @@ def batch_docling_rag_pipeline(
         name="process-pdf-group",
     ) as uri_group:
 
-        with dsl.ParallelFor(
-            items=uri_group,
-            parallelism=1,
-            name="process-each-pdf",
-        ) as input_uri:
-        
-            # Download document
-            download_task = download_from_s3(
-                input_uri=input_uri,
+        # Packed path: one pod per step for the whole group, several PDFs per Docling job
+        with dsl.If(pack_documents == True, name="packed-docling-jobs"):  # noqa: E712 - KFP condition
+            batch_download_task = download_batch_from_s3(
+                input_uris=uri_group,
                 s3_secret_mount_path=s3_secret_mount_path,
                 minio_endpoint=minio_endpoint,
                 minio_creds_b64=minio_creds_b64,
+                workspace_dir=workspace_dir,
             )
-            download_task.set_caching_options(False)  # Force fresh download
+            batch_download_task.set_caching_options(False)
+            _mount_workspace(batch_download_task)
             _set_resources(
-                download_task,
+                batch_download_task,
                 cpu_request="500m",
                 cpu_limit="1",
                 memory_request="512Mi",
                 memory_limit="1Gi",
             )
 
-            # Process with Docling
-            docling_task = process_with_docling(
-                input_file=download_task.outputs["output_file"],
-                docling_url=docling_url
+            batch_docling_task = process_with_docling_batch(
+                input_dir=batch_download_task.outputs["output_dir"],
+                docling_url=docling_url,
+                max_files_per_job=docling_files_per_job,
+                workspace_dir=workspace_dir,
+                admission=docling_admission,
             )
-            docling_task.set_caching_options(False)  # Force fresh processing
+            batch_docling_task.set_caching_options(False)
+            _mount_workspace(batch_docling_task)
             _set_resources(
-                docling_task,
+                batch_docling_task,
                 cpu_request="500m",
                 cpu_limit="1",
                 memory_request="512Mi",
                 memory_limit="1Gi",
             )
 
-            # Chunk markdown
-            chunking_task = chunk_markdown(
-                markdown_file=docling_task.outputs["output_markdown"],
-                chunk_size=chunk_size
-            )
-            chunking_task.set_caching_options(False)  # Force fresh chunking
-            _set_resources(
-                chunking_task,
-                cpu_request="250m",
-                cpu_limit="500m",
-                memory_request="256Mi",
-                memory_limit="512Mi",
+            batch_chunking_task = chunk_markdown(
+                markdown_file=batch_docling_task.outputs["output_dir"],
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                document_type_keywords=document_type_keywords,
+                workspace_dir=workspace_dir,
             )
+            batch_chunking_task.set_caching_options(False)
+            _mount_workspace(batch_chunking_task)
+            _set_resources(batch_chunking_task)
 
-            # Insert into shared collection
-            insert_task = insert_via_llamastack(
-                chunks_file=chunking_task.outputs["output_chunks"],
+            batch_insert_task = insert_via_llamastack(
+                chunks_file=batch_chunking_task.outputs["output_chunks"],
                 llamastack_url=llamastack_url,
                 vector_db_id=vector_db_id,
-                input_uri=input_uri
-            )
-            # CRITICAL: Disable caching to ensure data is always inserted
-            insert_task.set_caching_options(False)
-            _set_resources(
-                insert_task,
-                cpu_request="250m",
-                cpu_limit="500m",
-                memory_request="256Mi",
-                memory_limit="512Mi",
+                input_uri=s3_prefix,
+                ledger_uri=ledger_uri,
+                run_id=dsl.PIPELINE_JOB_ID_PLACEHOLDER,
+                s3_secret_mount_path=s3_secret_mount_path,
+                minio_endpoint=minio_endpoint,
+                minio_creds_b64=minio_creds_b64,
             )
-            insert_task.set_retry(num_retries=0)
+            batch_insert_task.set_caching_options(False)
+            _mount_workspace(batch_insert_task)
+            _set_resources(batch_insert_task)
+            batch_insert_task.set_retry(num_retries=0)
+
+        # Default path: one download/docling/chunk/insert chain per PDF
+        with dsl.Else(name="per-document-docling-jobs"):
+            with dsl.ParallelFor(
+                items=uri_group,
+                parallelism=1,
+                name="process-each-pdf",
+            ) as input_uri:
+
+                # Download document
+                download_task = download_from_s3(
+                    input_uri=input_uri,
+                    s3_secret_mount_path=s3_secret_mount_path,
+                    minio_endpoint=minio_endpoint,
+                    minio_creds_b64=minio_creds_b64,
+                    workspace_dir=workspace_dir,
+                )
+                download_task.set_caching_options(False)  # Force fresh download
+                _mount_workspace(download_task)
+                _set_resources(
+                    download_task,
+                    cpu_request="500m",
+                    cpu_limit="1",
+                    memory_request="512Mi",
+                    memory_limit="1Gi",
+                )
+
+                # Process with Docling
+                docling_task = process_with_docling(
+                    input_file=download_task.outputs["output_file"],
+                    docling_url=docling_url,
+                    workspace_dir=workspace_dir,
+                    admission=docling_admission,
+                    backend=docling_backend,
+                )
+                docling_task.set_caching_options(False)  # Force fresh processing
+                _mount_workspace(docling_task)
+                _set_docling_resources(docling_task)
+
+                # Chunk markdown
+                chunking_task = chunk_markdown(
+                    markdown_file=docling_task.outputs["output_markdown"],
+                    chunk_size=chunk_size,
+                    chunk_overlap=chunk_overlap,
+                    document_type_keywords=document_type_keywords,
+                    workspace_dir=workspace_dir,
+                )
+                chunking_task.set_caching_options(False)  # Force fresh chunking
+                _mount_workspace(chunking_task)
+                _set_resources(
+                    chunking_task,
+                    cpu_request="250m",
+                    cpu_limit="500m",
+                    memory_request="256Mi",
+                    memory_limit="512Mi",
+                )
+
+                # Insert into shared collection
+                insert_task = insert_via_llamastack(
+                    chunks_file=chunking_task.outputs["output_chunks"],
+                    llamastack_url=llamastack_url,
+                    vector_db_id=vector_db_id,
+                    input_uri=input_uri,
+                    ledger_uri=ledger_uri,
+                    run_id=dsl.PIPELINE_JOB_ID_PLACEHOLDER,
+                    s3_secret_mount_path=s3_secret_mount_path,
+                    minio_endpoint=minio_endpoint,
+                    minio_creds_b64=minio_creds_b64,
+                )
+                # CRITICAL: Disable caching to ensure data is always inserted
+                insert_task.set_caching_options(False)
+                _mount_workspace(insert_task)
+                _set_resources(
+                    insert_task,
+                    cpu_request="250m",
+                    cpu_limit="500m",
+                    memory_request="256Mi",
+                    memory_limit="512Mi",
+                )
+                insert_task.set_retry(num_retries=0)
+
+    # Step 3: Index structural metadata once every document has been inserted
+    index_task = index_metadata_fields(
+        milvus_uri=milvus_uri,
+        vector_db_id=vector_db_id,
+    )
+    index_task.after(insert_task, batch_insert_task)
+    index_task.set_caching_options(False)
+    _set_resources(
+        index_task,
+        cpu_request="250m",
+        cpu_limit="500m",
+        memory_request="256Mi",
+        memory_limit="512Mi",
+    )
+
+    # BM25 index over the whole collection for hybrid retrieval in the RAG playground
+    with dsl.If(lexical_index_uri != "", name="lexical-index"):
+        lexical_task = build_lexical_index(
+            milvus_uri=milvus_uri,
+            vector_db_id=vector_db_id,
+            index_uri=lexical_index_uri,
+            s3_secret_mount_path=s3_secret_mount_path,
+            minio_endpoint=minio_endpoint,
+            minio_creds_b64=minio_creds_b64,
+        )
+        lexical_task.after(index_task)
+        lexical_task.set_caching_options(False)
+        _set_resources(
+            lexical_task,
+            cpu_request="250m",
+            cpu_limit="1",
+            memory_request="512Mi",
+            memory_limit="2Gi",
+        )
+
+    # Step 4: Run ledger summary (throughput, stragglers, comparison with previous runs)
+    with dsl.If(ledger_uri != "", name="ingestion-ledger"):
+        ledger_task = aggregate_ingestion_ledger(
+            run_id=dsl.PIPELINE_JOB_ID_PLACEHOLDER,
+            vector_db_id=vector_db_id,
+            ledger_uri=ledger_uri,
+            pdf_uris=list_task.output,
+            s3_secret_mount_path=s3_secret_mount_path,
+            minio_endpoint=minio_endpoint,
+            minio_creds_b64=minio_creds_b64,
+            pushgateway_url=PUSHGATEWAY_URL,
+            history_runs=10,
+            straggler_factor=2.0,
+        )
+        ledger_task.after(index_task)
+        ledger_task.ignore_upstream_failure()  # also record runs where documents failed
+        ledger_task.set_caching_options(False)
+        _set_resources(ledger_task)
+
+    # Also after partial failures: whatever was inserted changed the collection
+    with dsl.If(collection_state_uri != "", name="collection-stamp"):
+        stamp_task = stamp_collection_ingestion(
+            milvus_uri=milvus_uri,
+            vector_db_id=vector_db_id,
+            collection_state_uri=collection_state_uri,
+            run_id=dsl.PIPELINE_JOB_ID_PLACEHOLDER,
+            s3_secret_mount_path=s3_secret_mount_path,
+            minio_endpoint=minio_endpoint,
+            minio_creds_b64=minio_creds_b64,
+        )
+        stamp_task.after(index_task)
+        stamp_task.ignore_upstream_failure()
+        stamp_task.set_caching_options(False)
+        _set_resources(stamp_task)
+
+    # Step 5: Drop this run's intermediate payloads from the shared workspace
+    if WORKSPACE_PVC:
+        cleanup_task = cleanup_workspace(
+            workspace_dir=workspace_dir,
+            run_id=dsl.PIPELINE_JOB_ID_PLACEHOLDER,
+            max_depth=5,  # every input must be bound for ignore_upstream_failure()
+        )
+        cleanup_task.after(insert_task, batch_insert_task)
+        cleanup_task.ignore_upstream_failure()  # free the PVC even when an upstream step failed
+        cleanup_task.set_caching_options(False)
+        _mount_workspace(cleanup_task)
+        _set_resources(cleanup_task)
+
+
+@dsl.pipeline(
+    name="collection-reindex-blue-green",
+    description="RAG Reindex Pipeline v1.13.0 - Blue/green rebuild of a collection into a versioned shadow collection with an atomic Milvus alias switch.",
+    # NOTE: Update version in description when making changes (see PIPELINE-NAMING-VERSIONING.md)
+    pipeline_root="s3://kfp-artifacts/"
+)
+def reindex_collection_pipeline(
+    s3_prefix: str = "s3://llama-files/sample/",
+    docling_url: str = "http://docling-service.private-ai-demo.svc:5001",
+    llamastack_url: str = "http://llama-stack-service.private-ai-demo.svc:8321",
+    vector_db_id: str = "acme_corporate",  # Serving name (becomes a Milvus alias)
+    chunk_size: int = 512,
+    chunk_overlap: int = 0,
+    document_type_keywords: list = [],
+    num_splits: int = 8,
+    s3_secret_mount_path: str = "/mnt/secrets",
+    minio_endpoint: str = "minio.model-storage.svc:9000",
+    minio_creds_b64: str = "",
+    milvus_uri: str = "tcp://milvus-standalone.private-ai-demo.svc.cluster.local:19530",
+    workspace_dir: str = WORKSPACE_MOUNT_PATH if WORKSPACE_PVC else "",
+    docling_admission: str = DOCLING_ADMISSION,
+    docling_backend: str = DOCLING_BACKEND,
+    pack_documents: bool = False,
+    docling_files_per_job: int = 8,
+    vector_index_type: str = "",
+    vector_index_params: dict = {},
+    probe_queries: List[str] = ["What is this document about?"],
+    min_ratio: float = 0.9,
+    keep_previous_versions: int = 1,
+    collection_state_uri: str = "s3://kfp-artifacts/collection-state",
+    cache_buster: str = ""
+):
+    """
+    Blue/Green Collection Reindex Pipeline
+
+    Rebuilds vector_db_id without touching what readers see until the rebuild is done.
+    Because nothing reads the shadow collection, ingestion runs at full parallelism
+    (num_splits=8 by default); docling-serve is still protected by docling_admission.
+
+    Pipeline Flow:
+    1. Register <vector_db_id>__v<timestamp> in LlamaStack (create_collection_version)
+    2. Run batch_docling_rag_pipeline into that version (including metadata indexing), then
+       replace its vector index when vector_index_type is set (e.g. "HNSW",
+       {"M": 16, "efConstruction": 200}; see kfp/benchmark_vector_index.py)
+    3. Verify row count against the live collection and run probe queries
+    4. Re-point the vector_db_id alias at the new version (atomic alter_alias) and record
+       it in the serving marker under collection_state_uri
+    5. Drop superseded versions, keeping the replaced one plus up to keep_previous_versions
+       served ones
+
+    A failed verify leaves the alias untouched; the never-served shadow collection is
+    removed by the next successful run's prune step. To roll back, run
+    switch_collection_alias with the previous version (see README).
+    """
+
+    # Step 1: Register the shadow collection
+    version_task = create_collection_version(
+        llamastack_url=llamastack_url,
+        vector_db_id=vector_db_id,
+    )
+    version_task.set_caching_options(False)
+    _set_resources(version_task)
+
+    # Step 2: Full batch ingestion into the shadow collection
+    ingest_task = batch_docling_rag_pipeline(
+        s3_prefix=s3_prefix,
+        docling_url=docling_url,
+        llamastack_url=llamastack_url,
+        vector_db_id=version_task.output,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        document_type_keywords=document_type_keywords,
+        num_splits=num_splits,
+        s3_secret_mount_path=s3_secret_mount_path,
+        minio_endpoint=minio_endpoint,
+        minio_creds_b64=minio_creds_b64,
+        milvus_uri=milvus_uri,
+        workspace_dir=workspace_dir,
+        docling_admission=docling_admission,
+        docling_backend=docling_backend,
+        pack_documents=pack_documents,
+        docling_files_per_job=docling_files_per_job,
+        collection_state_uri=collection_state_uri,
+        cache_buster=cache_buster,
+    )
+
+    # Tuned vector index, built while nothing reads the shadow ("" leaves the default index)
+    vector_index_task = index_vector_field(
+        milvus_uri=milvus_uri,
+        vector_db_id=version_task.output,
+        index_type=vector_index_type,
+        index_params=vector_index_params,
+    )
+    vector_index_task.after(ingest_task)
+    vector_index_task.set_caching_options(False)
+    _set_resources(vector_index_task)
+
+    # Step 3: Gate the switch on the new version's contents
+    verify_task = verify_collection_version(
+        milvus_uri=milvus_uri,
+        llamastack_url=llamastack_url,
+        vector_db_id=vector_db_id,
+        version_id=version_task.output,
+        probe_queries=probe_queries,
+        min_ratio=min_ratio,
+    )
+    verify_task.after(vector_index_task)
+    verify_task.set_caching_options(False)
+    _set_resources(verify_task)
+
+    # Step 4: Atomic switch of the serving name
+    switch_task = switch_collection_alias(
+        milvus_uri=milvus_uri,
+        vector_db_id=vector_db_id,
+        version_id=version_task.output,
+        collection_state_uri=collection_state_uri,
+        s3_secret_mount_path=s3_secret_mount_path,
+        minio_endpoint=minio_endpoint,
+        minio_creds_b64=minio_creds_b64,
+    )
+    switch_task.after(verify_task)
+    switch_task.set_caching_options(False)
+    switch_task.set_retry(num_retries=0)
+    _set_resources(switch_task)
+
+    # Step 5: Drop superseded versions (the one just replaced is kept for rollback)
+    prune_task = prune_collection_versions(
+        milvus_uri=milvus_uri,
+        llamastack_url=llamastack_url,
+        vector_db_id=vector_db_id,
+        previous=switch_task.outputs["previous"],
+        served=switch_task.outputs["served"],
+        keep_previous=keep_previous_versions,
+    )
+    prune_task.after(switch_task)
+    prune_task.set_caching_options(False)
+    _set_resources(prune_task)
+
+
+@dsl.pipeline(
+    name="chunking-autotune",
+    description="RAG Chunking Autotune Pipeline v1.13.0 - Sweeps chunk_size/chunk_overlap on a document sample and recommends a configuration per collection.",
+    # NOTE: Update version in description when making changes (see PIPELINE-NAMING-VERSIONING.md)
+    pipeline_root="s3://kfp-artifacts/"
+)
+def chunking_autotune_pipeline(
+    s3_prefix: str = "s3://llama-files/sample/",
+    queries: List[dict] = [{"query": "What is this document about?", "expected_source": ""}],
+    vector_db_id: str = "acme_corporate",  # Collection the recommendation is for (not modified)
+    chunk_sizes: List[int] = [256, 512, 1024, 2048],
+    chunk_overlaps: List[int] = [0, 64, 128],
+    max_documents: int = 5,
+    top_k: int = 5,
+    max_p95_latency_ms: float = 0.0,
+    max_context_tokens: int = 0,
+    docling_url: str = "http://docling-service.private-ai-demo.svc:5001",
+    llamastack_url: str = "http://llama-stack-service.private-ai-demo.svc:8321",
+    s3_secret_mount_path: str = "/mnt/secrets",
+    minio_endpoint: str = "minio.model-storage.svc:9000",
+    minio_creds_b64: str = "",
+    milvus_uri: str = "tcp://milvus-standalone.private-ai-demo.svc.cluster.local:19530",
+    workspace_dir: str = WORKSPACE_MOUNT_PATH if WORKSPACE_PVC else "",
+    docling_admission: str = DOCLING_ADMISSION,
+    cache_buster: str = ""
+):
+    """
+    Chunking Autotune Pipeline
+
+    Converts a sample of the corpus once, then for every (chunk_size, chunk_overlap) pair
+    chunks it into a scratch collection, replays `queries` and measures recall@top_k,
+    p50/p95 query latency, estimated vector size and average context tokens. recommend_chunking
+    picks the configuration (report in the KFP UI); apply it with chunk_size/chunk_overlap
+    on the batch or reindex pipeline.
+
+    Query set format (kfp/autotune-queries/<vector_db_id>.json):
+        [{"query": "...", "expected_source": "<PDF file name fragment>", "expected_text": "<optional>"}]
+
+    Pipeline Flow:
+    1. Discover PDFs and pick max_documents of them (sample_pdf_list)
+    2. Download and convert the sample once (packed Docling jobs)
+    3. For each trial (3 in parallel): register a scratch collection, chunk, insert,
+       evaluate, drop the scratch collection
+    4. Compare trials and recommend (recommend_chunking)
+    5. Drop scratch collections left by failed trials, even if the run failed
+       (drop_trial_collections)
+    """
+    _ = cache_buster  # Include in pipeline execution context
+
+    # Step 1: Sample the corpus
+    list_task = list_pdfs_in_s3(
+        s3_prefix=s3_prefix,
+        s3_secret_mount_path=s3_secret_mount_path,
+        minio_endpoint=minio_endpoint,
+        minio_creds_b64=minio_creds_b64,
+    )
+    list_task.set_caching_options(False)
+    _set_resources(list_task)
+
+    sample_task = sample_pdf_list(pdf_uris=list_task.output, max_documents=max_documents)
+    _set_resources(sample_task)
+
+    # Step 2: Convert the sample once; every trial re-chunks the same markdown
+    download_task = download_batch_from_s3(
+        input_uris=sample_task.output,
+        s3_secret_mount_path=s3_secret_mount_path,
+        minio_endpoint=minio_endpoint,
+        minio_creds_b64=minio_creds_b64,
+        workspace_dir=workspace_dir,
+    )
+    download_task.set_caching_options(False)
+    _mount_workspace(download_task)
+    _set_resources(download_task, cpu_request="500m", cpu_limit="1", memory_request="512Mi", memory_limit="1Gi")
+
+    docling_task = process_with_docling_batch(
+        input_dir=download_task.outputs["output_dir"],
+        docling_url=docling_url,
+        workspace_dir=workspace_dir,
+        admission=docling_admission,
+    )
+    docling_task.set_caching_options(False)
+    _mount_workspace(docling_task)
+    _set_resources(docling_task, cpu_request="500m", cpu_limit="1", memory_request="512Mi", memory_limit="1Gi")
+
+    # Step 3: One scratch collection per trial
+    plan_task = plan_chunking_trials(
+        vector_db_id=vector_db_id,
+        chunk_sizes=chunk_sizes,
+        chunk_overlaps=chunk_overlaps,
+    )
+    _set_resources(plan_task)
+
+    with dsl.ParallelFor(items=plan_task.output, parallelism=3, name="chunking-trial") as trial:
+        version_task = create_collection_version(
+            llamastack_url=llamastack_url,
+            vector_db_id=trial.vector_db_id,
+        )
+        version_task.set_caching_options(False)
+        _set_resources(version_task)
+
+        chunking_task = chunk_markdown(
+            markdown_file=docling_task.outputs["output_dir"],
+            chunk_size=trial.chunk_size,
+            chunk_overlap=trial.chunk_overlap,
+            workspace_dir=workspace_dir,
+        )
+        chunking_task.set_caching_options(False)
+        _mount_workspace(chunking_task)
+        _set_resources(chunking_task)
+
+        insert_task = insert_via_llamastack(
+            chunks_file=chunking_task.outputs["output_chunks"],
+            llamastack_url=llamastack_url,
+            vector_db_id=version_task.output,
+            input_uri=s3_prefix,
+        )
+        insert_task.set_caching_options(False)
+        _mount_workspace(insert_task)
+        _set_resources(insert_task)
+        insert_task.set_retry(num_retries=0)
+
+        evaluate_task = evaluate_chunking_trial(
+            milvus_uri=milvus_uri,
+            llamastack_url=llamastack_url,
+            version_id=version_task.output,
+            trial=trial,
+            queries=queries,
+            top_k=top_k,
+        )
+        evaluate_task.after(insert_task)
+        evaluate_task.set_caching_options(False)
+        _set_resources(evaluate_task)
+
+    # Step 4: Recommend
+    recommend_task = recommend_chunking(
+        vector_db_id=vector_db_id,
+        results=dsl.Collected(evaluate_task.output),
+        max_p95_latency_ms=max_p95_latency_ms,
+        max_context_tokens=max_context_tokens,
+    )
+    recommend_task.set_caching_options(False)
+    _set_resources(recommend_task)
+
+    # Scratch collections of trials that failed before their evaluation dropped them
+    drop_task = drop_trial_collections(
+        milvus_uri=milvus_uri,
+        llamastack_url=llamastack_url,
+        trials=plan_task.output,
+    )
+    drop_task.after(recommend_task)
+    drop_task.ignore_upstream_failure()
+    drop_task.set_caching_options(False)
+    _set_resources(drop_task)
 
+    if WORKSPACE_PVC:
+        cleanup_task = cleanup_workspace(
+            workspace_dir=workspace_dir,
+            run_id=dsl.PIPELINE_JOB_ID_PLACEHOLDER,
+            max_depth=5,  # every input must be bound for ignore_upstream_failure()
+        )
+        cleanup_task.after(recommend_task)
+        cleanup_task.ignore_upstream_failure()  # free the PVC even when an upstream step failed
+        cleanup_task.set_caching_options(False)
+        _mount_workspace(cleanup_task)
+        _set_resources(cleanup_task)
 
 if __name__ == "__main__":
     # Compile pipeline
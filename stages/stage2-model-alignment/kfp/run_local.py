@@ -0,0 +1,258 @@
+"""
+Local ingestion runner - the KFP component bodies without KFP
+
+Runs the same functions the pipeline runs (list → download → docling → chunk → insert →
+verify) as plain Python via each component's `.python_func`, with one worker process per
+document. No compile/upload/DSPA round trip, so an experiment takes seconds instead of
+minutes of pod scheduling, and the same entry point handles large one-off backfills.
+
+Inputs:
+    file:///path/to/doc.pdf  or  file:///path/to/dir/   (local PDFs, download step skipped)
+    s3://bucket/prefix/      or  s3://bucket/doc.pdf     (MinIO via list/download components)
+
+Profiling:
+    --profile cprofile   each document runs under cProfile; per-document .prof files plus a
+                         merged top-N report (by cumulative time) in <work-dir>/profiles/
+    --profile py-spy     re-executes this runner under `py-spy record --subprocesses` and
+                         writes a flame graph (<work-dir>/profiles/py-spy.svg)
+
+Usage (from stages/stage2-model-alignment/kfp/, with port-forwards or routes to services):
+    # Profile chunking on local PDFs without touching LlamaStack
+    python3 run_local.py file://../scenario-docs/scenario2-acme/ --stop-after chunk --profile cprofile
+
+    # Fully offline: in-process Docling instead of docling-serve
+    python3 run_local.py file://../scenario-docs/scenario2-acme/ --stop-after chunk --docling-backend local
+
+    # Backfill a MinIO prefix into a collection with 8 worker processes
+    MINIO_CREDS_B64=... python3 run_local.py s3://llama-files/scenario2-acme/ \\
+        --vector-db-id acme_corporate --workers 8 \\
+        --docling-url http://localhost:5001 --llamastack-url http://localhost:8321
+"""
+
+import argparse
+import glob
+import json
+import os
+import pstats
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+KFP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Components are imported as `components.*`; docling_admission lives in the runtime image dir
+sys.path[:0] = [KFP_DIR, os.path.join(KFP_DIR, "runtime-image")]
+
+from kfp.dsl import Dataset  # noqa: E402
+
+from components.chunk_markdown import chunk_markdown  # noqa: E402
+from components.download_from_s3 import download_from_s3  # noqa: E402
+from components.insert_via_llamastack import insert_via_llamastack  # noqa: E402
+from components.list_pdfs_in_s3 import list_pdfs_in_s3  # noqa: E402
+from components.process_with_docling import process_with_docling  # noqa: E402
+from components.verify_ingestion import verify_ingestion  # noqa: E402
+
+STEPS = ("download", "docling", "chunk", "insert")
+
+
+def _artifact(path: str, metadata: Optional[Dict] = None) -> Dataset:
+    """A Dataset whose .path is a plain local path (what the KFP launcher would provide)."""
+    return Dataset(name=os.path.basename(path), uri=path, metadata=dict(metadata or {}))
+
+
+def discover(source: str, args: argparse.Namespace) -> List[str]:
+    """Expand a file:// or s3:// source into document URIs."""
+    if source.startswith("file://"):
+        path = source[len("file://"):]
+        if os.path.isdir(path):
+            return [f"file://{os.path.abspath(p)}" for p in sorted(glob.glob(os.path.join(path, "*.pdf")))]
+        return [f"file://{os.path.abspath(path)}"]
+    if source.startswith("s3://"):
+        if source.lower().endswith(".pdf"):
+            return [source]
+        return list_pdfs_in_s3.python_func(
+            s3_prefix=source,
+            s3_secret_mount_path=args.s3_secret_mount_path,
+            minio_endpoint=args.minio_endpoint,
+            minio_creds_b64=args.minio_creds_b64,
+        )
+    raise ValueError(f"Unsupported source (expected file:// or s3://): {source}")
+
+
+def process_document(uri: str, args: argparse.Namespace) -> Dict:
+    """Run the per-document component chain in this process; returns timings and counts."""
+    doc_dir = os.path.join(args.work_dir, os.path.splitext(os.path.basename(uri))[0])
+    os.makedirs(doc_dir, exist_ok=True)
+    timings: Dict[str, float] = {}
+    result: Dict = {"uri": uri, "timings": timings}
+
+    def _timed(step: str, func, **kwargs):
+        start = time.perf_counter()
+        value = func(**kwargs)
+        timings[step] = time.perf_counter() - start
+        return value
+
+    if uri.startswith("file://"):
+        pdf = _artifact(uri[len("file://"):], {"source_uri": uri, "size_bytes": os.path.getsize(uri[len("file://"):])})
+    else:
+        pdf = _artifact(os.path.join(doc_dir, "source.pdf"))
+        _timed(
+            "download",
+            download_from_s3.python_func,
+            input_uri=uri,
+            s3_secret_mount_path=args.s3_secret_mount_path,
+            output_file=pdf,
+            minio_endpoint=args.minio_endpoint,
+            minio_creds_b64=args.minio_creds_b64,
+        )
+    if args.stop_after == "download":
+        return result
+
+    markdown = _artifact(os.path.join(doc_dir, "document.md"))
+    _timed(
+        "docling",
+        process_with_docling.python_func,
+        input_file=pdf,
+        docling_url=args.docling_url,
+        output_markdown=markdown,
+        admission=args.docling_admission,
+        backend=args.docling_backend,
+    )
+    if args.stop_after == "docling":
+        return result
+
+    chunks = _artifact(os.path.join(doc_dir, "chunks.json"))
+    _timed("chunk", chunk_markdown.python_func, markdown_file=markdown, chunk_size=args.chunk_size, output_chunks=chunks)
+    with open(chunks.path) as f:
+        result["num_chunks"] = len(json.load(f))
+    if args.stop_after == "chunk":
+        return result
+
+    insert_result = _timed(
+        "insert",
+        insert_via_llamastack.python_func,
+        chunks_file=chunks,
+        llamastack_url=args.llamastack_url,
+        vector_db_id=args.vector_db_id,
+        input_uri=uri,
+    )
+    result["num_inserted"] = insert_result["num_chunks"]
+    return result
+
+
+def _worker(uri: str, args: argparse.Namespace) -> Dict:
+    """Process-pool entry point: optional cProfile around one document."""
+    if args.profile != "cprofile":
+        return process_document(uri, args)
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(process_document, uri, args)
+    finally:
+        profile_dir = os.path.join(args.work_dir, "profiles")
+        os.makedirs(profile_dir, exist_ok=True)
+        profiler.dump_stats(os.path.join(profile_dir, f"{os.path.splitext(os.path.basename(uri))[0]}.prof"))
+
+
+def _run_under_py_spy(args: argparse.Namespace) -> int:
+    if not shutil.which("py-spy"):
+        print("[ERROR] py-spy not found (pip install py-spy)", file=sys.stderr)
+        return 1
+    output = os.path.join(args.work_dir, "profiles", "py-spy.svg")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    argv = [a for a in sys.argv[1:] if a not in ("--profile", "py-spy", "--profile=py-spy")]
+    argv += ["--work-dir", args.work_dir]  # the re-executed run writes next to the flame graph
+    cmd = ["py-spy", "record", "--subprocesses", "-o", output, "--", sys.executable, os.path.abspath(__file__), *argv]
+    print(f"Running under py-spy: {' '.join(cmd)}")
+    code = subprocess.call(cmd)
+    print(f"Flame graph: {output}")
+    return code
+
+
+def _report_profiles(args: argparse.Namespace) -> None:
+    files = sorted(
+        p for p in glob.glob(os.path.join(args.work_dir, "profiles", "*.prof"))
+        if os.path.basename(p) != "merged.prof"
+    )
+    if not files:
+        return
+    stats = pstats.Stats(*files)
+    merged = os.path.join(args.work_dir, "profiles", "merged.prof")
+    stats.dump_stats(merged)
+    print(f"\nMerged cProfile of {len(files)} document(s): {merged} (open with snakeviz)")
+    stats.sort_stats("cumulative").print_stats(args.profile_top)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run RAG ingestion locally with the KFP component code")
+    parser.add_argument("source", help="file:///path(.pdf|/dir) or s3://bucket/prefix/")
+    parser.add_argument("--vector-db-id", default="acme_corporate")
+    parser.add_argument("--docling-url", default=os.environ.get("DOCLING_URL", "http://localhost:5001"))
+    parser.add_argument("--llamastack-url", default=os.environ.get("LLAMASTACK_URL", "http://localhost:8321"))
+    parser.add_argument("--chunk-size", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Worker processes (documents in flight)")
+    parser.add_argument("--stop-after", choices=STEPS, help="Skip the steps after this one (no insert/verify)")
+    parser.add_argument("--min-chunks", type=int, default=10, help="verify_ingestion threshold")
+    parser.add_argument(
+        "--docling-backend", choices=("remote", "local"), default="remote",
+        help="local = docling library in this process tree (pip install -r runtime-image/requirements-docling.txt)",
+    )
+    parser.add_argument("--docling-admission", default="", help='e.g. "file:/tmp/docling-admission.json"')
+    parser.add_argument("--s3-secret-mount-path", default="/mnt/secrets")
+    parser.add_argument("--minio-endpoint", default=os.environ.get("MINIO_ENDPOINT", "localhost:9000"))
+    parser.add_argument("--minio-creds-b64", default=os.environ.get("MINIO_CREDS_B64", ""))
+    parser.add_argument("--work-dir", default=os.path.join(KFP_DIR, ".local-runs", time.strftime("%Y%m%d-%H%M%S")))
+    parser.add_argument("--profile", choices=("cprofile", "py-spy"))
+    parser.add_argument("--profile-top", type=int, default=25, help="Rows in the merged cProfile report")
+    args = parser.parse_args()
+
+    if args.profile == "py-spy":
+        return _run_under_py_spy(args)
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    uris = discover(args.source, args)
+    if not uris:
+        print(f"[WARN] No PDFs found at {args.source}")
+        return 1
+    print(f"Processing {len(uris)} document(s) with {args.workers} worker(s); work dir {args.work_dir}")
+
+    started = time.perf_counter()
+    results, failures = [], []
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(uris)))) as pool:
+        futures = {pool.submit(_worker, uri, args): uri for uri in uris}
+        for future in as_completed(futures):
+            uri = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as exc:  # noqa: BLE001 - reported in the summary
+                failures.append((uri, exc))
+                print(f"[FAIL] {uri}: {exc}")
+    wall = time.perf_counter() - started
+
+    print(f"\n{'document':<48}" + "".join(f"{step:>10}" for step in STEPS) + f"{'chunks':>8}")
+    for result in sorted(results, key=lambda r: r["uri"]):
+        row = "".join(f"{result['timings'][s]:>10.1f}" if s in result["timings"] else f"{'-':>10}" for s in STEPS)
+        print(f"{os.path.basename(result['uri'])[:47]:<48}{row}{result.get('num_chunks', '-'):>8}")
+    step_totals = {s: sum(r["timings"].get(s, 0.0) for r in results) for s in STEPS}
+    print(f"{'TOTAL (sum over workers)':<48}" + "".join(f"{step_totals[s]:>10.1f}" for s in STEPS))
+    print(f"\nWall time {wall:.1f}s for {len(results)}/{len(uris)} document(s)")
+
+    if args.profile == "cprofile":
+        _report_profiles(args)
+
+    if not args.stop_after and results:
+        verify_ingestion.python_func(
+            llamastack_url=args.llamastack_url,
+            vector_db_id=args.vector_db_id,
+            min_chunks=args.min_chunks,
+            insert_result={"source": args.source, "num_chunks": sum(r.get("num_inserted", 0) for r in results)},
+        )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
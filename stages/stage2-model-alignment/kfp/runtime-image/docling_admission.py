@@ -0,0 +1,268 @@
+"""
+Cluster-wide admission control for docling-serve jobs
+
+Parallel Docling component pods share one docling-serve instance. Instead of submitting
+blindly, each pod acquires a slot before submitting a conversion job and releases it when
+the job finishes. The slot limit adapts AIMD-style to what the pods observe:
+
+- congestion (job waited in the docling-serve queue, i.e. `task_position` > 0, ran longer
+  than the target, or failed): limit *= DECREASE_FACTOR
+- clean run: limit += 1 / limit (about +1 per limit's worth of successful jobs)
+
+State is one small JSON document, updated atomically through a store:
+
+    configmap:<name>   ConfigMap in the pod's namespace (optimistic concurrency on
+                       resourceVersion; needs gitops/.../kfp/docling-admission-rbac.yaml)
+    file:<path>        JSON file guarded by flock (local runs, or a shared RWX volume)
+
+Holders carry a lease expiry, so a pod killed mid-job cannot leak its slot.
+
+Shipped in the ingestion-runtime image (site-packages) and imported by
+process_with_docling / process_with_docling_batch:
+
+    admission = admission_from_spec("configmap:docling-admission")
+    with admission.slot(holder) as slot:
+        ... submit, then while polling: slot.observe_position(task.get("task_position"))
+"""
+
+import fcntl
+import json
+import math
+import os
+import random
+import socket
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+State = Dict[str, Any]
+Mutator = Callable[[State], Tuple[State, Any]]
+
+INITIAL_SLOTS = 4  # docling-serve engine.local.numWorkers
+MIN_SLOTS = 1
+MAX_SLOTS = 8
+LEASE_SECONDS = 1800  # matches the components' 30 minute job timeout
+TARGET_SECONDS = 300  # conversions slower than this count as congestion
+DECREASE_FACTOR = 0.7
+
+
+def _empty_state() -> State:
+    return {"limit": float(INITIAL_SLOTS), "holders": {}, "ewma_seconds": None, "updated": 0.0}
+
+
+class FileStore:
+    """Admission state in a local JSON file (exclusive flock around read-modify-write)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def update(self, mutate: Mutator) -> Any:
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                state = json.loads(raw) if raw.strip() else _empty_state()
+                state, result = mutate(state)
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class ConfigMapStore:
+    """Admission state in a ConfigMap, updated with compare-and-swap on resourceVersion."""
+
+    SA_DIR = "/var/run/secrets/kubernetes.io/serviceaccount"
+    DATA_KEY = "state.json"
+
+    def __init__(self, name: str, namespace: Optional[str] = None):
+        import requests
+
+        self._requests = requests
+        with open(f"{self.SA_DIR}/token") as f:
+            token = f.read().strip()
+        if namespace is None:
+            with open(f"{self.SA_DIR}/namespace") as f:
+                namespace = f.read().strip()
+        host = os.environ["KUBERNETES_SERVICE_HOST"]
+        port = os.environ.get("KUBERNETES_SERVICE_PORT", "443")
+        self.name = name
+        self.collection_url = f"https://{host}:{port}/api/v1/namespaces/{namespace}/configmaps"
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        self.session.verify = f"{self.SA_DIR}/ca.crt"
+
+    def update(self, mutate: Mutator) -> Any:
+        for _ in range(50):
+            response = self.session.get(f"{self.collection_url}/{self.name}", timeout=10)
+            if response.status_code == 404:
+                state, result = mutate(_empty_state())
+                body = {
+                    "apiVersion": "v1",
+                    "kind": "ConfigMap",
+                    "metadata": {
+                        "name": self.name,
+                        "labels": {"app.kubernetes.io/component": "docling-admission"},
+                    },
+                    "data": {self.DATA_KEY: json.dumps(state)},
+                }
+                created = self.session.post(self.collection_url, json=body, timeout=10)
+                if created.status_code == 409:
+                    continue  # another pod created it first
+                created.raise_for_status()
+                return result
+
+            response.raise_for_status()
+            configmap = response.json()
+            raw = (configmap.get("data") or {}).get(self.DATA_KEY)
+            state, result = mutate(json.loads(raw) if raw else _empty_state())
+            configmap.setdefault("data", {})[self.DATA_KEY] = json.dumps(state)
+            # metadata.resourceVersion is kept, so a concurrent update returns 409
+            replaced = self.session.put(f"{self.collection_url}/{self.name}", json=configmap, timeout=10)
+            if replaced.status_code == 409:
+                time.sleep(random.uniform(0.05, 0.3))
+                continue
+            replaced.raise_for_status()
+            return result
+        raise RuntimeError(f"Could not update ConfigMap {self.name}: too many conflicts")
+
+
+class Slot:
+    """A held admission slot; records the backpressure signals seen while it is held."""
+
+    def __init__(self, holder: str):
+        self.holder = holder
+        self.acquired_at = time.time()
+        self.max_queue_position = 0
+        self.success = True
+
+    def observe_position(self, position: Any) -> None:
+        try:
+            self.max_queue_position = max(self.max_queue_position, int(position))
+        except (TypeError, ValueError):
+            pass  # docling-serve reports None once the job is running
+
+
+class DoclingAdmission:
+    """Adaptive slot limiter shared by every pod that talks to docling-serve."""
+
+    def __init__(
+        self,
+        store,
+        min_slots: int = MIN_SLOTS,
+        max_slots: int = MAX_SLOTS,
+        lease_seconds: int = LEASE_SECONDS,
+        target_seconds: float = TARGET_SECONDS,
+    ):
+        self.store = store
+        self.min_slots = min_slots
+        self.max_slots = max_slots
+        self.lease_seconds = lease_seconds
+        self.target_seconds = target_seconds
+
+    def _try_acquire(self, holder: str) -> Mutator:
+        def mutate(state: State) -> Tuple[State, Tuple[bool, int, int]]:
+            now = time.time()
+            holders = {h: exp for h, exp in state.get("holders", {}).items() if exp > now}
+            limit = max(self.min_slots, min(self.max_slots, int(math.floor(state.get("limit", INITIAL_SLOTS)))))
+            granted = holder in holders or len(holders) < limit
+            if granted:
+                holders[holder] = now + self.lease_seconds
+            state["holders"] = holders
+            state["updated"] = now
+            return state, (granted, len(holders), limit)
+        return mutate
+
+    def _release(self, slot: Slot, duration: float) -> Mutator:
+        def mutate(state: State) -> Tuple[State, float]:
+            state.setdefault("holders", {}).pop(slot.holder, None)
+            limit = float(state.get("limit", INITIAL_SLOTS))
+            congested = (
+                slot.max_queue_position > 0
+                or duration > self.target_seconds
+                or not slot.success
+            )
+            if congested:
+                limit = max(float(self.min_slots), limit * DECREASE_FACTOR)
+            else:
+                limit = min(float(self.max_slots), limit + 1.0 / max(limit, 1.0))
+            ewma = state.get("ewma_seconds")
+            state["ewma_seconds"] = duration if ewma is None else 0.8 * ewma + 0.2 * duration
+            state["limit"] = limit
+            state["updated"] = time.time()
+            return state, limit
+        return mutate
+
+    def acquire(self, holder: str, timeout: float = 3600, poll_seconds: float = 5.0) -> Slot:
+        deadline = time.time() + timeout
+        waited = 0
+        while True:
+            granted, in_use, limit = self.store.update(self._try_acquire(holder))
+            if granted:
+                if waited:
+                    print(f"[ADMISSION] {holder}: slot granted after {waited}s ({in_use}/{limit} in use)")
+                return Slot(holder)
+            if time.time() >= deadline:
+                raise TimeoutError(f"No docling-serve admission slot within {timeout}s ({in_use}/{limit} in use)")
+            if waited % 60 == 0:
+                print(f"[ADMISSION] {holder}: waiting for a slot ({in_use}/{limit} in use)")
+            # Jitter keeps pods that were refused together from retrying in lockstep
+            sleep_for = poll_seconds * random.uniform(0.5, 1.5)
+            time.sleep(sleep_for)
+            waited += int(round(sleep_for)) or 1
+
+    def release(self, slot: Slot) -> None:
+        duration = time.time() - slot.acquired_at
+        limit = self.store.update(self._release(slot, duration))
+        print(
+            f"[ADMISSION] {slot.holder}: released after {duration:.0f}s "
+            f"(max queue position {slot.max_queue_position}); limit now {limit:.2f}"
+        )
+
+    @contextmanager
+    def slot(self, holder: str) -> Iterator[Slot]:
+        held = self.acquire(holder)
+        try:
+            yield held
+        except BaseException:
+            held.success = False
+            raise
+        finally:
+            self.release(held)
+
+
+def default_holder(suffix: str = "") -> str:
+    """Pod name (hostname) plus an optional suffix, unique per concurrent job."""
+    name = socket.gethostname()
+    return f"{name}-{suffix}" if suffix else name
+
+
+def admission_from_spec(spec: str) -> Optional[DoclingAdmission]:
+    """
+    Build a limiter from a spec string: "configmap:<name>", "file:<path>", or "" (disabled).
+
+    Store errors (e.g. missing RBAC, not running in a pod) disable admission with a warning
+    rather than failing the conversion.
+    """
+    if not spec:
+        return None
+    kind, _, target = spec.partition(":")
+    try:
+        if kind == "configmap":
+            store = ConfigMapStore(target or "docling-admission")
+        elif kind == "file":
+            store = FileStore(target or "/tmp/docling-admission.json")
+        else:
+            raise ValueError(f"Unknown admission store '{kind}'")
+        admission = DoclingAdmission(store)
+        admission.store.update(lambda state: (state, None))  # fail fast on permissions
+        return admission
+    except Exception as exc:  # noqa: BLE001 - admission is best effort
+        print(f"[ADMISSION] Disabled ({spec}): {exc}")
+        return None
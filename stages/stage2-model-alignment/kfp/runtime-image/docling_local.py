@@ -0,0 +1,127 @@
+"""
+In-process Docling conversion spread over all available cores
+
+Backend for process_with_docling(backend="local"): instead of sending the PDF to the
+shared docling-serve deployment, the component pod converts it with the docling library.
+The PDF is cut into page batches that a process pool converts in parallel (one converter
+per worker process, models loaded once per worker), and the per-batch markdown is joined
+with the page-break placeholder, so the output has the same shape as the remote path.
+
+Conversion options mirror the docling-serve defaults used by the remote path (OCR on,
+fast TableFormer, embedded images, images_scale 2.0).
+
+Only usable on the ingestion-runtime-docling image (Dockerfile.docling), which installs
+docling and pre-downloads its models to DOCLING_ARTIFACTS_PATH.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import List, Tuple
+
+_converter = None
+
+
+def available_cpus() -> int:
+    """CPUs this container may use (cgroup v2 quota first, then affinity)."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+def count_pages(path: str) -> int:
+    import pypdfium2  # docling dependency
+
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _build_converter():
+    from docling.datamodel.base_models import InputFormat
+    from docling.datamodel.pipeline_options import PdfPipelineOptions, TableFormerMode
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+
+    options = PdfPipelineOptions()
+    options.do_ocr = True
+    options.do_table_structure = True
+    options.table_structure_options.mode = TableFormerMode.FAST
+    options.generate_picture_images = True
+    options.images_scale = 2.0
+    artifacts_path = os.environ.get("DOCLING_ARTIFACTS_PATH")
+    if artifacts_path:
+        options.artifacts_path = artifacts_path
+    return DocumentConverter(format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=options)})
+
+
+def _init_worker(threads: int) -> None:
+    # Parallelism comes from the process pool; keep each worker's torch/OCR threads small
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+
+
+def convert_page_range(path: str, start: int, end: int, page_break_placeholder: str) -> str:
+    """Convert pages start..end (1-based, inclusive) to markdown."""
+    global _converter
+    if _converter is None:
+        _converter = _build_converter()
+    from docling_core.types.doc import ImageRefMode
+
+    result = _converter.convert(path, page_range=(start, end))
+    return result.document.export_to_markdown(
+        image_mode=ImageRefMode.EMBEDDED,
+        page_break_placeholder=page_break_placeholder,
+    )
+
+
+def page_batches(num_pages: int, pages_per_batch: int) -> List[Tuple[int, int]]:
+    size = max(1, pages_per_batch)
+    return [(start, min(start + size - 1, num_pages)) for start in range(1, num_pages + 1, size)]
+
+
+def convert_pdf(
+    path: str,
+    page_break_placeholder: str,
+    workers: int = 0,
+    pages_per_batch: int = 8,
+) -> Tuple[str, int]:
+    """
+    Convert a PDF to markdown with up to `workers` processes (0 = one per available CPU).
+
+    Returns (markdown, page_count).
+    """
+    num_pages = count_pages(path)
+    batches = page_batches(num_pages, pages_per_batch)
+    cpus = available_cpus()
+    workers = max(1, min(workers or cpus, len(batches)))
+    print(f"[LOCAL] {num_pages} pages in {len(batches)} batch(es) on {workers} worker process(es), {cpus} CPU(s)")
+
+    if workers == 1:
+        parts = [convert_page_range(path, start, end, page_break_placeholder) for start, end in batches]
+    else:
+        # spawn, not fork: torch state in a forked parent is not fork-safe
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(max(1, cpus // workers),),
+        ) as pool:
+            parts = list(pool.map(
+                convert_page_range,
+                [path] * len(batches),
+                [start for start, _ in batches],
+                [end for _, end in batches],
+                [page_break_placeholder] * len(batches),
+            ))
+
+    # Batch boundaries are page boundaries: join with the same placeholder Docling emits
+    markdown = f"\n\n{page_break_placeholder}\n\n".join(part.strip("\n") for part in parts)
+    return markdown, num_pages
@@ -0,0 +1,239 @@
+"""
+Markdown chunking with structural metadata, shared by ingestion and the RAG playground
+
+chunk_markdown (KFP component) and the playground's upload path both chunk Docling markdown
+with chunk_document, so an uploaded file gets the same chunks and metadata as a pipeline
+run: paragraphs are packed up to chunk_size characters (oversized ones split by sentences,
+then by characters), and each chunk records its heading trail, page range and the
+document-level type/date/page count.
+
+Ships in the ingestion-runtime image (kfp/runtime-image/Dockerfile) and in the playground
+image (gitops/stage02-model-alignment/llama-stack/playground-image/Dockerfile).
+"""
+
+import os
+import re
+from typing import List, Optional, Sequence, Tuple
+
+# Must match PAGE_BREAK_PLACEHOLDER in process_with_docling
+PAGE_BREAK_PLACEHOLDER = "<!-- page-break -->"
+
+# Absolute ceiling enforced by the Milvus dynamic field limit (65536 chars)
+MAX_CHUNK_SIZE = 60000
+
+# Default keyword -> type table (checked against filename + title, first match wins).
+# Corpus-specific tables replace it through chunk_document(document_type_keywords=...);
+# the ingestion pipelines read them from kfp/document-types/<vector_db_id>.json.
+DOCUMENT_TYPE_KEYWORDS = [
+    ("procedure", "procedure"),
+    ("playbook", "playbook"),
+    ("handbook", "handbook"),
+    ("report", "report"),
+    ("regulation", "regulation"),
+    ("timeline", "timeline"),
+]
+
+MONTHS = {
+    name: idx
+    for idx, names in enumerate(
+        [("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"),
+         ("may",), ("jun", "june"), ("jul", "july"), ("aug", "august"),
+         ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"), ("dec", "december")],
+        start=1,
+    )
+    for name in names
+}
+
+_MONTH_RE = "|".join(sorted(MONTHS, key=len, reverse=True))
+_DATE_PATTERNS = [
+    (r"\b(\d{4})-(\d{2})-(\d{2})\b", lambda m: (m.group(1), m.group(2), m.group(3))),
+    (rf"\b(\d{{1,2}})\s+({_MONTH_RE})\.?\s+(\d{{4}})\b",
+     lambda m: (m.group(3), MONTHS[m.group(2).lower()], m.group(1))),
+    (rf"\b({_MONTH_RE})\.?\s+(\d{{1,2}}),?\s+(\d{{4}})\b",
+     lambda m: (m.group(3), MONTHS[m.group(1).lower()], m.group(2))),
+]
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+
+
+def document_facts(
+    first_page: str,
+    source_filename: str,
+    type_keywords: Optional[Sequence[Sequence[str]]] = None,
+) -> Tuple[str, str]:
+    """
+    Return (document_type, document_date) from the filename, first heading and first page.
+
+    `type_keywords` ([keyword, type] pairs) replaces DOCUMENT_TYPE_KEYWORDS when non-empty;
+    without a match the type is the file extension.
+    """
+    title_match = re.search(r"^#{1,6}\s+(.+?)\s*$", first_page, re.MULTILINE)
+    document_title = title_match.group(1).strip() if title_match else ""
+    type_haystack = re.sub(r"[_-]+", " ", f"{source_filename} {document_title}".lower())
+    document_type = next(
+        (doc_type for keyword, doc_type in type_keywords or DOCUMENT_TYPE_KEYWORDS
+         if keyword.lower() in type_haystack),
+        os.path.splitext(source_filename)[1].lstrip(".").lower() or "document",
+    )
+
+    # First date on the first page, normalized to ISO (YYYY-MM-DD) for range filters
+    for pattern, to_parts in _DATE_PATTERNS:
+        match = re.search(pattern, first_page, re.IGNORECASE)
+        if match:
+            year, month, day = to_parts(match)
+            if 1 <= int(month) <= 12 and 1 <= int(day) <= 31:
+                return document_type, f"{int(year):04d}-{int(month):02d}-{int(day):02d}"
+    return document_type, ""
+
+
+def chunk_document(
+    content: str,
+    source_filename: str,
+    chunk_size: int,
+    chunk_overlap: int = 0,
+    page_count_hint: Optional[int] = None,
+    document_type_keywords: Optional[Sequence[Sequence[str]]] = None,
+) -> List[dict]:
+    """
+    Chunk one markdown document.
+
+    `chunk_overlap` > 0 prefixes every chunk after the first with the tail of the previous
+    one (cut at a word boundary); chunks are packed `chunk_overlap` chars smaller so the
+    result still fits `chunk_size`. `document_type_keywords` is passed to document_facts.
+
+    Returns:
+        [{"chunk_id", "text", "metadata": {section_path, section_title, page_start,
+        page_end, page_count, document_type, document_date}}]
+    """
+    page_count = int(page_count_hint or content.count(PAGE_BREAK_PLACEHOLDER) + 1)
+    document_type, document_date = document_facts(
+        content.split(PAGE_BREAK_PLACEHOLDER, 1)[0], source_filename, document_type_keywords
+    )
+    print(f"Document: type={document_type}, date={document_date or 'unknown'}, pages={page_count}")
+
+    effective_chunk_size = min(max(chunk_size, 1), MAX_CHUNK_SIZE)
+    # Overlap (+2 for its "\n\n" separator) is carved out of the size budget, at most half of it
+    overlap = min(max(chunk_overlap, 0), effective_chunk_size // 2)
+    pack_size = max(effective_chunk_size - (overlap + 2 if overlap else 0), 1)
+    print(f"Chunking with max size: {effective_chunk_size} chars (overlap: {overlap})")
+
+    # Split by paragraphs first, tracking page number and heading trail for each
+    paragraphs = []  # (text, page, section_path)
+    heading_stack = []  # [(level, title)]
+    page = 1
+    for raw in content.split("\n\n"):
+        para = raw.strip()
+        if PAGE_BREAK_PLACEHOLDER in para:
+            page += para.count(PAGE_BREAK_PLACEHOLDER)
+            para = para.replace(PAGE_BREAK_PLACEHOLDER, "").strip()
+        if not para:
+            continue
+        heading = _HEADING_RE.match(para.splitlines()[0])
+        if heading:
+            level = len(heading.group(1))
+            heading_stack = [h for h in heading_stack if h[0] < level] + [(level, heading.group(2).strip())]
+        paragraphs.append((para, page, tuple(title for _, title in heading_stack)))
+
+    # Combine paragraphs into chunks respecting the size limit; a chunk's section is its
+    # first paragraph's heading trail
+    pieces = []  # {"text", "page_start", "page_end", "section"}
+    current_chunk = []
+    current_length = 0
+    current_pages = []
+    current_section = ()
+
+    def _flush():
+        if current_chunk:
+            pieces.append({
+                "text": "\n\n".join(current_chunk),
+                "page_start": min(current_pages),
+                "page_end": max(current_pages),
+                "section": current_section,
+            })
+
+    for para, para_page, para_section in paragraphs:
+        para_len = len(para)
+        if para_len > pack_size:
+            # Oversized paragraph: close the current chunk, then split it by sentences
+            _flush()
+            current_chunk, current_length, current_pages = [], 0, []
+            temp_chunk, temp_len = [], 0
+            for sent in para.split(". "):
+                sent_len = len(sent) + 2  # +2 for ". "
+                if temp_len + sent_len > pack_size:
+                    if temp_chunk:
+                        pieces.append({
+                            "text": ". ".join(temp_chunk) + ".",
+                            "page_start": para_page,
+                            "page_end": para_page,
+                            "section": para_section,
+                        })
+                    temp_chunk, temp_len = [sent], sent_len
+                else:
+                    temp_chunk.append(sent)
+                    temp_len += sent_len
+            if temp_chunk:
+                pieces.append({
+                    "text": ". ".join(temp_chunk) + ".",
+                    "page_start": para_page,
+                    "page_end": para_page,
+                    "section": para_section,
+                })
+        elif current_length + para_len + 2 > pack_size:
+            # Current chunk is full, start a new one
+            _flush()
+            current_chunk, current_length = [para], para_len
+            current_pages, current_section = [para_page], para_section
+        else:
+            if not current_chunk:
+                current_section = para_section
+            current_chunk.append(para)
+            current_length += para_len + 2  # +2 for "\n\n"
+            current_pages.append(para_page)
+    _flush()
+
+    # Force-split whatever still exceeds the budget (very long sentences, code blocks);
+    # fragments of 50 chars or less are dropped
+    chunks = []
+    for piece in pieces:
+        text = piece["text"]
+        if len(text) > pack_size:
+            print(f"SAFETY: Force-splitting {len(text)} char chunk into {pack_size} char pieces")
+        for start in range(0, len(text), pack_size):
+            if len(text[start:start + pack_size]) > 50:
+                chunks.append({**piece, "text": text[start:start + pack_size]})
+
+    if overlap:
+        texts = [chunk["text"] for chunk in chunks]
+        for prev_text, chunk in zip(texts, chunks[1:]):
+            tail = prev_text[-overlap:]
+            # Start the carried-over text at a word boundary
+            if len(prev_text) > overlap and not prev_text[-overlap - 1].isspace() and " " in tail:
+                tail = tail.split(" ", 1)[1]
+            if tail.strip():
+                chunk["text"] = f"{tail.strip()}\n\n{chunk['text']}"
+
+    if chunks:
+        max_chunk_len = max(len(chunk["text"]) for chunk in chunks)
+        print(f"Created {len(chunks)} chunks (max length: {max_chunk_len} chars, limit: {effective_chunk_size})")
+        if max_chunk_len > effective_chunk_size:
+            raise ValueError(f"BUG: Chunk of {max_chunk_len} chars STILL exceeds limit {effective_chunk_size}!")
+    else:
+        print("No chunks created (document too short)")
+
+    # Text + flat scalar metadata; insert_via_llamastack merges "metadata" into each chunk
+    return [
+        {
+            "chunk_id": i,
+            "text": chunk["text"],
+            "metadata": {
+                "section_path": " > ".join(chunk["section"]),
+                "section_title": chunk["section"][-1] if chunk["section"] else "",
+                "page_start": int(chunk["page_start"]),
+                "page_end": int(chunk["page_end"]),
+                "page_count": page_count,
+                "document_type": document_type,
+                "document_date": document_date,
+            },
+        }
+        for i, chunk in enumerate(chunks)
+    ]
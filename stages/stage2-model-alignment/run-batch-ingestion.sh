@@ -108,14 +108,18 @@ from kfp import dsl, compiler, client
 # Add project root to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath('$0')), 'kfp'))
 
-# Import pipeline from pipeline.py
-from pipeline import batch_docling_rag_pipeline
-
-# Compile
-compiler.Compiler().compile(
-    pipeline_func=batch_docling_rag_pipeline,
-    package_path='kfp/batch-docling-rag-pipeline.yaml'
-)
+# Import pipelines from pipeline.py
+from pipeline import batch_docling_rag_pipeline, reindex_collection_pipeline, chunking_autotune_pipeline
+
+# Compile (REINDEX=true: blue/green rebuild into a versioned collection + alias switch;
+# AUTOTUNE=true: chunk_size/chunk_overlap sweep on a sample, recommendation only)
+if os.environ.get('AUTOTUNE', 'false').lower() == 'true':
+    pipeline_func, package_path = chunking_autotune_pipeline, 'kfp/chunking-autotune-pipeline.yaml'
+elif os.environ.get('REINDEX', 'false').lower() == 'true':
+    pipeline_func, package_path = reindex_collection_pipeline, 'kfp/reindex-collection-pipeline.yaml'
+else:
+    pipeline_func, package_path = batch_docling_rag_pipeline, 'kfp/batch-docling-rag-pipeline.yaml'
+compiler.Compiler().compile(pipeline_func=pipeline_func, package_path=package_path)
 print('✅ Pipeline compiled successfully')
 "
 
@@ -127,6 +131,7 @@ fi
 # Run pipeline via KFP client
 echo -e "${YELLOW}🚀 Launching pipeline run...${NC}"
 python3 << 'PYTHON_SCRIPT'
+import json
 import os
 import sys
 import time
@@ -140,12 +145,19 @@ DSPA_ROUTE = os.environ.get('DSPA_ROUTE', 'https://ds-pipeline-dspa-private-ai-d
 NAMESPACE = 'private-ai-demo'
 
 # Pipeline naming (shared across all scenarios)
-PIPELINE_NAME = "data-processing-and-insertion"
+AUTOTUNE = os.environ.get("AUTOTUNE", "false").lower() == "true"
+REINDEX = os.environ.get("REINDEX", "false").lower() == "true"
+if AUTOTUNE:
+    PIPELINE_NAME, PIPELINE_PACKAGE, RUN_KIND = "chunking-autotune", "kfp/chunking-autotune-pipeline.yaml", "chunking-autotune"
+elif REINDEX:
+    PIPELINE_NAME, PIPELINE_PACKAGE, RUN_KIND = "collection-reindex-blue-green", "kfp/reindex-collection-pipeline.yaml", "reindex"
+else:
+    PIPELINE_NAME, PIPELINE_PACKAGE, RUN_KIND = "data-processing-and-insertion", "kfp/batch-docling-rag-pipeline.yaml", "batch-ingestion"
 
 # Semantic version (update when making code changes)
 # Format: v{major}.{minor}.{patch} - {description}
 # See PIPELINE-NAMING-VERSIONING.md for update guidelines
-VERSION_DESCRIPTION = "v1.0.2 - Unified ingestion for all scenarios"
+VERSION_DESCRIPTION = "v1.13.0 - Per-collection document type keywords for chunk metadata"
 
 # Scenario-specific parameters from environment
 S3_PREFIX = os.environ['S3_PREFIX']
@@ -166,9 +178,9 @@ except Exception as e:
 print(f"📤 Uploading pipeline: {PIPELINE_NAME}")
 try:
     pipeline = kfp_client.upload_pipeline(
-        pipeline_package_path='kfp/batch-docling-rag-pipeline.yaml',
+        pipeline_package_path=PIPELINE_PACKAGE,
         pipeline_name=PIPELINE_NAME,
-        description=f"RAG Ingestion Pipeline v1.0.2 - Scenario: {SCENARIO}"
+        description=f"RAG Ingestion Pipeline v1.13.0 - Scenario: {SCENARIO}"
     )
     pipeline_id = pipeline.pipeline_id
     print(f"✅ Pipeline uploaded: {pipeline_id}")
@@ -177,7 +189,7 @@ try:
     # Format: v{unix_timestamp}-{scenario} (e.g., v1731072345-acme)
     version_name = f"v{int(time.time())}-{SCENARIO}"
     version = kfp_client.upload_pipeline_version(
-        pipeline_package_path='kfp/batch-docling-rag-pipeline.yaml',
+        pipeline_package_path=PIPELINE_PACKAGE,
         pipeline_version_name=version_name,
         pipeline_name=PIPELINE_NAME,
         description=VERSION_DESCRIPTION
@@ -198,7 +210,7 @@ except Exception as e:
             version_name = f"v{int(time.time())}-{SCENARIO}"
             try:
                 version = kfp_client.upload_pipeline_version(
-                    pipeline_package_path='kfp/batch-docling-rag-pipeline.yaml',
+                    pipeline_package_path=PIPELINE_PACKAGE,
                     pipeline_version_name=version_name,
                     pipeline_name=PIPELINE_NAME,
                     description=VERSION_DESCRIPTION
@@ -223,21 +235,42 @@ except Exception as e:
         sys.exit(1)
 
 # Create run with descriptive name
-# Format: {scenario}-batch-ingestion-{unix_timestamp}
+# Format: {scenario}-{batch-ingestion|reindex|chunking-autotune}-{unix_timestamp}
 # See docs/03-STAGE2-RAG/PIPELINE-NAMING-VERSIONING.md for conventions
 print(f"🚀 Creating pipeline run for scenario: {SCENARIO}")
-run_name = f"{SCENARIO}-batch-ingestion-{int(time.time())}"
+run_name = f"{SCENARIO}-{RUN_KIND}-{int(time.time())}"
 
 params = {
     "s3_prefix": S3_PREFIX,
     "docling_url": "http://docling-service.private-ai-demo.svc:5001",
     "llamastack_url": "http://llama-stack-service.private-ai-demo.svc:8321",
     "vector_db_id": VECTOR_DB_ID,
-    "chunk_size": 512,
     "minio_endpoint": "minio.model-storage.svc:9000",
     "minio_creds_b64": os.environ["MINIO_CREDS_B64"],
     "cache_buster": str(int(time.time()))  # Force fresh run
 }
+if AUTOTUNE:
+    # Query set with expected source documents per collection
+    with open(f"kfp/autotune-queries/{VECTOR_DB_ID}.json") as f:
+        params["queries"] = json.load(f)
+else:
+    # CHUNK_SIZE/CHUNK_OVERLAP: apply a chunking-autotune recommendation
+    params["chunk_size"] = int(os.environ.get("CHUNK_SIZE", "512"))
+    params["chunk_overlap"] = int(os.environ.get("CHUNK_OVERLAP", "0"))
+    # Document type keywords for this corpus (chunk metadata document_type)
+    if os.path.exists(f"kfp/document-types/{VECTOR_DB_ID}.json"):
+        with open(f"kfp/document-types/{VECTOR_DB_ID}.json") as f:
+            params["document_type_keywords"] = json.load(f)
+    # PACK_DOCUMENTS=true: multi-file Docling jobs per group (many short PDFs)
+    params["pack_documents"] = os.environ.get("PACK_DOCUMENTS", "false").lower() == "true"
+    if REINDEX:
+        # VECTOR_INDEX_TYPE/VECTOR_INDEX_PARAMS (JSON): tuned index from kfp/benchmark_vector_index.py,
+        # built on the shadow collection before the switch
+        params["vector_index_type"] = os.environ.get("VECTOR_INDEX_TYPE", "")
+        params["vector_index_params"] = json.loads(os.environ.get("VECTOR_INDEX_PARAMS", "{}"))
+    elif os.environ.get("VECTOR_INDEX_TYPE"):
+        print("❌ VECTOR_INDEX_TYPE needs REINDEX=true (rebuilding the index of a served collection blocks its readers)")
+        sys.exit(1)
 
 try:
     # Experiment groups runs by scenario (e.g., rag-ingestion-acme)